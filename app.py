@@ -1,11 +1,30 @@
 import streamlit as st
-from transformers import pipeline
-import tempfile
-import os
-from pydub import AudioSegment
-import torch
 from datetime import datetime
+from functools import partial
 import json
+import time
+from config import (
+    ANALYTICS_STORE, INCIDENT_INDEX, JOB_SERVICE, NER_WINDOWS, ROLLING_AGGREGATES, SEGMENT_CONFIG, SEGMENT_BATCH_SIZE
+)
+from utils.job_client import JobServiceError, get_job_client
+from utils.rolling_aggregates import DIMENSIONS, get_rolling_aggregates
+
+if not JOB_SERVICE["enabled"]:
+    # The in-process pipeline; as a client of the job service the app needs none of it
+    from utils import batching
+    from utils.analytics_store import get_analytics_store
+    from utils.audio_decode import decode_audio
+    from utils.gazetteer import gazetteer_fingerprint, resolve_locations
+    from utils.incident_index import link_duplicates
+    from utils.ner_windows import windowed_ner
+    from utils.quantization import get_backend_model, inference_threads, model_tag
+    from utils.result_cache import fingerprint, get_result_cache, hash_audio, transcript_key
+    from utils.rule_engine import rules_fingerprint
+    from utils.segmenter import SAMPLE_RATE, detect_speech, stitch_segments
+    from utils.tracing import span, start_metrics_server, trace
+    from utils.translation import translate_text
+    from utils.warmup import start_warmup
+    from utils.weapon_lexicon import get_weapon_matcher, lexicon_fingerprint
 
 # App Configuration
 st.set_page_config(
@@ -17,101 +36,262 @@ st.set_page_config(
 # Initialize session state
 if 'results' not in st.session_state:
     st.session_state.results = None
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
+
+MODEL_IDS = {
+    "whisper": "openai/whisper-base",
+    "translator": "Helsinki-NLP/opus-mt-mul-en",
+    "ner": "dslim/bert-base-NER"
+}
+
+def _pipeline(*args, **kwargs):
+    # transformers (and with it torch) is imported on first use, not before the page draws
+    from transformers import pipeline
+    return pipeline(*args, **kwargs)
+
+MODEL_LOADERS = {
+    "whisper": lambda device: _pipeline("automatic-speech-recognition", model=MODEL_IDS["whisper"], device=device),
+    "translator": lambda device: _pipeline("translation", model=MODEL_IDS["translator"], device=device),
+    "ner": lambda device: _pipeline("ner", model=MODEL_IDS["ner"], aggregation_strategy="simple", device=device)
+}
+
+def load_model(name):
+    # Looked up in the shared model registry on every call, so the app shares
+    # models with the rest of the process and respects its memory budget
+    return get_backend_model(MODEL_IDS[name], MODEL_LOADERS[name])
 
-@st.cache_resource
 def load_models():
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    return {
-        "whisper": pipeline(
-            "automatic-speech-recognition",
-            model="openai/whisper-base",
-            device=device
-        ),
-        "translator": pipeline(
-            "translation",
-            model="Helsinki-NLP/opus-mt-mul-en",
-            device=device
-        ),
-        "ner": pipeline(
-            "ner",
-            model="dslim/bert-base-NER",
-            aggregation_strategy="simple",
-            device=device
-        )
+    return {name: load_model(name) for name in MODEL_IDS}
+
+def start_model_warmup():
+    """Load every model in parallel in the background, once per server process"""
+    return start_warmup("app", {name: partial(load_model, name) for name in MODEL_IDS})
+
+def show_model_status(warmup):
+    status = warmup.status()
+    icons = {"pending": "⏳", "loading": "⏳", "ready": "✅", "failed": "❌"}
+    with st.sidebar:
+        st.subheader("Models")
+        for name, state in status.items():
+            detail = f" ({state['seconds']}s)" if state["seconds"] is not None else ""
+            st.write(f"{icons[state['status']]} {MODEL_IDS[name]}: {state['status']}{detail}")
+            if state["error"]:
+                st.caption(state["error"])
+        if not warmup.done():
+            st.caption("Models are loading in the background. You can start an analysis now; it will wait for them.")
+            st.button("Refresh status")
+
+def transcribe(models, samples):
+    """Transcribe only the voiced segments, in batches"""
+    with span("segment", size=round(len(samples) / SAMPLE_RATE, 2), unit="audio_s"):
+        spans = detect_speech(samples, SAMPLE_RATE, **SEGMENT_CONFIG)
+    if not spans:
+        return "", []
+    inputs = [{"raw": samples[start:end], "sampling_rate": SAMPLE_RATE} for start, end in spans]
+    speech_s = round(sum(end - start for start, end in spans) / SAMPLE_RATE, 2)
+    with span("transcribe", model=model_tag(MODEL_IDS["whisper"]), size=speech_s, unit="audio_s"), \
+            inference_threads("whisper"):
+        outputs = models["whisper"](inputs, batch_size=SEGMENT_BATCH_SIZE)
+    return stitch_segments(spans, [out["text"] for out in outputs])
+
+def translate(models, transcript):
+    """Translate the sentences that are not English, in batches shared with other sessions"""
+    model_id = model_tag(MODEL_IDS["translator"])
+    translate_batch = partial(batching.translate, get_pipeline=partial(load_model, "translator"), model_id=model_id)
+    with span("translate", model=model_id, size=len(transcript), unit="chars"):
+        translated, was_translated = translate_text(transcript, translate_batch, model_id)
+    return {"translated": translated, "was_translated": was_translated}
+
+def extract_entities(models, translated):
+    model_id = model_tag(MODEL_IDS["ner"])
+    with span("ner", model=model_id, size=len(translated), unit="chars"):
+        if NER_WINDOWS["enabled"]:
+            entities = windowed_ner(translated, partial(load_model, "ner"), model_id)
+        else:
+            entities = batching.ner([translated], partial(load_model, "ner"), model_id)[0]
+    
+    entity_data = {
+        "locations": set(),
+        "times": set(),
+        "weapons": set(),
+        "suspects": set()
     }
+    
+    for entity in entities:
+        group = entity["entity_group"]
+        word = entity["word"]
+        
+        if group in ["LOC", "GPE"]:
+            entity_data["locations"].add(word)
+        elif group == "PER":
+            entity_data["suspects"].add(word)
+        elif group in ["DATE", "TIME"]:
+            entity_data["times"].add(word)
+    
+    with span("weapons", size=len(translated), unit="chars"):
+        weapon_mentions = get_weapon_matcher('en').find(translated)
+    entity_data["weapons"].update(m["weapon"] for m in weapon_mentions)
+    
+    results = {k: list(v) for k, v in entity_data.items()}
+    results["weapon_mentions"] = weapon_mentions
+    with span("gazetteer", size=len(results["locations"]), unit="mentions"):
+        results["places"] = resolve_locations(results["locations"])
+    return results
+
+def decode(uploaded_file):
+    with span("decode") as decode_span:
+        samples = decode_audio(uploaded_file)
+        decode_span.set(size=round(len(samples) / SAMPLE_RATE, 2), unit="audio_s")
+    return samples
 
 def process_audio(uploaded_file):
     try:
-        models = load_models()
-        
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            if uploaded_file.name.endswith(".mp3"):
-                audio = AudioSegment.from_mp3(uploaded_file)
-                audio.export(tmp.name, format="wav")
-            else:
-                tmp.write(uploaded_file.getvalue())
-            
-            result = models["whisper"](tmp.name)
-            transcript = result["text"]
-            
-            is_english = all(ord(c) < 128 for c in transcript)
-            if not is_english:
-                translated = models["translator"](transcript)[0]["translation_text"]
-                translation = True
-            else:
-                translated = transcript
-                translation = False
-            
-            entities = models["ner"](translated)
-            
-            entity_data = {
-                "locations": set(),
-                "times": set(),
-                "weapons": set(),
-                "suspects": set()
-            }
+        with trace() as stage_trace:
+            with span("load_models"):
+                models = load_models()
+            cache = get_result_cache()
             
-            for entity in entities:
-                group = entity["entity_group"]
-                word = entity["word"]
-                
-                if group in ["LOC", "GPE"]:
-                    entity_data["locations"].add(word)
-                elif group == "PER":
-                    entity_data["suspects"].add(word)
-                elif group in ["DATE", "TIME"]:
-                    entity_data["times"].add(word)
-            
-            weapon_words = {'gun', 'knife', 'weapon', 'pistol'}
-            for word in translated.lower().split():
-                if word in weapon_words:
-                    entity_data["weapons"].add(word)
-            
-            return {
-                "metadata": {
-                    "filename": uploaded_file.name,
-                    "processed_at": datetime.now().isoformat(),
-                    "file_size": f"{uploaded_file.size/1024:.1f} KB",
-                    "language": "en" if is_english else "non-en"
-                },
-                "transcript": {
-                    "original": transcript,
-                    "translated": translated,
-                    "was_translated": translation
-                },
-                "classification": {
-                    "category":[ "Assault","Robbery","Cybercrime","Burglary","Vandalism","Harassment","Fraud","Kidnapping","Arson","DrugOffense","Other"],  
-                    "confidence": 0.3      
-                },
-                "entities": {k: list(v) for k, v in entity_data.items()}
-            }
+            # Re-uploads of the same recording are served from the result cache;
+            # each stage key includes the keys of the stages it depends on
+            with span("hash", size=uploaded_file.size, unit="bytes"):
+                audio_hash = hash_audio(uploaded_file)
+            transcript_cache_key = transcript_key(model_tag(MODEL_IDS["whisper"]), "transformers")
+            translation_key = fingerprint(transcript_cache_key, model_tag(MODEL_IDS["translator"]))
+            entities_key = fingerprint(translation_key, model_tag(MODEL_IDS["ner"]), lexicon_fingerprint(), gazetteer_fingerprint(),
+                                       rules_fingerprint())
             
+            transcript, segments = cache.get_or_compute(
+                audio_hash, "transcript", transcript_cache_key,
+                lambda: transcribe(models, decode(uploaded_file))
+            )
+            translation = cache.get_or_compute(
+                audio_hash, "translation", translation_key,
+                lambda: translate(models, transcript)
+            )
+            translated = translation["translated"]
+            entities = cache.get_or_compute(
+                audio_hash, "entities", entities_key,
+                lambda: extract_entities(models, translated)
+            )
+            # sentence_transformers (and torch) load on first use, not with the page
+            from utils.insight_generator import EMBEDDING_MODEL, classify_crime, get_current_categories
+            # Same threshold as the job service, so both modes label calls alike
+            threshold = JOB_SERVICE["threshold"]
+            classification_key = fingerprint(translation_key, model_tag(EMBEDDING_MODEL), threshold,
+                                             get_current_categories())
+            category, confidence = cache.get_or_compute(
+                audio_hash, "classification", classification_key,
+                lambda: classify_crime(translated, threshold)
+            )
+        
+        metadata = {
+            "filename": uploaded_file.name,
+            "processed_at": datetime.now().isoformat(),
+            "file_size": f"{uploaded_file.size/1024:.1f} KB",
+            "language": "non-en" if translation["was_translated"] else "en"
+        }
+        timings = stage_trace.to_dict()
+        if timings:
+            metadata["trace"] = timings
+        
+        results = {
+            "metadata": metadata,
+            "transcript": {
+                "original": transcript,
+                "translated": translated,
+                "was_translated": translation["was_translated"],
+                "segments": segments
+            },
+            "classification": {
+                "category": category,
+                "confidence": confidence
+            },
+            "entities": entities
+        }
+        if INCIDENT_INDEX["enabled"]:
+            with span("duplicates", size=len(translated), unit="chars"):
+                from utils.insight_generator import get_classifier
+                embedding = get_classifier().embed([translated])[0]
+                results["duplicates"] = link_duplicates(audio_hash, embedding)
+        if ANALYTICS_STORE["enabled"]:
+            get_analytics_store().add(results, source=audio_hash)
+        if ROLLING_AGGREGATES["enabled"]:
+            aggregates = get_rolling_aggregates()
+            aggregates.update(results["classification"], entities)
+            aggregates.maybe_save()
+        return results
+        
     except Exception as e:
         st.error(f"Processing error: {str(e)}")
         return None
-    finally:
-        if 'tmp' in locals() and os.path.exists(tmp.name):
-            os.unlink(tmp.name)
+
+def show_service_status():
+    with st.sidebar:
+        st.subheader("Analysis Service")
+        try:
+            health = get_job_client().health()
+        except JobServiceError as e:
+            st.write(f"❌ {JOB_SERVICE['unix_socket'] or JOB_SERVICE['url']}")
+            st.caption(f"{e}. Start it with: python service.py")
+            return
+        jobs = health["jobs"]
+        st.write(f"✅ {health['busy']}/{health['workers']} workers busy, {jobs['queued']} calls waiting")
+        st.button("Refresh status")
+
+def submit_to_service(uploaded_file):
+    """Queue the recording with the job service; returns the job id or None"""
+    try:
+        job = get_job_client().submit(uploaded_file.getvalue(), uploaded_file.name)
+    except JobServiceError as e:
+        if e.status == 429:
+            st.warning(f"Too many calls are waiting for analysis. Try again in {e.retry_after or 5:.0f} seconds.")
+        else:
+            st.error(f"Analysis service unavailable: {e}")
+        return None
+    st.session_state.job_id = job["id"]
+    return job["id"]
+
+def wait_for_job(job_id):
+    """
+    Poll the job until it finishes and return its results
+
+    Any rerun (including the Cancel button) stops this loop; the job keeps its
+    place in the service and main() resumes waiting for it, unless cancelled.
+    """
+    st.button("Cancel analysis", key="cancel_job")
+    status = st.empty()
+    started = time.monotonic()
+
+    def show(job):
+        elapsed = f"{time.monotonic() - started:.0f}s"
+        if job["status"] == "queued":
+            status.info(f"Waiting for a free worker (position {job['position'] + 1} in the queue, {elapsed})")
+        else:
+            status.info(f"Processing... (This may take 1-2 minutes, {elapsed})")
+
+    try:
+        job = get_job_client().wait(job_id, on_status=show)
+    except JobServiceError as e:
+        status.error(f"Lost track of the analysis: {e}")
+        return None
+    st.session_state.job_id = None
+    status.empty()
+    if job["status"] != "done":
+        st.error(f"Analysis {job['status']}" + (f": {job['error']}" if job.get("error") else ""))
+        return None
+    return job["result"]
+
+def cancel_pending_job():
+    """Handle the Cancel button: its click reruns the script, ending the wait"""
+    job_id = st.session_state.get("job_id")
+    if job_id and st.session_state.get("cancel_job"):
+        try:
+            get_job_client().cancel(job_id)
+            st.info("Analysis cancelled")
+        except JobServiceError as e:
+            st.error(f"Could not cancel the analysis: {e}")
+        st.session_state.job_id = None
 
 def display_results(results):
     st.header("Analysis Results")
@@ -135,6 +315,10 @@ def display_results(results):
         with cols[0]:
             st.subheader("Locations")
             st.write("\n".join(f"- {loc}" for loc in results['entities']['locations']) or "None found")
+            places = results['entities'].get('places')
+            if places:
+                st.map([{"lat": p['lat'], "lon": p['lon']} for p in places if p['lat'] is not None])
+                st.caption("Resolved: " + ", ".join(p['name'] for p in places))
             
             st.subheader("Time References")
             st.write("\n".join(f"- {time}" for time in results['entities']['times']) or "None found")
@@ -145,6 +329,17 @@ def display_results(results):
             
             st.subheader("Suspects")
             st.write("\n".join(f"- {suspect}" for suspect in results['entities']['suspects']) or "None found")
+        
+        if results.get('duplicates'):
+            st.subheader("Possible Duplicate Calls")
+            st.table([
+                {
+                    "call": d['call_id'][:12],
+                    "received": datetime.fromtimestamp(d['timestamp']).strftime('%Y-%m-%d %H:%M'),
+                    "similarity": f"{d['score']:.0%}"
+                }
+                for d in results['duplicates']
+            ])
     
     with tab2:
         st.subheader("Transcript")
@@ -155,6 +350,13 @@ def display_results(results):
                 st.text(results['transcript']['original'])
     
     with tab3:
+        timings = results['metadata'].get('trace')
+        if timings:
+            with st.expander(f"Stage timings ({timings['total_s']:.2f}s total)"):
+                st.table(timings['stages'])
+                if timings['cache']:
+                    st.caption("Result cache: " + ", ".join(f"{k} {v}" for k, v in timings['cache'].items()))
+        
         st.subheader("Complete Raw Data")
         st.json(results)
         
@@ -165,25 +367,67 @@ def display_results(results):
             mime="application/json"
         )
 
+def display_hot_spots():
+    if JOB_SERVICE["enabled"]:
+        # The service process owns the live counts
+        try:
+            dashboard = get_job_client().hot_spots()
+        except JobServiceError:
+            return
+    else:
+        dashboard = get_rolling_aggregates().dashboard()
+    if not dashboard:
+        return
+    with st.expander("Hot Spots"):
+        window = st.radio("Window", list(dashboard), horizontal=True)
+        cols = st.columns(len(DIMENSIONS))
+        for col, dimension in zip(cols, DIMENSIONS):
+            with col:
+                st.subheader(dimension.title())
+                top = dashboard[window][dimension]
+                if top:
+                    st.table([{dimension: value, "calls": n} for value, n in top])
+                else:
+                    st.write("None yet")
+
 def main():
     st.title("Police Call Analytics")
     st.markdown("AI-powered analysis of police call recordings")
     
+    # With the job service, this process only uploads and displays; the
+    # models run in the service's workers
+    if JOB_SERVICE["enabled"]:
+        cancel_pending_job()
+        show_service_status()
+    else:
+        show_model_status(start_model_warmup())
+        start_metrics_server()
+    
     uploaded_file = st.file_uploader(
         "Upload recording (MP3/WAV)",
         type=["mp3", "wav"]
     )
     
+    results = None
     if uploaded_file and st.button("Analyze"):
-        with st.spinner("Processing... (This may take 1-2 minutes)"):
-            results = process_audio(uploaded_file)
-            if results:
-                st.session_state.results = results
-                st.success("Analysis complete!")
-                st.balloons()
-    
-    if st.session_state.results:
+        if JOB_SERVICE["enabled"]:
+            job_id = submit_to_service(uploaded_file)
+            results = wait_for_job(job_id) if job_id else None
+        else:
+            with st.spinner("Processing... (This may take 1-2 minutes)"):
+                results = process_audio(uploaded_file)
+    elif JOB_SERVICE["enabled"] and st.session_state.get("job_id"):
+        results = wait_for_job(st.session_state.get("job_id"))
+    if results:
+        st.session_state.results = results
+        st.success("Analysis complete!")
+        st.balloons()
+    
+    if st.session_state.get("results"):
         display_results(st.session_state.results)
+    
+    if ROLLING_AGGREGATES["enabled"]:
+        display_hot_spots()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,334 @@
+"""Headless batch ingest for whole shift archives.
+
+Usage:
+    python batch.py <directory|manifest.txt> -o results.jsonl --workers 4
+
+Every recording is transcribed, translated, run through NER and classified
+inside a pool of worker processes. Each worker loads its models once.
+One JSON line is written per recording as soon as it finishes, so an
+interrupted run can be restarted with the same output file and only the
+missing (or previously failed) recordings are processed again.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from datetime import datetime
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".flac")
+
+# Results are added to the analytics store this many at a time
+STORE_BATCH_SIZE = 100
+
+# Per-process pipeline state, populated by _init_worker
+_worker = {}
+
+
+def discover_inputs(source):
+    """Return the recordings referenced by a directory or a manifest file"""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+
+    if not os.path.isfile(source):
+        raise FileNotFoundError(f"Input not found: {source}")
+
+    # Manifest: one path per line, relative paths resolved against the manifest
+    base_dir = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            paths.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return paths
+
+
+def load_completed(output_path, retry_failed=True):
+    """Read an existing output file and return the recordings already done"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") == "ok" or not retry_failed:
+                done.add(record["file"])
+    return done
+
+
+def _init_worker(threads_per_worker, threshold, use_cache):
+    # A Pool replaces a worker whose initializer raises, forever; a failed load
+    # is kept instead and every recording this worker gets reports it
+    try:
+        _load_pipeline(threads_per_worker, threshold, use_cache)
+    except Exception as e:
+        _worker["error"] = f"Worker initialization failed: {type(e).__name__}: {e}"
+        _worker["traceback"] = traceback.format_exc()
+
+
+def _load_pipeline(threads_per_worker, threshold, use_cache):
+    import torch
+    from utils.audio_processor import AudioProcessor
+    from utils.nlp_processor import get_ner_pipeline
+    from utils.insight_generator import get_classifier
+    from utils.result_cache import get_result_cache
+
+    if threads_per_worker:
+        torch.set_num_threads(threads_per_worker)
+
+    _worker["audio"] = AudioProcessor()
+    _worker["threshold"] = threshold
+    _worker["cache"] = get_result_cache() if use_cache else None
+    # Warm the remaining models so the first recording does not pay for them
+    get_ner_pipeline('en')
+    get_classifier()
+
+
+def _run_stages(path, audio_hash):
+    """Transcribe, translate, extract and classify, reusing cached stage results"""
+    from utils.audio_processor import TRANSLATION_MODEL, whisper_model_name
+    from utils.gazetteer import gazetteer_fingerprint
+    from utils.nlp_processor import extract_entities, ner_model_name
+    from utils.insight_generator import EMBEDDING_MODEL, classify_crime, get_current_categories
+    from utils.quantization import model_tag
+    from utils.result_cache import fingerprint, transcript_key
+    from utils.rule_engine import rules_fingerprint
+    from utils.weapon_lexicon import lexicon_fingerprint
+
+    audio = _worker["audio"]
+    threshold = _worker["threshold"]
+    cache = _worker["cache"]
+    if cache is None:
+        audio_result = audio.transcribe_and_translate(path)
+        text = audio_result["translated_text"]
+        return audio_result, extract_entities(text, language='en'), classify_crime(text, threshold)
+
+    # Downstream keys include upstream fingerprints, so e.g. a category edit
+    # only misses the classification entry
+    transcript_cache_key = transcript_key(audio._model_tag(f"openai/{whisper_model_name()}"), "whisper")
+    translation_key = fingerprint(transcript_cache_key, model_tag(TRANSLATION_MODEL))
+    entities_key = fingerprint(translation_key, model_tag(ner_model_name('en')), lexicon_fingerprint(),
+                               gazetteer_fingerprint(), rules_fingerprint())
+    classification_key = fingerprint(translation_key, model_tag(EMBEDDING_MODEL), threshold, get_current_categories())
+
+    transcript = cache.get_or_compute(audio_hash, "transcript", transcript_cache_key,
+                                      lambda: audio.transcribe(path))
+    audio_result = cache.get_or_compute(audio_hash, "translation", translation_key,
+                                        lambda: audio.transcribe_and_translate(path, transcript))
+    text = audio_result["translated_text"]
+    entities = cache.get_or_compute(audio_hash, "entities", entities_key,
+                                    lambda: extract_entities(text, language='en'))
+    classification = cache.get_or_compute(audio_hash, "classification", classification_key,
+                                          lambda: classify_crime(text, threshold))
+    return audio_result, entities, tuple(classification)
+
+
+def process_file(path):
+    """Run the full pipeline on one recording inside a worker"""
+    if "error" in _worker:
+        return {
+            "file": path,
+            "status": "error",
+            "error": _worker["error"],
+            "traceback": _worker["traceback"],
+            "worker_pid": os.getpid()
+        }
+    from config import INCIDENT_INDEX
+    from utils.insight_generator import get_classifier
+    from utils.result_cache import hash_audio
+    from utils.tracing import trace
+
+    started = time.perf_counter()
+    try:
+        # The call's id for the result cache and the incident index, as in the app
+        audio_hash = hash_audio(path)
+        with trace() as stage_trace:
+            audio_result, entities, (category, confidence) = _run_stages(path, audio_hash)
+        text = audio_result["translated_text"]
+
+        metadata = {
+            "filename": os.path.basename(path),
+            "processed_at": datetime.now().isoformat(),
+            # Archived recordings are ingested long after the call; the file
+            # time is the closest thing to the call time they carry
+            "recorded_at": datetime.fromtimestamp(os.path.getmtime(path)).isoformat(),
+            "file_size": f"{os.path.getsize(path)/1024:.1f} KB",
+            "language": audio_result["original_lang"],
+            "worker_pid": os.getpid(),
+            "duration_s": round(time.perf_counter() - started, 3)
+        }
+        timings = stage_trace.to_dict()
+        if timings:
+            metadata["trace"] = timings
+
+        record = {
+            "file": path,
+            "audio_hash": audio_hash,
+            "status": "ok",
+            "metadata": metadata,
+            "transcript": {
+                "original": audio_result.get("original_text", text),
+                "translated": text,
+                "was_translated": audio_result["translation"],
+                "segments": audio_result.get("segments", [])
+            },
+            "classification": {
+                "category": category,
+                "confidence": float(confidence)
+            },
+            "entities": entities
+        }
+        if INCIDENT_INDEX["enabled"]:
+            # The index lives in the parent; it takes this out before writing
+            record["embedding"] = get_classifier().embed([text])[0].tolist()
+        return record
+    except Exception as e:
+        return {
+            "file": path,
+            "status": "error",
+            "error": f"{type(e).__name__}: {e}",
+            "traceback": traceback.format_exc(),
+            "worker_pid": os.getpid()
+        }
+
+
+def run_batch(source, output_path, workers=None, threads_per_worker=None,
+              threshold=0.4, retry_failed=True, use_cache=True, metrics_path=None,
+              use_store=True):
+    """
+    Process every recording in ``source`` and append results to ``output_path``
+
+    With ``metrics_path``, the per-stage timings of this run are also written
+    there in Prometheus text format (e.g. for node_exporter's textfile collector).
+    With ``use_store``, successful results are also added to the analytics store
+    in bulk, keyed by audio hash like the app's and the job service's calls,
+    so a recording ingested both ways is stored once. Every result also
+    updates the rolling aggregates and is linked to near-duplicate calls in
+    the incident index (under "duplicates"); both are saved at the end of the
+    run.
+    """
+    from config import ANALYTICS_STORE, INCIDENT_INDEX, ROLLING_AGGREGATES
+    from utils.analytics_store import get_analytics_store, to_timestamp
+    from utils.incident_index import get_incident_index, link_duplicates
+    from utils.rolling_aggregates import get_rolling_aggregates
+    from utils.tracing import METRICS
+    store = get_analytics_store() if use_store and ANALYTICS_STORE["enabled"] else None
+    aggregates = get_rolling_aggregates() if ROLLING_AGGREGATES["enabled"] else None
+    store_pending = []
+    paths = discover_inputs(source)
+    completed = load_completed(output_path, retry_failed)
+    pending = [p for p in paths if p not in completed]
+
+    workers = workers or os.cpu_count() or 1
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    print(f"{len(paths)} recordings found, {len(completed)} already done, "
+          f"{len(pending)} to process with {workers} workers")
+    if not pending:
+        return {"processed": 0, "failed": 0, "skipped": len(completed)}
+
+    ok = failed = 0
+    started = time.perf_counter()
+    # spawn keeps torch/CUDA state out of the children
+    ctx = multiprocessing.get_context("spawn")
+    with open(output_path, 'a', encoding='utf-8') as out, ctx.Pool(
+        processes=workers,
+        initializer=_init_worker,
+        initargs=(threads_per_worker, threshold, use_cache)
+    ) as pool:
+        for record in pool.imap_unordered(process_file, pending):
+            embedding = record.pop("embedding", None)
+            if embedding is not None:
+                # Same id as the app and the job service, so a recording is
+                # one call however it arrived; windows are measured in call time.
+                # Saved (and evicted) once at the end, so results arriving out
+                # of order can still find an older duplicate from the archive
+                record["duplicates"] = link_duplicates(
+                    record["audio_hash"], embedding, to_timestamp(record["metadata"]["recorded_at"]),
+                    autosave=False
+                )
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            if record["status"] == "ok":
+                ok += 1
+                # Workers trace in their own processes; aggregate here
+                if "trace" in record["metadata"]:
+                    METRICS.observe_trace(record["metadata"]["trace"])
+                if aggregates is not None:
+                    # Counted at call time, so an archive lands in the buckets
+                    # of when its calls happened, not all in the current hour
+                    aggregates.update(record["classification"], record["entities"],
+                                      to_timestamp(record["metadata"]["recorded_at"]))
+                if store is not None:
+                    store_pending.append(record)
+                    if len(store_pending) >= STORE_BATCH_SIZE:
+                        store.add_many(store_pending, [r["audio_hash"] for r in store_pending])
+                        store_pending = []
+            else:
+                failed += 1
+                print(f"FAILED {record['file']}: {record['error']}", file=sys.stderr)
+            done = ok + failed
+            if done % 10 == 0 or done == len(pending):
+                rate = done / (time.perf_counter() - started)
+                print(f"[{done}/{len(pending)}] {rate:.2f} files/s, {failed} failed")
+
+    if store_pending:
+        store.add_many(store_pending, [r["audio_hash"] for r in store_pending])
+    if aggregates is not None:
+        aggregates.save()
+    if INCIDENT_INDEX["enabled"]:
+        get_incident_index().save()
+
+    if metrics_path:
+        with open(metrics_path, 'w', encoding='utf-8') as f:
+            f.write(METRICS.render())
+
+    return {"processed": ok, "failed": failed, "skipped": len(completed)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-process police call recordings")
+    parser.add_argument("source", help="Directory of recordings or manifest file (one path per line)")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSON Lines output file")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Torch threads per worker (default: CPU count / workers)")
+    parser.add_argument("--threshold", type=float, default=0.4, help="Crime classification threshold")
+    parser.add_argument("--no-retry-failed", action="store_true",
+                        help="Do not reprocess recordings that failed in a previous run")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the result cache")
+    parser.add_argument("--metrics", default=None, help="Write per-stage Prometheus metrics to this file")
+    parser.add_argument("--no-store", action="store_true", help="Do not add results to the analytics store")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(
+        args.source,
+        args.output,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        threshold=args.threshold,
+        retry_failed=not args.no_retry_failed,
+        use_cache=not args.no_cache,
+        metrics_path=args.metrics,
+        use_store=not args.no_store
+    )
+    print(json.dumps(summary))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Reproducible synthetic call corpus for the pipeline benchmark.
+
+Two parts, both fully determined by the seed:
+- audio/: WAV calls at several durations (tone bursts and pauses, so the
+  segmenter produces realistic segment counts); transcripts come from the
+  stub ASR models in benchmarks/stubs.py
+- transcripts.jsonl: call transcripts built from templates, each with the
+  suspects, locations, weapons and crime category it contains
+
+The corpus is written once per (seed, durations, size) and reused afterwards.
+"""
+import json
+import os
+import random
+from benchmarks.startup import synthetic_call
+
+DEFAULT_DURATIONS = (10, 30, 120)
+
+NAMES = [
+    "John Smith", "Maria Lopez", "Peter Novak", "Sarah Connor", "Ahmed Khan",
+    "Emily Clark", "David Brown", "Lucia Rossi", "Tom Becker", "Grace Kim"
+]
+PLACES = [
+    "Main Street", "Fifth Avenue", "Elm Street", "Oak Avenue", "Union Square",
+    "Central Park", "Baker Street", "Harbor Road", "Lincoln Plaza", "River Road"
+]
+# (term as spoken, canonical type in weapon_lexicon.json)
+WEAPONS = [
+    ("gun", "firearm"), ("pistol", "handgun"), ("knife", "knife"), ("machete", "knife"),
+    ("baseball bat", "blunt object"), ("crowbar", "blunt object"), ("shotgun", "shotgun"),
+    ("pepper spray", "chemical spray")
+]
+
+# Per category: templates and whether they name a weapon
+TEMPLATES = {
+    "Robbery": [
+        ("{name} pointed a {weapon} at the cashier on {place} and took the money.", True),
+        ("A man just grabbed my purse on {place}, I think his name is {name}.", False)
+    ],
+    "Assault": [
+        ("{name} is hitting a woman with a {weapon} outside the bar on {place}.", True),
+        ("There is a fight on {place}, {name} punched someone in the face.", False)
+    ],
+    "Burglary": [
+        ("Someone broke into my house on {place} while I was away, the neighbor saw {name}.", False),
+        ("{name} forced the back door open on {place} and is carrying a {weapon}.", True)
+    ],
+    "Vandalism": [
+        ("{name} is smashing car windows on {place} with a {weapon}.", True),
+        ("Kids are spray painting the walls on {place}, one of them is {name}.", False)
+    ],
+    "Kidnapping": [
+        ("A child was pushed into a van on {place}, the driver was {name}.", False),
+        ("{name} dragged a woman into a car on {place}, he had a {weapon}.", True)
+    ],
+    "Arson": [
+        ("Someone set fire to the garage on {place}, I saw {name} running away.", False)
+    ],
+    "DrugOffense": [
+        ("{name} is selling drugs in front of the school on {place} every night.", False)
+    ],
+    "Fraud": [
+        ("A caller pretending to be from the bank took my savings, he said he was {name} from {place}.", False)
+    ]
+}
+
+FILLER = [
+    "Please hurry.",
+    "I am calling from my phone.",
+    "It happened about five minutes ago.",
+    "I can still see them from the window."
+]
+
+
+def make_transcript(rng, index):
+    """One transcript with the entities it is known to contain"""
+    category = rng.choice(sorted(TEMPLATES))
+    template, has_weapon = rng.choice(TEMPLATES[category])
+    name, place = rng.choice(NAMES), rng.choice(PLACES)
+    weapon, weapon_type = rng.choice(WEAPONS)
+    sentences = [template.format(name=name, place=place, weapon=weapon)]
+    sentences += rng.sample(FILLER, rng.randint(0, 2))
+    rng.shuffle(sentences)
+    return {
+        "id": f"text-{index:04d}",
+        "text": " ".join(sentences),
+        "category": category,
+        "entities": {
+            "suspects": [name],
+            "locations": [place],
+            "weapons": [weapon_type] if has_weapon else []
+        }
+    }
+
+
+def generate_corpus(root, durations=DEFAULT_DURATIONS, calls_per_duration=3, transcripts=100, seed=0):
+    """
+    Write (or reuse) the corpus under ``root`` and return its manifest
+
+    Returns:
+        dict: {"seed", "audio": [{"id", "path", "duration_s"}], "transcripts": path}
+    """
+    params = {
+        "seed": seed,
+        "durations": list(durations),
+        "calls_per_duration": calls_per_duration,
+        "transcripts": transcripts
+    }
+    manifest_path = os.path.join(root, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("params") == params:
+            return manifest
+
+    audio_dir = os.path.join(root, "audio")
+    os.makedirs(audio_dir, exist_ok=True)
+    audio = []
+    for duration in durations:
+        for i in range(calls_per_duration):
+            call_id = f"call-{duration}s-{i}"
+            path = os.path.join(audio_dir, f"{call_id}.wav")
+            synthetic_call(path, seconds=duration, seed=seed * 1000 + duration * 10 + i)
+            audio.append({"id": call_id, "path": path, "duration_s": duration})
+
+    rng = random.Random(seed)
+    transcripts_path = os.path.join(root, "transcripts.jsonl")
+    with open(transcripts_path, "w", encoding="utf-8") as f:
+        for i in range(transcripts):
+            f.write(json.dumps(make_transcript(rng, i)) + "\n")
+
+    manifest = {"params": params, "audio": audio, "transcripts": transcripts_path}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_transcripts(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
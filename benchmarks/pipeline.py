@@ -0,0 +1,456 @@
+"""End-to-end pipeline benchmark on the synthetic corpus.
+
+Usage:
+    python -m benchmarks.pipeline --save-baseline benchmarks/baseline.json
+    python -m benchmarks.pipeline --baseline benchmarks/baseline.json --fail-on-regression
+    python -m benchmarks.pipeline --variants text_local text_batch --cost-ms 5 --repeat 5
+
+Every variant runs in its own interpreter, and so gets its own peak RSS, with
+the stub models from benchmarks/stubs.py and a scratch working directory for
+caches. Variants:
+- app: app.py stages (decode, transcribe, translate, entities) per recording
+- app_cached: app.process_audio on a cold result cache, then again cached
+- local: utils.AudioProcessor, utils.nlp_processor and the MiniLM classifier
+- text_local: transcripts through utils.nlp_processor and both classifiers
+- text_batch: the batch APIs over chunks of transcripts
+- text_processors: processors.nlp.NLPProcessor against the local HF stub server
+
+Reported per variant: per-stage latency percentiles, throughput, peak RSS and,
+for the transcripts, entity/category accuracy against the known answers.
+Comparing against a baseline flags stages that got slower by more than the
+tolerance (and by more than a small absolute noise floor), lower throughput,
+higher peak RSS and any drop in accuracy.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS_DIR = os.path.join(ROOT, "cache", "benchmark_corpus")
+AUDIO_VARIANTS = ("app", "app_cached", "local")
+TEXT_VARIANTS = ("text_local", "text_batch", "text_processors")
+VARIANTS = AUDIO_VARIANTS + TEXT_VARIANTS
+TEXT_BATCH_SIZE = 32
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize_stage(seconds):
+    return {
+        "count": len(seconds),
+        "mean_ms": round(statistics.mean(seconds) * 1000, 3),
+        "p50_ms": round(percentile(seconds, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(seconds, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(seconds, 0.99) * 1000, 3),
+        "max_ms": round(max(seconds) * 1000, 3)
+    }
+
+
+def set_f1(expected, found):
+    expected = {e.lower() for e in expected}
+    found = {f.lower() for f in found}
+    if not expected and not found:
+        return 1.0
+    overlap = len(expected & found)
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / len(found), overlap / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def __call__(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[stage].append(time.perf_counter() - started)
+
+
+class _Upload(io.BytesIO):
+    """What Streamlit's file_uploader hands to process_audio"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(path)
+        self.size = len(self.getvalue())
+
+
+# Each setup returns (items, run, score): run(item, timer) executes the stages
+# under the timer and returns the output; score(item, output) returns accuracy
+# metrics or None
+
+def setup_app(manifest, cost_ms):
+    from benchmarks.stubs import install_stubs
+    install_stubs(["app"], cost_ms)
+    import app
+    from utils.audio_decode import decode_audio
+    models = app.load_models()
+
+    def run(item, timer):
+        with timer("decode"):
+            samples = decode_audio(item["path"])
+        with timer("transcribe"):
+            transcript, _ = app.transcribe(models, samples)
+        with timer("translate"):
+            translated = app.translate(models, transcript)["translated"]
+        with timer("entities"):
+            return app.extract_entities(models, translated)
+
+    return manifest["audio"], run, None
+
+
+def setup_app_cached(manifest, cost_ms):
+    from benchmarks.stubs import install_stubs
+    # process_audio also embeds the transcript for duplicate linking
+    install_stubs(["app", "embedding"], cost_ms)
+    import app
+    from utils.result_cache import get_result_cache, hash_audio
+    cache = get_result_cache()
+
+    def run(item, timer):
+        cache.invalidate(audio_hash=hash_audio(item["path"]))
+        with timer("cold"):
+            app.process_audio(_Upload(item["path"]))
+        with timer("cached"):
+            return app.process_audio(_Upload(item["path"]))
+
+    return manifest["audio"], run, None
+
+
+def setup_local(manifest, cost_ms):
+    from benchmarks.stubs import install_stubs
+    install_stubs(["whisper", "translation", "ner", "embedding"], cost_ms)
+    from utils.audio_decode import decode_audio
+    from utils.audio_processor import AudioProcessor
+    from utils.insight_generator import classify_crime
+    from utils.nlp_processor import extract_entities
+    from utils.segmenter import dominant_language
+    processor = AudioProcessor()
+
+    def run(item, timer):
+        with timer("decode"):
+            samples = decode_audio(item["path"])
+        with timer("transcribe"):
+            text, segments = processor.transcribe_segments(samples)
+        with timer("translate"):
+            transcript = {"text": text, "language": dominant_language(segments), "segments": segments}
+            text = processor.transcribe_and_translate(item["path"], transcript)["translated_text"]
+        with timer("entities"):
+            entities = extract_entities(text, language='en')
+        with timer("classify"):
+            classify_crime(text)
+        return entities
+
+    return manifest["audio"], run, None
+
+
+def score_transcript(item, output):
+    entities, category = output
+    scores = {field: set_f1(item["entities"][field], entities.get(field, []))
+              for field in ("suspects", "locations", "weapons")}
+    if category is not None:
+        scores["category"] = float(category == item["category"])
+    return scores
+
+
+def setup_text_local(manifest, cost_ms):
+    from benchmarks.corpus import load_transcripts
+    from benchmarks.stubs import install_stubs
+    install_stubs(["ner", "embedding", "zero_shot"], cost_ms)
+    from processors.insights import TieredCrimeClassifier
+    from utils.insight_generator import classify_crime
+    from utils.nlp_processor import extract_entities
+    tiered = TieredCrimeClassifier()
+
+    def run(item, timer):
+        with timer("entities"):
+            entities = extract_entities(item["text"], language='en')
+        with timer("classify"):
+            category, _ = classify_crime(item["text"])
+        with timer("classify_tiered"):
+            tiered.classify(item["text"])
+        return entities, category
+
+    return load_transcripts(manifest["transcripts"]), run, score_transcript
+
+
+def setup_text_batch(manifest, cost_ms):
+    from benchmarks.corpus import load_transcripts
+    from benchmarks.stubs import install_stubs
+    install_stubs(["embedding", "zero_shot"], cost_ms)
+    from processors.insights import TieredCrimeClassifier
+    from utils.insight_generator import classify_crimes
+    from utils.nlp_processor import detect_weapons_batch
+    tiered = TieredCrimeClassifier()
+    transcripts = load_transcripts(manifest["transcripts"])
+    chunks = [transcripts[i:i + TEXT_BATCH_SIZE] for i in range(0, len(transcripts), TEXT_BATCH_SIZE)]
+
+    def run(chunk, timer):
+        texts = [item["text"] for item in chunk]
+        with timer("weapons_batch"):
+            detect_weapons_batch(texts)
+        with timer("classify_batch"):
+            classify_crimes(texts)
+        with timer("classify_tiered_batch"):
+            tiered.classify_batch(texts)
+
+    return chunks, run, None
+
+
+def setup_text_processors(manifest, cost_ms):
+    from benchmarks.corpus import load_transcripts
+    from benchmarks.stubs import install_stubs
+    install_stubs(["embedding", "zero_shot"], cost_ms)
+    from processors.nlp import NLPProcessor
+    processor = NLPProcessor()
+
+    def run(item, timer):
+        with timer("entities"):
+            return processor.extract_entities(item["text"]), None
+
+    return load_transcripts(manifest["transcripts"]), run, score_transcript
+
+
+SETUPS = {
+    "app": setup_app,
+    "app_cached": setup_app_cached,
+    "local": setup_local,
+    "text_local": setup_text_local,
+    "text_batch": setup_text_batch,
+    "text_processors": setup_text_processors
+}
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def run_variant(variant, manifest, cost_ms, repeat):
+    """Run one variant in this process and return its measurements"""
+    started = time.perf_counter()
+    items, run, score = SETUPS[variant](manifest, cost_ms)
+    setup_s = time.perf_counter() - started
+
+    # First call pays for lazy initialisation; keep it out of the percentiles
+    run(items[0], StageTimer())
+
+    timer = StageTimer()
+    scores = defaultdict(list)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            with timer("total"):
+                output = run(item, timer)
+            if score is not None:
+                for metric, value in score(item, output).items():
+                    scores[metric].append(value)
+    wall_s = time.perf_counter() - started
+
+    processed = repeat * len(items)
+    result = {
+        "items": processed,
+        "setup_s": round(setup_s, 3),
+        "wall_s": round(wall_s, 3),
+        "throughput_per_s": round(processed / wall_s, 2),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": {stage: summarize_stage(seconds) for stage, seconds in timer.samples.items()}
+    }
+    if variant in AUDIO_VARIANTS:
+        audio_s = repeat * sum(item["duration_s"] for item in items)
+        result["audio_s_per_s"] = round(audio_s / wall_s, 2)
+    if variant == "text_batch":
+        result["texts_per_s"] = round(repeat * sum(len(chunk) for chunk in items) / wall_s, 2)
+    if scores:
+        result["accuracy"] = {metric: round(statistics.mean(values), 4) for metric, values in scores.items()}
+    return result
+
+
+def _child(args):
+    sys.path.insert(0, ROOT)
+    with open(os.path.join(args.corpus_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    result = run_variant(args.child, manifest, args.cost_ms, args.repeat)
+    print("BENCH_RESULT " + json.dumps(result))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def hf_stub_server():
+    """Local HF API stub with no injected latency or errors, for text_processors"""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "tools.hf_stub_server", "--port", str(port),
+         "--latency-ms", "0", "--jitter-ms", "0"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.perf_counter() + 15
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.perf_counter() > deadline or proc.poll() is not None:
+                    raise RuntimeError("HF stub server did not start")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def spawn_variant(variant, corpus_dir, cost_ms, repeat, env=None):
+    """Run a variant in a fresh interpreter with a scratch working directory"""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, **(env or {}))
+        # The app variants benchmark app.py's in-process pipeline
+        env["JOB_SERVICE"] = "0"
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.pipeline", "--child", variant,
+             "--corpus-dir", corpus_dir, "--cost-ms", str(cost_ms), "--repeat", str(repeat)],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            return json.loads(line[len("BENCH_RESULT "):])
+    raise RuntimeError(f"Variant {variant} failed:\n{proc.stderr[-2000:]}")
+
+
+def compare(current, baseline, tolerance=0.2, noise_floor_ms=1.0):
+    """
+    Regressions of ``current`` against ``baseline`` (both run reports)
+
+    Latency counts when p50 or p90 grew by more than ``tolerance`` and by more
+    than ``noise_floor_ms``; throughput when it fell by more than ``tolerance``;
+    peak RSS when it grew by more than ``tolerance``; accuracy on any drop.
+    """
+    regressions = []
+
+    def flag(variant, metric, before, after):
+        change = (after - before) / before if before else None
+        regressions.append({
+            "variant": variant,
+            "metric": metric,
+            "baseline": before,
+            "current": after,
+            "change": None if change is None else round(change, 3)
+        })
+
+    for variant, now in current["variants"].items():
+        before = baseline.get("variants", {}).get(variant)
+        if before is None or "error" in now or "error" in before:
+            continue
+        for stage, stats in now["stages"].items():
+            old = before["stages"].get(stage)
+            if old is None:
+                continue
+            for key in ("p50_ms", "p90_ms"):
+                if stats[key] > old[key] * (1 + tolerance) and stats[key] - old[key] > noise_floor_ms:
+                    flag(variant, f"{stage}.{key}", old[key], stats[key])
+        if now["throughput_per_s"] < before["throughput_per_s"] / (1 + tolerance):
+            flag(variant, "throughput_per_s", before["throughput_per_s"], now["throughput_per_s"])
+        if now["peak_rss_mb"] > before["peak_rss_mb"] * (1 + tolerance):
+            flag(variant, "peak_rss_mb", before["peak_rss_mb"], now["peak_rss_mb"])
+        for metric, value in now.get("accuracy", {}).items():
+            old = before.get("accuracy", {}).get(metric)
+            if old is not None and value < old - 1e-9:
+                flag(variant, f"accuracy.{metric}", old, value)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with stub models")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--durations", nargs="+", type=int, default=None, help="Call lengths in seconds")
+    parser.add_argument("--calls", type=int, default=3, help="Recordings per duration")
+    parser.add_argument("--transcripts", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per variant")
+    parser.add_argument("--cost-ms", type=float, default=0.0, help="Simulated model cost per item")
+    parser.add_argument("--output", default=None, help="Write the JSON report here as well")
+    parser.add_argument("--baseline", default=None, help="Report to compare against")
+    parser.add_argument("--save-baseline", default=None, help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--child", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return _child(args)
+
+    sys.path.insert(0, ROOT)
+    from benchmarks.corpus import DEFAULT_DURATIONS, generate_corpus
+    corpus_dir = os.path.abspath(args.corpus_dir)
+    manifest = generate_corpus(corpus_dir, args.durations or DEFAULT_DURATIONS, args.calls, args.transcripts, args.seed)
+
+    report = {
+        "corpus": manifest["params"],
+        "config": {"repeat": args.repeat, "cost_ms": args.cost_ms},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "variants": {}
+    }
+    for variant in args.variants:
+        print(f"running {variant}", file=sys.stderr)
+        try:
+            if variant == "text_processors":
+                with hf_stub_server() as url:
+                    result = spawn_variant(variant, corpus_dir, args.cost_ms, args.repeat, {"HF_API_BASE": url})
+            else:
+                result = spawn_variant(variant, corpus_dir, args.cost_ms, args.repeat)
+        except RuntimeError as e:
+            result = {"error": str(e)}
+        report["variants"][variant] = result
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    for regression in report.get("regressions", []):
+        print(f"REGRESSION {regression['variant']} {regression['metric']}: "
+              f"{regression['baseline']} -> {regression['current']}", file=sys.stderr)
+    if args.fail_on_regression and (report.get("regressions") or
+                                    any("error" in r for r in report["variants"].values())):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
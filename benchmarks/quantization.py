@@ -0,0 +1,228 @@
+"""fp32 vs int8 comparison on a fixed evaluation set.
+
+Usage:
+    python -m benchmarks.quantization
+    python -m benchmarks.quantization --stages ner classification --threads 4
+    python -m benchmarks.quantization --asr calls.json --save-quantized
+
+Runs every stage on CPU with both backends and reports, per stage and backend:
+- load_s: model load (plus quantization for int8)
+- model_mb: parameter/buffer size as seen by the model registry
+- latency_ms: per-item median and p95, after one warm-up call
+- accuracy: against the references in benchmarks/quantization_eval.json
+  (entity F1, translation token F1, classification accuracy, ASR WER)
+- agreement: int8 outputs scored against the fp32 outputs with the same metric
+
+The evaluation set has no recordings; pass --asr with a JSON list of
+{"audio": path, "reference": text} to include Whisper.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVAL_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quantization_eval.json")
+STAGES = ("ner", "translation", "classification", "asr")
+DEVICE = "cpu"
+
+
+def _words(text):
+    return [w.strip(".,!?;:'\"").lower() for w in text.split() if w.strip(".,!?;:'\"")]
+
+
+def token_f1(reference, hypothesis):
+    ref, hyp = Counter(_words(reference)), Counter(_words(hypothesis))
+    overlap = sum((ref & hyp).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(hyp.values()), overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def wer(reference, hypothesis):
+    ref, hyp = _words(reference), _words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i]
+        for j, h in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def set_f1(reference, hypothesis):
+    if not reference and not hypothesis:
+        return 1.0
+    overlap = len(reference & hypothesis)
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / len(hypothesis), overlap / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+
+def _entity_set(entities):
+    """{(group, text)} from gold {"PER": [...]} or pipeline output"""
+    if isinstance(entities, dict):
+        return {(group, word.lower()) for group, words in entities.items() for word in words}
+    return {(e["entity_group"], e["word"].lower()) for e in entities}
+
+
+def _timed(fn, items):
+    fn(items[0])
+    outputs, latencies = [], []
+    for item in items:
+        started = time.perf_counter()
+        outputs.append(fn(item))
+        latencies.append(time.perf_counter() - started)
+    return outputs, latencies
+
+
+def _latency(latencies):
+    ordered = sorted(latencies)
+    return {
+        "median_ms": round(statistics.median(ordered) * 1000, 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))] * 1000, 1)
+    }
+
+
+def _load(loader):
+    from utils.model_registry import estimate_model_bytes
+    started = time.perf_counter()
+    model = loader()
+    elapsed = time.perf_counter() - started
+    size = estimate_model_bytes(model)
+    return model, round(elapsed, 2), None if size is None else round(size / 1024 / 1024, 1)
+
+
+def run_ner(items, backend):
+    from utils.nlp_processor import get_ner_pipeline
+    ner, load_s, model_mb = _load(lambda: get_ner_pipeline('en', DEVICE, backend))
+    outputs, latencies = _timed(lambda item: _entity_set(ner(item["text"])), items)
+    accuracy = statistics.mean(set_f1(_entity_set(i["entities"]), o) for i, o in zip(items, outputs))
+    return outputs, {"load_s": load_s, "model_mb": model_mb, "latency": _latency(latencies),
+                     "accuracy": {"entity_f1": round(accuracy, 4)}}
+
+
+def run_translation(items, backend):
+    from utils.audio_processor import get_translation_pipeline
+    translator, load_s, model_mb = _load(lambda: get_translation_pipeline(DEVICE, backend))
+    outputs, latencies = _timed(lambda item: translator(item["source"])[0]["translation_text"], items)
+    accuracy = statistics.mean(token_f1(i["reference"], o) for i, o in zip(items, outputs))
+    return outputs, {"load_s": load_s, "model_mb": model_mb, "latency": _latency(latencies),
+                     "accuracy": {"token_f1": round(accuracy, 4)}}
+
+
+def run_classification(items, backend, categories):
+    import numpy as np
+    from utils.insight_generator import get_embedding_model
+    model, load_s, model_mb = _load(lambda: get_embedding_model(DEVICE, backend))
+    names = list(categories)
+    matrix = model.encode(list(categories.values()), normalize_embeddings=True, show_progress_bar=False)
+
+    def classify(item):
+        embedding = model.encode([item["text"]], normalize_embeddings=True, show_progress_bar=False)[0]
+        return names[int(np.argmax(matrix @ embedding))]
+
+    outputs, latencies = _timed(classify, items)
+    accuracy = statistics.mean(float(i["category"] == o) for i, o in zip(items, outputs))
+    return outputs, {"load_s": load_s, "model_mb": model_mb, "latency": _latency(latencies),
+                     "accuracy": {"accuracy": round(accuracy, 4)}}
+
+
+def run_asr(items, backend):
+    from utils.audio_decode import decode_audio
+    from utils.audio_processor import AudioProcessor, get_whisper_model
+    # Time Whisper alone; the processor below also loads the translator but
+    # gets this model back from the registry
+    _, load_s, model_mb = _load(lambda: get_whisper_model(DEVICE, backend))
+    processor = AudioProcessor(backend=backend, device=DEVICE)
+    samples = {item["audio"]: decode_audio(item["audio"]) for item in items}
+    outputs, latencies = _timed(lambda item: processor.transcribe_segments(samples[item["audio"]])[0], items)
+    accuracy = statistics.mean(wer(i["reference"], o) for i, o in zip(items, outputs))
+    return outputs, {"load_s": load_s, "model_mb": model_mb, "latency": _latency(latencies),
+                     "accuracy": {"wer": round(accuracy, 4)}}
+
+
+def agreement(stage, fp32_outputs, int8_outputs):
+    pairs = list(zip(fp32_outputs, int8_outputs))
+    if stage == "ner":
+        return {"entity_f1": round(statistics.mean(set_f1(a, b) for a, b in pairs), 4)}
+    if stage == "translation":
+        return {
+            "token_f1": round(statistics.mean(token_f1(a, b) for a, b in pairs), 4),
+            "identical": round(statistics.mean(float(a == b) for a, b in pairs), 4)
+        }
+    if stage == "classification":
+        return {"label_agreement": round(statistics.mean(float(a == b) for a, b in pairs), 4)}
+    return {"wer": round(statistics.mean(wer(a, b) for a, b in pairs), 4)}
+
+
+def evaluate(eval_set, stages):
+    runners = {
+        "ner": lambda backend: run_ner(eval_set["ner"], backend),
+        "translation": lambda backend: run_translation(eval_set["translation"], backend),
+        "classification": lambda backend: run_classification(
+            eval_set["classification"], backend, eval_set["categories"]),
+        "asr": lambda backend: run_asr(eval_set["asr"], backend)
+    }
+    from utils.model_registry import get_registry
+
+    report = {}
+    for stage in stages:
+        if not eval_set.get(stage):
+            report[stage] = {"skipped": "no evaluation items"}
+            continue
+        outputs, results = {}, {}
+        for backend in ("fp32", "int8"):
+            print(f"{stage}: {backend}", file=sys.stderr)
+            outputs[backend], results[backend] = runners[stage](backend)
+            # One model at a time, so memory and cache effects don't leak between runs
+            get_registry().clear()
+        fp32_median = results["fp32"]["latency"]["median_ms"]
+        report[stage] = {
+            **results,
+            "int8_agreement_with_fp32": agreement(stage, outputs["fp32"], outputs["int8"]),
+            "int8_speedup": round(fp32_median / max(results["int8"]["latency"]["median_ms"], 1e-3), 2)
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare fp32 and int8 inference per stage")
+    parser.add_argument("--eval-set", default=EVAL_SET)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--asr", default=None, help='JSON list of {"audio": path, "reference": text}')
+    parser.add_argument("--threads", type=int, default=None, help="torch threads for every stage")
+    parser.add_argument("--save-quantized", action="store_true", help="Write the int8 weights to disk")
+    parser.add_argument("--output", default=None, help="Write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    from config import INFERENCE_BACKEND
+    if args.threads:
+        INFERENCE_BACKEND["threads"] = dict.fromkeys(INFERENCE_BACKEND["threads"], args.threads)
+        import torch
+        torch.set_num_threads(args.threads)
+    if args.save_quantized:
+        INFERENCE_BACKEND["save_quantized"] = True
+
+    with open(args.eval_set, encoding="utf-8") as f:
+        eval_set = json.load(f)
+    if args.asr:
+        with open(args.asr, encoding="utf-8") as f:
+            eval_set["asr"] = json.load(f)
+
+    report = {"device": DEVICE, "threads": args.threads, "stages": evaluate(eval_set, args.stages)}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Rule-count scaling benchmark for utils/rule_engine.py.
+
+Usage:
+    python -m benchmarks.rules --counts 7 50 200 1000 --transcripts 500
+
+The shipped extraction_rules.json is padded with synthetic keyword rules
+("unit 12 responding", "badge 4411", ...) up to each rule count, and the same
+transcripts (from benchmarks/corpus.py, with a few trigger words sprinkled in)
+are run through:
+- per_rule: one compiled re.finditer pass per rule over the whole text, the
+  way NLPProcessor used to extract locations, times and suspects
+- engine: RuleEngine.extract_batch (one tokenizing pass, rules tried only at
+  their trigger words)
+Reports microseconds per transcript and the slowdown relative to the smallest
+rule count; the engine's should stay close to 1.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from benchmarks.startup import ROOT
+
+KEYWORDS = ("unit", "badge", "case", "car", "sector", "beat", "zone", "incident")
+
+
+def synthetic_rules(count, base):
+    """``base`` plus keyword rules up to ``count`` rules, each with its own trigger word"""
+    rules = list(base)
+    i = 0
+    while len(rules) < count:
+        keyword = f"{KEYWORDS[i % len(KEYWORDS)]}{i // len(KEYWORDS)}"
+        rules.append({
+            "name": f"synthetic_{i}",
+            "type": "codes",
+            "triggers": [keyword],
+            "pattern": rf"{keyword}\s+(?P<code>\d{{1,4}})(?:\s+(?:responding|en\s+route|on\s+scene))?",
+            "ignore_case": True,
+            "value": f"{keyword} {{code}}"
+        })
+        i += 1
+    return rules
+
+
+def transcripts(n, count, seed=0):
+    from benchmarks.corpus import make_transcript
+    rng = random.Random(seed)
+    texts = []
+    for index in range(n):
+        text = make_transcript(rng, index)["text"]
+        # A couple of synthetic codes per call, so the extra rules have work to do
+        words = text.split()
+        for _ in range(2):
+            keyword = f"{rng.choice(KEYWORDS)}{rng.randrange(max(1, count // len(KEYWORDS)))}"
+            words.insert(rng.randrange(len(words) + 1), f"{keyword} {rng.randrange(100)}")
+        texts.append(" ".join(words))
+    return texts
+
+
+def per_rule(rules):
+    """The pre-engine approach: every rule scans every transcript"""
+    compiled = [re.compile(r["pattern"], re.IGNORECASE if r.get("ignore_case") else 0) for r in rules]
+
+    def run(texts):
+        return [[m.group(0) for pattern in compiled for m in pattern.finditer(text)] for text in texts]
+    return run
+
+
+def timed(run, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(texts)
+        best = min(best, time.perf_counter() - started)
+    return best / len(texts) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extraction cost as the number of rules grows")
+    parser.add_argument("--counts", type=int, nargs="+", default=[7, 50, 200, 1000])
+    parser.add_argument("--transcripts", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5, help="Best of this many runs")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    from utils.rule_engine import RuleEngine, load_rules
+    base = load_rules()
+
+    report = []
+    for count in sorted(args.counts):
+        rules = synthetic_rules(count, base)
+        texts = transcripts(args.transcripts, count)
+        engine = RuleEngine(rules)
+        report.append({
+            "rules": len(rules),
+            "per_rule_us": round(timed(per_rule(rules), texts, args.repeat), 1),
+            "engine_us": round(timed(engine.extract_batch, texts, args.repeat), 1)
+        })
+    for row in report:
+        row["per_rule_slowdown"] = round(row["per_rule_us"] / report[0]["per_rule_us"], 2)
+        row["engine_slowdown"] = round(row["engine_us"] / report[0]["engine_us"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
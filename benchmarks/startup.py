@@ -0,0 +1,133 @@
+"""Cold-start benchmark for the Streamlit app.
+
+Usage:
+    python -m benchmarks.startup --runs 3
+    python -m benchmarks.startup --audio police_call.mp3 --skip-result
+
+Every run uses a fresh interpreter and reports:
+- import_s: time to import app.py (and whether torch/transformers got pulled in)
+- first_render_s: import plus one pass of main(), i.e. the work done before
+  the page is drawn (run in Streamlit's bare mode, without a browser)
+- first_result_s: time until process_audio returns for a sample call, which
+  includes waiting for the background model warm-up
+All times are measured from interpreter start, so interpreter boot counts.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import wave
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import io, json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, os.environ["BENCH_ROOT"])
+out = {}
+import app
+out["import_s"] = time.perf_counter() - started
+out["torch_imported"] = "torch" in sys.modules
+out["transformers_imported"] = "transformers" in sys.modules
+app.main()
+out["first_render_s"] = time.perf_counter() - started
+
+audio = os.environ.get("BENCH_AUDIO")
+if audio:
+    class Upload(io.BytesIO):
+        def __init__(self, path):
+            super().__init__(open(path, "rb").read())
+            self.name = os.path.basename(path)
+            self.size = len(self.getvalue())
+    result = app.process_audio(Upload(audio))
+    out["first_result_s"] = time.perf_counter() - started
+    out["result_ok"] = result is not None
+    out["warmup"] = app.start_model_warmup().status()
+print("BENCH_RESULT " + json.dumps(out))
+"""
+
+
+def synthetic_call(path, seconds=20, sample_rate=16000, seed=None):
+    """Tone bursts separated by pauses; random noise keeps each file's hash unique"""
+    rng = random.Random(seed)
+    frames = bytearray()
+    for i in range(seconds * sample_rate):
+        t = i / sample_rate
+        voiced = int(t) % 4 < 3
+        value = 0.3 * math.sin(2 * math.pi * 220 * t) if voiced else 0.0
+        value += rng.uniform(-0.002, 0.002)
+        frames += struct.pack("<h", int(max(-1.0, min(1.0, value)) * 32767))
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(bytes(frames))
+    return path
+
+
+def run_once(audio=None):
+    # Measures the in-process pipeline and its warm-up, not the job service client
+    env = dict(os.environ, BENCH_ROOT=ROOT, JOB_SERVICE="0")
+    if audio:
+        env["BENCH_AUDIO"] = audio
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            return json.loads(line[len("BENCH_RESULT "):])
+    raise RuntimeError(f"Benchmark run failed:\n{proc.stderr[-2000:]}")
+
+
+def summarize(runs, key):
+    values = [r[key] for r in runs if key in r]
+    if not values:
+        return None
+    return {
+        "median_s": round(statistics.median(values), 3),
+        "min_s": round(min(values), 3),
+        "max_s": round(max(values), 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app import, first render and first result times")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--audio", default=None, help="Recording to analyze (default: synthetic 20 s call)")
+    parser.add_argument("--skip-result", action="store_true", help="Only measure import and first render")
+    parser.add_argument("--output", default=None, help="Write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.runs):
+            audio = None
+            if not args.skip_result:
+                audio = args.audio or synthetic_call(os.path.join(tmp, f"call_{i}.wav"), seed=i)
+            runs.append(run_once(audio))
+            print(f"run {i + 1}/{args.runs}: " + json.dumps({k: v for k, v in runs[-1].items() if k != "warmup"}),
+                  file=sys.stderr)
+
+    report = {
+        "runs": runs,
+        "import": summarize(runs, "import_s"),
+        "first_render": summarize(runs, "first_render_s"),
+        "first_result": summarize(runs, "first_result_s")
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
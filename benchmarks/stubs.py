@@ -0,0 +1,227 @@
+"""Deterministic stand-ins for every model the pipelines load.
+
+The stubs are placed in the model registry under the real model IDs before a
+pipeline runs, so the production code paths (segmentation, batching, caching,
+lexicon, similarity math) are exercised unchanged while the models themselves
+answer instantly, offline and identically on every run. ``cost_ms`` adds a
+fixed simulated cost per item for runs that should include model time.
+"""
+import hashlib
+import random
+import re
+import time
+from types import SimpleNamespace
+import numpy as np
+from benchmarks.corpus import NAMES, PLACES, make_transcript
+
+EMBEDDING_DIM = 384
+
+# Non-English utterances the stub ASR emits, with the translation the stub
+# translator returns for each
+SPANISH = {
+    "Hay un hombre con un cuchillo en la puerta de mi casa.": "There is a man with a knife at the door of my house.",
+    "Me robaron el bolso en la estación de tren.": "My bag was stolen at the train station.",
+    "Mi vecino está amenazando a todos con una pistola.": "My neighbor is threatening everyone with a pistol.",
+    "Por favor, vengan rápido, hay mucha sangre.": "Please come quickly, there is a lot of blood."
+}
+
+_rng = random.Random(0)
+UTTERANCES = [make_transcript(_rng, i)["text"] for i in range(40)] + list(SPANISH)
+_SENTENCE = re.compile(r'(?<=[.!?])\s+')
+_TOKEN = re.compile(r"[a-z0-9']+")
+_ENTITIES = re.compile("|".join(re.escape(e) for e in sorted(NAMES + PLACES, key=len, reverse=True)))
+
+
+def _digest(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def _utterance(data):
+    """Same audio in, same utterance out"""
+    text = UTTERANCES[_digest(data) % len(UTTERANCES)]
+    return text, "es" if text in SPANISH else "en"
+
+
+class _Stub:
+    def __init__(self, cost_ms=0.0):
+        self.cost_ms = cost_ms
+
+    def _spend(self, items=1):
+        if self.cost_ms:
+            time.sleep(self.cost_ms * items / 1000)
+
+
+class StubWhisper(_Stub):
+    """openai-whisper model: the parts AudioProcessor.transcribe_segments uses"""
+
+    def __init__(self, cost_ms=0.0):
+        super().__init__(cost_ms)
+        import torch
+        self.dims = SimpleNamespace(n_mels=80)
+        self.device = torch.device("cpu")
+
+    def decode(self, mels, options=None):
+        self._spend(len(mels))
+        results = []
+        for mel in mels:
+            text, language = _utterance(mel.cpu().numpy().tobytes())
+            results.append(SimpleNamespace(text=text, language=language))
+        return results
+
+
+class StubASRPipeline(_Stub):
+    """transformers automatic-speech-recognition pipeline"""
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        single = not isinstance(inputs, list)
+        inputs = [inputs] if single else inputs
+        self._spend(len(inputs))
+        outputs = [{"text": _utterance(np.asarray(item["raw"]).tobytes())[0]} for item in inputs]
+        return outputs[0] if single else outputs
+
+
+class StubTranslationPipeline(_Stub):
+    """Translates the known Spanish utterances, passes everything else through"""
+
+    def _translate(self, text):
+        sentences = _SENTENCE.split(text.strip())
+        return {"translation_text": " ".join(SPANISH.get(s, s) for s in sentences)}
+
+    def __call__(self, inputs, **kwargs):
+        if isinstance(inputs, list):
+            self._spend(len(inputs))
+            return [self._translate(text) for text in inputs]
+        self._spend()
+        return [self._translate(inputs)]
+
+
+class StubNERPipeline(_Stub):
+    """Tags the corpus names as PER and places as LOC, with character offsets"""
+
+    def _tag(self, text):
+        return [
+            {
+                "entity_group": "PER" if match.group() in NAMES else "LOC",
+                "word": match.group(),
+                "score": 0.99,
+                "start": match.start(),
+                "end": match.end()
+            }
+            for match in _ENTITIES.finditer(text)
+        ]
+
+    def __call__(self, inputs, **kwargs):
+        if isinstance(inputs, list):
+            self._spend(len(inputs))
+            return [self._tag(text) for text in inputs]
+        self._spend()
+        return self._tag(inputs)
+
+
+def _token_vector(token):
+    seed = _digest(token.encode("utf-8"))
+    index = seed % EMBEDDING_DIM
+    return index, 1.0 if (seed >> 32) & 1 else -1.0
+
+
+class StubSentenceEncoder(_Stub):
+    """Hashed bag of words; texts sharing words get similar embeddings"""
+
+    def get_sentence_embedding_dimension(self):
+        return EMBEDDING_DIM
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=None, convert_to_numpy=True,
+               normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        self._spend(len(sentences))
+        embeddings = np.zeros((len(sentences), EMBEDDING_DIM), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            for token in _TOKEN.findall(sentence.lower()):
+                index, sign = _token_vector(token)
+                embeddings[row, index] += sign
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+class StubZeroShotPipeline(_Stub):
+    """Scores each label by the share of its words found in the text"""
+
+    def _classify(self, text, labels, multi_label):
+        words = set(_TOKEN.findall(text.lower()))
+        raw = []
+        for label in labels:
+            label_words = _TOKEN.findall(label.lower())
+            raw.append(sum(w in words for w in label_words) / max(1, len(label_words)))
+        if not multi_label:
+            total = sum(raw)
+            raw = [r / total for r in raw] if total else [1.0 / len(labels)] * len(labels)
+        ranked = sorted(zip(labels, raw), key=lambda pair: -pair[1])
+        return {"sequence": text, "labels": [l for l, _ in ranked], "scores": [s for _, s in ranked]}
+
+    def __call__(self, sequences, candidate_labels, multi_label=False, batch_size=None, **kwargs):
+        if isinstance(sequences, str):
+            self._spend()
+            return self._classify(sequences, candidate_labels, multi_label)
+        self._spend(len(sequences))
+        return [self._classify(text, candidate_labels, multi_label) for text in sequences]
+
+
+def _whisper(cost_ms):
+    from utils.audio_processor import whisper_registry_id
+    return [(whisper_registry_id(), StubWhisper(cost_ms))]
+
+
+def _translation(cost_ms):
+    from utils.audio_processor import TRANSLATION_MODEL
+    return [(TRANSLATION_MODEL, StubTranslationPipeline(cost_ms))]
+
+
+def _ner(cost_ms):
+    from utils.nlp_processor import NER_MODELS
+    return [(model_id, StubNERPipeline(cost_ms)) for model_id in NER_MODELS.values()]
+
+
+def _embedding(cost_ms):
+    from utils.insight_generator import EMBEDDING_MODEL
+    return [(EMBEDDING_MODEL, StubSentenceEncoder(cost_ms))]
+
+
+def _zero_shot(cost_ms):
+    from utils.cache import ZERO_SHOT_MODEL
+    return [(ZERO_SHOT_MODEL, StubZeroShotPipeline(cost_ms))]
+
+
+def _app(cost_ms):
+    from app import MODEL_IDS
+    return [
+        (MODEL_IDS["whisper"], StubASRPipeline(cost_ms)),
+        (MODEL_IDS["translator"], StubTranslationPipeline(cost_ms)),
+        (MODEL_IDS["ner"], StubNERPipeline(cost_ms))
+    ]
+
+
+STUB_GROUPS = {
+    "whisper": _whisper,
+    "translation": _translation,
+    "ner": _ner,
+    "embedding": _embedding,
+    "zero_shot": _zero_shot,
+    "app": _app
+}
+
+
+def install_stubs(groups, cost_ms=0.0, device=None):
+    """Register stubs for the given model groups under their real model IDs"""
+    from config import INFERENCE_BACKEND
+    from utils.model_registry import get_model
+    # Stubs have nothing to quantize, and int8 would move them to other registry keys
+    INFERENCE_BACKEND["mode"] = "fp32"
+    installed = []
+    for group in groups:
+        for model_id, stub in STUB_GROUPS[group](cost_ms):
+            get_model(model_id, lambda _device, stub=stub: stub, device)
+            installed.append(model_id)
+    return installed
@@ -1,21 +1,214 @@
 import os
 
+# Point at tools/hf_stub_server.py (e.g. http://127.0.0.1:8765) for offline testing
+HF_API_BASE = os.getenv("HF_API_BASE", "https://api-inference.huggingface.co").rstrip("/")
+
 # Hugging Face configuration
 HF_CONFIG = {
     "whisper": {
-        "api": "https://api-inference.huggingface.co/models/openai/whisper-base",
+        "api": f"{HF_API_BASE}/models/openai/whisper-base",
         "local_fallback": False
     },
     "translation": {
-        "api": "https://api-inference.huggingface.co/models/Helsinki-NLP/opus-mt-mul-en",
+        "api": f"{HF_API_BASE}/models/Helsinki-NLP/opus-mt-mul-en",
         "local_fallback": False
     },
     "ner": {
-        "api": "https://api-inference.huggingface.co/models/dslim/bert-base-NER",
+        "api": f"{HF_API_BASE}/models/dslim/bert-base-NER",
         "local_fallback": False
     }
 }
 
+# Shared async HTTP client for the HF_CONFIG endpoints (see utils/hf_client.py)
+HF_CLIENT = {
+    "max_connections": 32,       # pooled keep-alive connections
+    "max_concurrency": 16,       # requests in flight at once
+    "timeout_s": 60,             # whole request, including model cold start
+    "connect_timeout_s": 5,
+    "retries": 3,
+    "backoff_s": 0.5,            # doubled on each retry, with jitter
+    "max_backoff_s": 10
+}
+
 MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB limit
+
+# Silence trimming and pause-based splitting of long calls (see utils/segmenter.py)
+SEGMENT_CONFIG = {
+    "frame_ms": 30,
+    "margin_db": 12.0,
+    "min_silence_ms": 600,
+    "min_speech_ms": 250,
+    "pad_ms": 200,
+    "max_segment_s": 30.0  # Whisper's context window
+}
+SEGMENT_BATCH_SIZE = 8  # Segments decoded together in one forward pass
+# Cascaded weapon detection in processors/nlp.py: MiniLM similarity below
+# embedding_low drops a sentence, above embedding_high labels it, anything in
+# between goes to BART-MNLI zero-shot
+WEAPON_CASCADE = {
+    "embedding_low": 0.25,
+    "embedding_high": 0.6,
+    "zero_shot_threshold": 0.4
+}
+
+# Tiered crime classification in processors/insights.py: the embedding answer is
+# kept when top-1 beats top-2 by at least margin, otherwise zero-shot decides
+CLASSIFIER_TIERS = {
+    "margin": 0.08,
+    "embedding_threshold": 0.4,
+    "zero_shot_threshold": 0.5,
+    "zero_shot_batch_size": 8
+}
+
+# Process-wide model registry (see utils/model_registry.py); least recently used
+# models are evicted once their combined size exceeds the budget
+MODEL_REGISTRY = {
+    "memory_budget_mb": int(os.getenv("MODEL_MEMORY_BUDGET_MB", "6144"))
+}
+
+# CPU inference backend: "fp32" or "int8" (dynamic quantization of Linear
+# layers, see utils/quantization.py). Thread counts are per stage; None leaves
+# torch's default. Quantized weights can be written to quantized_dir and are
+# reused from there on the next load.
+def _threads(name):
+    value = os.getenv(f"{name}_THREADS")
+    return int(value) if value else None
+
+INFERENCE_BACKEND = {
+    "mode": os.getenv("INFERENCE_BACKEND", "fp32"),
+    "threads": {
+        "whisper": _threads("WHISPER"),
+        "translation": _threads("TRANSLATION"),
+        "ner": _threads("NER"),
+        "embedding": _threads("EMBEDDING")
+    },
+    "save_quantized": os.getenv("SAVE_QUANTIZED", "0") == "1",
+    "quantized_dir": "./cache/quantized"
+}
+
+# Content-addressed cache of per-stage results (see utils/result_cache.py)
+RESULT_CACHE = {
+    "path": "./cache/results.sqlite",
+    "max_bytes": 512 * 1024 * 1024
+}
+
+# Archive of processed calls for cross-call queries (see utils/analytics_store.py)
+ANALYTICS_STORE = {
+    "enabled": os.getenv("ANALYTICS_STORE", "1") == "1",
+    "path": "./cache/analytics.sqlite"
+}
+
+# Live counts per category, location and weapon (see utils/rolling_aggregates.py);
+# each window is (bucket width in seconds, number of buckets)
+ROLLING_AGGREGATES = {
+    "enabled": os.getenv("ROLLING_AGGREGATES", "1") == "1",
+    "windows": {
+        "hour": (60, 60),
+        "day": (900, 96),
+        "week": (3600, 168)
+    },
+    "top_k": 10,
+    "snapshot_path": "./cache/aggregates.json.gz",
+    "snapshot_interval_s": 60
+}
+
+# Near-duplicate incident linking (see utils/incident_index.py): calls within
+# window_s of each other whose MiniLM transcript embeddings are at least
+# threshold similar are linked; the index switches to IVF at ivf_min_size calls
+INCIDENT_INDEX = {
+    "enabled": os.getenv("INCIDENT_INDEX", "1") == "1",
+    "path": "./cache/incident_index.npz",
+    "window_s": 6 * 3600,
+    "retention_s": 7 * 86400,
+    "threshold": 0.8,
+    "max_results": 5,
+    "ivf_min_size": 4096,
+    "nprobe": 8,
+    "save_interval_s": 60
+}
+
+# Location normalization against gazetteer.json (see utils/gazetteer.py)
+GAZETTEER = {
+    "enabled": os.getenv("GAZETTEER", "1") == "1",
+    "min_similarity": 0.6,
+    "min_trie_score": 0.6,
+    "memo_size": 50000
+}
+
+# Live streaming ingest (see utils/streaming.py and stream.py): 16 kHz s16le
+# mono PCM is buffered, checked for finished phrases every step_s, and a
+# phrase is transcribed once finalize_silence_ms of silence follows it (or the
+# pending audio reaches max_window_s)
+STREAMING = {
+    "host": os.getenv("STREAM_HOST", "127.0.0.1"),
+    "port": int(os.getenv("STREAM_PORT", "8770")),
+    "step_s": 1.0,
+    "buffer_s": 120,
+    "max_window_s": 15.0,
+    "finalize_silence_ms": 500,
+    "context_chars": 200,
+    "translate": True
+}
+
+# Sentence-level translation (see utils/translation.py): long sentences are
+# split to stay under the translation models' input limit, and translations of
+# repeated sentences are kept in an in-process LRU cache
+TRANSLATION = {
+    "max_sentence_chars": 400,
+    "sentence_cache_size": 20000
+}
+
+# Windowed NER (see utils/ner_windows.py): text longer than max_tokens is split
+# into windows overlapping by stride tokens, run as one batch and merged
+NER_WINDOWS = {
+    "enabled": os.getenv("NER_WINDOWS", "1") == "1",
+    "max_tokens": 256,
+    "stride": 32
+}
+
+# Cross-session micro-batching of model calls (see utils/batching.py): a batch
+# is flushed once it holds max_batch_size requests or its first request has
+# waited max_wait_ms
+MICRO_BATCHING = {
+    "enabled": os.getenv("MICRO_BATCHING", "1") == "1",
+    "max_wait_ms": float(os.getenv("MICRO_BATCH_WAIT_MS", "10")),
+    "max_batch_size": {
+        "ner": 16,
+        "translation": 8,
+        "embedding": 64
+    }
+}
+
+# Per-stage tracing (see utils/tracing.py): timings attached to result
+# metadata plus Prometheus histograms, served on metrics_port when set
+TRACING = {
+    "enabled": os.getenv("TRACING", "1") == "1",
+    "metrics_port": int(os.getenv("METRICS_PORT", "0")) or None,
+    # Loopback only by default; set METRICS_HOST=0.0.0.0 for a remote scraper
+    "metrics_host": os.getenv("METRICS_HOST", "127.0.0.1"),
+    "buckets": (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+}
+
+# Job service (see service.py and utils/job_service.py): uploads are queued in
+# SQLite and processed by a pool of worker processes; the app is a client of
+# it unless JOB_SERVICE=0. Submissions beyond max_queued waiting jobs are
+# rejected with 429 and retry_after_s
+JOB_SERVICE = {
+    "enabled": os.getenv("JOB_SERVICE", "1") == "1",
+    "url": os.getenv("JOB_SERVICE_URL", "http://127.0.0.1:8780"),
+    "unix_socket": os.getenv("JOB_SERVICE_SOCKET") or None,
+    "db_path": "./cache/jobs.sqlite",
+    "spool_dir": "./cache/jobs",
+    "workers": int(os.getenv("JOB_WORKERS", "2")),
+    "max_queued": int(os.getenv("JOB_MAX_QUEUED", "32")),
+    "threshold": 0.4,
+    "retry_after_s": 5,
+    "poll_interval_s": 1.0,
+    "retention_s": 7 * 24 * 3600
+}
+
+# Persisted category embeddings, one directory per model (see utils/embedding_store.py)
+EMBEDDING_CACHE_DIR = "./cache/embeddings"
+
 TEMP_DIR = "./temp_audio"
 os.makedirs(TEMP_DIR, exist_ok=True)
@@ -1,37 +1,45 @@
-import requests
-import tempfile
-from config import HF_CONFIG
+from config import HF_CONFIG, MAX_FILE_SIZE
+from utils.hf_client import endpoint_model, get_hf_client
+from utils.tracing import span
+from utils.translation import translate_text
 
 class AudioProcessor:
     def __init__(self, hf_token=None):
         self.hf_token = hf_token
-        self.headers = {"Authorization": f"Bearer {self.hf_token}"}
+        # Pooled, retrying client shared with every other processor using this token
+        self.client = get_hf_client(hf_token)
 
-    def _call_hf_api(self, endpoint, data=None, files=None):
-        response = requests.post(
-            endpoint,
-            headers=self.headers,
-            data=data,
-            files=files
-        )
-        return response.json()
+    def _call_hf_api(self, endpoint, data=None, json=None):
+        return self.client.post(endpoint, json_body=json, data=data)
 
     def transcribe(self, audio_bytes):
         """Use HF Whisper API"""
-        with tempfile.NamedTemporaryFile(suffix=".mp3") as tmp:
-            tmp.write(audio_bytes)
-            tmp.seek(0)
+        if len(audio_bytes) > MAX_FILE_SIZE:
+            raise ValueError(f"Audio file exceeds {MAX_FILE_SIZE // (1024 * 1024)}MB limit")
+        # The inference API takes the encoded audio as the raw request body
+        endpoint = HF_CONFIG["whisper"]["api"]
+        with span("transcribe", model=endpoint_model(endpoint), size=len(audio_bytes), unit="bytes"):
             return self._call_hf_api(
-                HF_CONFIG["whisper"]["api"],
-                files={"file": tmp}
+                endpoint,
+                data=audio_bytes
             )
 
     def translate(self, text, source_lang):
         """Use HF Translation API"""
-        return self._call_hf_api(
+        endpoint = HF_CONFIG["translation"]["api"]
+        with span("translate", model=endpoint_model(endpoint), size=len(text), unit="chars"):
+            return self._call_hf_api(
+                endpoint,
+                json={"inputs": text}
+            )
+
+    def _translate_batch(self, sentences):
+        """One API request for a list of sentences"""
+        outputs = self._call_hf_api(
             HF_CONFIG["translation"]["api"],
-            json={"inputs": text}
+            json={"inputs": sentences}
         )
+        return [(out[0] if isinstance(out, list) else out)["translation_text"] for out in outputs]
 
     def process(self, audio_bytes):
         """Complete audio processing pipeline"""
@@ -42,14 +50,14 @@ class AudioProcessor:
         if not transcript:
             return {"text": "", "translated": False}
         
-        # Step 2: Language detection (simple heuristic)
-        is_english = all(ord(c) < 128 for c in transcript)
+        # Step 2: Translate the sentences that are not English, repeated ones from cache
+        model_id = endpoint_model(HF_CONFIG["translation"]["api"])
+        with span("translate", model=model_id, size=len(transcript), unit="chars"):
+            translated, was_translated = translate_text(transcript, self._translate_batch, model_id)
         
-        # Step 3: Translation if needed
-        if not is_english:
-            translation = self.translate(transcript, "auto")
+        if was_translated:
             return {
-                "text": translation[0]["translation_text"],
+                "text": translated,
                 "original": transcript,
                 "translated": True
             }
@@ -1,15 +1,12 @@
-from transformers import pipeline
-from config import MODELS
-from utils.cache import load_model
+from config import CLASSIFIER_TIERS
+from utils.cache import ZERO_SHOT_MODEL, get_zero_shot_pipeline
+from utils.insight_generator import get_classifier
+from utils.tracing import span
 
 class CrimeClassifier:
     def __init__(self):
-        # Load zero-shot classification model
-        self.classifier = load_model(
-            "zero_shot_classifier",
-            lambda: pipeline("zero-shot-classification", 
-                            model="facebook/bart-large-mnli")
-        )
+        # Load zero-shot classification model (shared with weapon detection)
+        get_zero_shot_pipeline()
         
         # Define default crime categories (can be modified dynamically)
         self.categories = [
@@ -27,6 +24,10 @@ class CrimeClassifier:
             "Other"
         ]
     
+    @property
+    def classifier(self):
+        return get_zero_shot_pipeline()
+
     def update_categories(self, new_categories):
         """Update the crime categories dynamically"""
         self.categories = new_categories
@@ -47,11 +48,12 @@ class CrimeClassifier:
                 'scores': dict of all category scores
             }
         """
-        result = self.classifier(
-            text,
-            candidate_labels=self.categories,
-            multi_label=multi_label
-        )
+        with span("classify_zero_shot", model=ZERO_SHOT_MODEL, size=1, unit="texts"):
+            result = self.classifier(
+                text,
+                candidate_labels=self.categories,
+                multi_label=multi_label
+            )
         
         # Get best match
         best_label = result['labels'][0]
@@ -66,3 +68,125 @@ class CrimeClassifier:
             'confidence': float(best_score),
             'scores': dict(zip(result['labels'], result['scores']))
         }
+
+    def classify_batch(self, texts, threshold=0.5, multi_label=False,
+                       candidate_labels=None, batch_size=CLASSIFIER_TIERS["zero_shot_batch_size"]):
+        """Zero-shot classify many texts in batched pipeline calls; same result shape as classify"""
+        texts = list(texts)
+        if not texts:
+            return []
+        with span("classify_zero_shot", model=ZERO_SHOT_MODEL, size=len(texts), unit="texts"):
+            outputs = self.classifier(
+                texts,
+                candidate_labels=candidate_labels or self.categories,
+                multi_label=multi_label,
+                batch_size=batch_size
+            )
+        if isinstance(outputs, dict):
+            outputs = [outputs]
+
+        results = []
+        for result in outputs:
+            best_label = result['labels'][0]
+            best_score = result['scores'][0]
+            results.append({
+                'label': best_label if best_score >= threshold else "Other",
+                'confidence': float(best_score),
+                'scores': dict(zip(result['labels'], result['scores']))
+            })
+        return results
+
+
+class TieredCrimeClassifier:
+    """
+    Embedding classifier first, zero-shot only when it is unsure
+
+    The MiniLM classifier from utils/insight_generator answers when its top-1
+    score beats the top-2 score by at least ``margin``; otherwise the call is
+    escalated to BART-MNLI zero-shot over the same taxonomy (category
+    descriptions as hypotheses). Each result records the tier that decided it.
+
+    Only benchmarks/pipeline.py runs it so far; the app, batch.py and the job
+    service classify with the embedding classifier alone.
+    """
+
+    def __init__(self, margin=CLASSIFIER_TIERS["margin"]):
+        self.margin = margin
+        self.embedding_classifier = get_classifier()
+        self._zero_shot = None
+        self.tier_counts = {"embedding": 0, "zero_shot": 0}
+
+    @property
+    def zero_shot_classifier(self):
+        # BART is only loaded once a call actually needs it
+        if self._zero_shot is None:
+            self._zero_shot = CrimeClassifier()
+        return self._zero_shot
+
+    def classify_batch(self, texts, threshold=CLASSIFIER_TIERS["embedding_threshold"],
+                       zero_shot_threshold=CLASSIFIER_TIERS["zero_shot_threshold"]):
+        """
+        Returns:
+            list: One dict per text: {
+                'label': category name,
+                'confidence': float,
+                'margin': top-1 minus top-2 embedding score,
+                'tier': "embedding" or "zero_shot"
+            }
+        """
+        texts = list(texts)
+        results = []
+        escalate = []
+        for i, result in enumerate(self.embedding_classifier.classify_batch(texts, threshold, top_k=2)):
+            top = result['top_k']
+            margin = top[0][1] - top[1][1] if len(top) > 1 else top[0][1]
+            results.append({
+                'label': result['category'],
+                'confidence': result['confidence'],
+                'margin': float(margin),
+                'tier': "embedding"
+            })
+            if margin < self.margin:
+                escalate.append(i)
+
+        if escalate:
+            by_hypothesis = self._hypotheses(self.embedding_classifier.categories)
+            zero_shot = self.zero_shot_classifier.classify_batch(
+                [texts[i] for i in escalate],
+                threshold=zero_shot_threshold,
+                candidate_labels=list(by_hypothesis)
+            )
+            for i, result in zip(escalate, zero_shot):
+                results[i].update(
+                    label=by_hypothesis.get(result['label'], "Other"),
+                    confidence=result['confidence'],
+                    tier="zero_shot"
+                )
+
+        self.tier_counts["zero_shot"] += len(escalate)
+        self.tier_counts["embedding"] += len(texts) - len(escalate)
+        return results
+
+    @staticmethod
+    def _hypotheses(categories):
+        """
+        Zero-shot hypothesis -> category name, one per category
+
+        The hypothesis is the category's description; a description shared
+        with another category (or missing) is prefixed with the name, so no
+        category is dropped or answered for by another.
+        """
+        counts = {}
+        for desc in categories.values():
+            counts[desc] = counts.get(desc, 0) + 1
+        hypotheses = {}
+        for name, desc in categories.items():
+            if not desc:
+                hypotheses[name] = name
+            else:
+                hypotheses[desc if counts[desc] == 1 else f"{name}: {desc}"] = name
+        return hypotheses
+
+    def classify(self, text, threshold=CLASSIFIER_TIERS["embedding_threshold"],
+                 zero_shot_threshold=CLASSIFIER_TIERS["zero_shot_threshold"]):
+        return self.classify_batch([text], threshold, zero_shot_threshold)[0]
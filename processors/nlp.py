@@ -1,26 +1,76 @@
 import re
-import requests
-from transformers import pipeline
-from config import HF_CONFIG
-from utils.cache import load_model
+import numpy as np
+from config import HF_CONFIG, WEAPON_CASCADE
+from utils import batching
+from utils.cache import get_zero_shot_pipeline
+from utils.gazetteer import resolve_locations
+from utils.hf_client import endpoint_model, get_hf_client
+from utils.insight_generator import EMBEDDING_MODEL, get_embedding_model
+from utils.quantization import model_tag
+from utils.rule_engine import get_rule_engine
+from utils.tracing import span
+from utils.weapon_lexicon import get_weapon_matcher
+
+# Contextual cues that make a sentence worth a closer look even without a lexicon hit
+THREAT_CONTEXT = re.compile(
+    r'\b(?:pulled\s+out|pointing|pointed|brandishing|wielding|armed|shot|shoot(?:ing)?|'
+    r'stabb(?:ed|ing)|hit\s+(?:him|her|me)\s+with|threaten(?:ed|ing)?|waving)\b',
+    re.IGNORECASE
+)
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+
+WEAPON_TIERS = ("lexical", "embedding", "zero_shot")
+
+def _sentence_spans(text):
+    """(start, end) offsets of the non-empty sentences in text"""
+    spans = []
+    start = 0
+    for boundary in SENTENCE_SPLIT.finditer(text):
+        if text[start:boundary.start()].strip():
+            spans.append((start, boundary.start()))
+        start = boundary.end()
+    if text[start:].strip():
+        spans.append((start, len(text)))
+    return spans
 
 class NLPProcessor:
-    def __init__(self, hf_token=None):
+    def __init__(self, hf_token=None, weapon_mode="cascade"):
+        """
+        Args:
+            hf_token (str): Hugging Face API token for the NER endpoint
+            weapon_mode (str): "cascade" runs the lexicon and an embedding check
+                first and BART-MNLI only on ambiguous sentences; "zero_shot"
+                runs BART-MNLI over the whole transcript on every call
+        """
         self.hf_token = hf_token
-        self.headers = {"Authorization": f"Bearer {self.hf_token}" if hf_token else {}}
+        self.client = get_hf_client(hf_token)
+        self.weapon_mode = weapon_mode
+        self.cascade_config = dict(WEAPON_CASCADE)
         
-        # Load models
-        self.weapon_classifier = load_model(
-            "weapon_classifier",
-            lambda: pipeline("zero-shot-classification", 
-                           model="facebook/bart-large-mnli")
-        )
+        if weapon_mode == "zero_shot":
+            get_zero_shot_pipeline()
         
+        self.weapon_matcher = get_weapon_matcher('en')
+        self.rule_engine = get_rule_engine()
+
         # Enhanced weapon categories
         self.weapon_categories = [
             "gun", "knife", "firearm", "handgun", "rifle",
             "shotgun", "blunt object", "sharp object", "explosive"
         ]
+        self._weapon_prototypes = None
+
+        # How often each tier settled a sentence, and a whole call
+        self.weapon_tier_counts = {
+            "sentences": dict.fromkeys(WEAPON_TIERS, 0),
+            "calls": dict.fromkeys(WEAPON_TIERS, 0)
+        }
+
+    @property
+    def weapon_classifier(self):
+        # Fetched from the registry on use: shared with the crime classifier,
+        # evictable, and in cascade mode only loaded once a sentence needs it
+        return get_zero_shot_pipeline()
 
     def extract_entities(self, text):
         """Enhanced entity extraction for police calls"""
@@ -31,83 +81,48 @@ class NLPProcessor:
             "weapons": set()
         }
 
-        # 1. Extract locations with multiple methods
-        self._extract_locations(text, results)
-        
-        # 2. Extract time references
-        self._extract_times(text, results)
-        
-        # 3. Extract suspects with context awareness
-        self._extract_suspects(text, results)
+        size = len(text)
+
+        # 1. Locations, times and suspects from the extraction rules, in one pass
+        with span("rules", size=size, unit="chars"):
+            matched = self.rule_engine.extract(text)
+        for key in ("locations", "times", "suspects"):
+            results[key].update(matched.get(key, []))
+
+        # 2. Locations from the NER API
+        with span("locations", model=endpoint_model(HF_CONFIG["ner"]["api"]), size=size, unit="chars"):
+            self._extract_locations(text, results)
         
-        # 4. Detect weapons with zero-shot and regex
-        self._detect_weapons(text, results)
+        # 3. Detect weapons with zero-shot and the weapon lexicon
+        with span("weapons", size=size, unit="chars"):
+            weapon_mentions = self._detect_weapons(text, results)
 
-        return {k: list(v) for k, v in results.items()}
+        results = {k: list(v) for k, v in results.items()}
+        results["weapon_mentions"] = weapon_mentions
+        results["rule_mentions"] = matched["mentions"]
+        # 4. Map location strings to canonical gazetteer places
+        with span("gazetteer", size=len(results["locations"]), unit="mentions"):
+            results["places"] = resolve_locations(results["locations"])
+        return results
 
     def _extract_locations(self, text, results):
-        """Multi-method location extraction"""
-        # Method 1: Address patterns "1330 Alpha Sayo Day"
-        address_pattern = r'\d{3,4}\s+[A-Z][A-Za-z\s\-]+(?:\s+(?:street|st|avenue|ave|road|rd))?'
-        addresses = re.findall(address_pattern, text)
-        results["locations"].update(addresses)
-        
-        # Method 2: Business names  "Pete's coffee"
-        business_pattern = r'(?:at|in)\s+([A-Z][A-Za-z0-9\'\s]+(?:store|shop|coffee|bar|restaurant|market))'
-        businesses = re.findall(business_pattern, text, re.IGNORECASE)
-        results["locations"].update(businesses)
-        
-        # Method 3: NER API fallback
+        """NER API locations; address and business patterns are rules in extraction_rules.json"""
         try:
-            response = requests.post(
+            entities = self.client.post(
                 HF_CONFIG["ner"]["api"],
-                headers=self.headers,
-                json={"inputs": text}
+                json_body={"inputs": text}
             )
-            for entity in response.json():
+            for entity in entities:
                 if entity["entity_group"] in ["LOC", "GPE", "FAC"]:
                     results["locations"].add(entity["word"])
         except Exception as e:
             print(f"NER API error: {e}")
 
-    def _extract_times(self, text, results):
-        """Extract absolute and relative time references"""
-        # Relative times  "right now"
-        relative_times = re.findall(
-            r'(?:right\s+now|currently|at\s+this\s+time|just\s+now)',
-            text, re.IGNORECASE
-        )
-        results["times"].update(rt.lower() for rt in relative_times)
-        
-        # Clock times  "3:45 PM"
-        clock_times = re.findall(
-            r'\d{1,2}:\d{2}\s*(?:AM|PM)?',
-            text, re.IGNORECASE
-        )
-        results["times"].update(clock_times)
-
-    def _extract_suspects(self, text, results):
-        """Context-aware suspect extraction"""
-        # Pattern 1: Suspect descriptions  "white male about 40"
-        desc_pattern = r'(white|black|hispanic|asian)\s+(male|female)\s+(?:about|approximately)?\s*(\d{2})?'
-        for race, gender, age in re.findall(desc_pattern, text, re.IGNORECASE):
-            desc = f"{race.lower()} {gender.lower()}"
-            if age:
-                desc += f" ~{age}"
-            results["suspects"].add(desc)
-        
-        # Pattern 2: Names in suspect context
-        suspect_pattern = r'(suspect|shooter|attacker|perpetrator|intruder)\s+(?:is\s+)?([A-Z][a-z]+)'
-        for _, name in re.finditer(suspect_pattern, text, re.IGNORECASE):
-            results["suspects"].add(name)
-        
-        # Pattern 3: Clothing descriptions  "wearing red hat"
-        clothing_pattern = r'(?:wearing|has)\s+(?:a\s+)?([a-z]+\s+(?:hat|jacket|shirt|sweater))'
-        for clothing in re.findall(clothing_pattern, text, re.IGNORECASE):
-            results["suspects"].add(f"wearing {clothing}")
-
     def _detect_weapons(self, text, results):
         """Multi-method weapon detection"""
+        if self.weapon_mode == "cascade":
+            return self._detect_weapons_cascade(text, results)
+
         # Method 1: Zero-shot classification
         try:
             classification = self.weapon_classifier(
@@ -116,16 +131,104 @@ class NLPProcessor:
                 multi_label=True
             )
             for label, score in zip(classification['labels'], classification['scores']):
-                if score >= 0.4:  # Lower threshold for police calls
+                if score >= self.cascade_config["zero_shot_threshold"]:  # Lower threshold for police calls
                     results["weapons"].add(label)
         except Exception as e:
             print(f"Weapon classification error: {e}")
         
-        # Method 2: Contextual regex pattern
-        weapon_pattern = r'(?:has|with|pulled\s+out|brandishing|wielding|shot\s+with)\s+(?:a\s+)?(gun|knife|weapon|firearm|pistol|rifle|handgun)'
-        for weapon in re.findall(weapon_pattern, text, re.IGNORECASE):
-            results["weapons"].add(weapon.lower())
+        # Method 2: Lexicon match (single pass, canonical types with spans)
+        mentions = self.weapon_matcher.find(text)
+        results["weapons"].update(m["weapon"] for m in mentions)
+        return mentions
+
+    def _detect_weapons_cascade(self, text, results):
+        """
+        Cheapest tier first, per sentence:
+        1. lexicon hit -> weapon found
+        2. MiniLM similarity to the weapon categories: clearly unrelated
+           sentences are dropped, clearly matching ones are labelled
+        3. BART-MNLI zero-shot, batched, only for what is left
+        """
+        mentions = self.weapon_matcher.find(text)
+        results["weapons"].update(m["weapon"] for m in mentions)
+
+        cfg = self.cascade_config
+        sentences = _sentence_spans(text)
+        # Sentences already settled by the lexicon skip the model tiers
+        hits = [m["start"] for m in mentions]
+        undecided = [
+            text[start:end] for start, end in sentences
+            if not any(start <= h < end for h in hits)
+        ]
+        tier_counts = self.weapon_tier_counts["sentences"]
+        tier_counts["lexical"] += len(sentences) - len(undecided)
+
+        ambiguous = []
+        if undecided:
+            similarities = self._weapon_similarities(undecided)
+            for sentence, scores in zip(undecided, similarities):
+                best = int(scores.argmax())
+                threatening = THREAT_CONTEXT.search(sentence) is not None
+                if scores[best] >= cfg["embedding_high"]:
+                    results["weapons"].add(self.weapon_categories[best])
+                    tier_counts["embedding"] += 1
+                elif scores[best] < cfg["embedding_low"] and not threatening:
+                    tier_counts["embedding"] += 1
+                else:
+                    ambiguous.append(sentence)
+
+        if ambiguous:
+            tier_counts["zero_shot"] += len(ambiguous)
+            try:
+                classifications = self.weapon_classifier(
+                    ambiguous,
+                    candidate_labels=self.weapon_categories,
+                    multi_label=True
+                )
+                if isinstance(classifications, dict):
+                    classifications = [classifications]
+                for classification in classifications:
+                    for label, score in zip(classification['labels'], classification['scores']):
+                        if score >= cfg["zero_shot_threshold"]:
+                            results["weapons"].add(label)
+            except Exception as e:
+                print(f"Weapon classification error: {e}")
+
+        # A call is attributed to the most expensive tier it needed
+        if ambiguous:
+            self.weapon_tier_counts["calls"]["zero_shot"] += 1
+        elif undecided:
+            self.weapon_tier_counts["calls"]["embedding"] += 1
+        else:
+            self.weapon_tier_counts["calls"]["lexical"] += 1
+        return mentions
+
+    def _weapon_similarities(self, sentences):
+        """Cosine similarity of each sentence to each weapon category"""
+        # Prototypes and sentences share the embedding model and its batches
+        # (and thread budget) with the classifier
+        model_id = model_tag(EMBEDDING_MODEL)
+        if self._weapon_prototypes is None:
+            self._weapon_prototypes = np.vstack(batching.encode(
+                [f"someone is armed with a {label}" for label in self.weapon_categories],
+                get_embedding_model,
+                model_id
+            ))
+        embeddings = np.vstack(batching.encode(sentences, get_embedding_model, model_id))
+        return embeddings @ self._weapon_prototypes.T
+
+    def weapon_stats(self):
+        """Share of sentences and calls settled by each weapon-detection tier"""
+        stats = {}
+        for scope, counts in self.weapon_tier_counts.items():
+            total = sum(counts.values())
+            stats[scope] = {
+                tier: {"count": n, "share": n / total if total else 0.0}
+                for tier, n in counts.items()
+            }
+        return stats
 
     def update_weapon_categories(self, new_categories):
         """Dynamically update weapon categories"""
         self.weapon_categories = new_categories
+        self._weapon_prototypes = None
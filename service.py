@@ -0,0 +1,60 @@
+"""Local job service that runs call analysis outside the Streamlit process.
+
+Usage:
+    python service.py --workers 4                       # HTTP on 127.0.0.1:8780
+    python service.py --unix /tmp/police-calls.sock     # or on a Unix socket
+    JOB_SERVICE_URL=http://127.0.0.1:8780 streamlit run app.py
+
+API (JSON):
+    POST   /jobs?filename=call.mp3   body: the audio file  -> 202 job, 429 when full
+    GET    /jobs/<id>                status, with the queue position while queued
+    GET    /jobs/<id>/result         200 done (with "result"), 202 pending, 409 failed/cancelled
+    DELETE /jobs/<id>                cancel a queued or running job
+    GET    /health                   workers and job counts
+    GET    /hot-spots                rolling aggregates dashboard
+
+Jobs are kept in cache/jobs.sqlite and survive a restart. The number of
+worker processes is independent of how many app sessions are open.
+"""
+import argparse
+import sys
+from urllib.parse import urlsplit
+from aiohttp import web
+from config import JOB_SERVICE
+from utils.job_service import JobService, create_app
+from utils.tracing import start_metrics_server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Queue and run call analysis jobs in a worker pool")
+    parser.add_argument("--host", default=None, help="Address to listen on (default: from JOB_SERVICE_URL)")
+    parser.add_argument("--port", type=int, default=None, help="TCP port (default: from JOB_SERVICE_URL)")
+    parser.add_argument("--unix", default=JOB_SERVICE["unix_socket"], help="Listen on this Unix socket instead")
+    parser.add_argument("-w", "--workers", type=int, default=JOB_SERVICE["workers"], help="Worker processes")
+    parser.add_argument("--max-queued", type=int, default=JOB_SERVICE["max_queued"],
+                        help="Waiting jobs beyond which submissions are rejected")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Torch threads per worker (default: CPU count / workers)")
+    parser.add_argument("--threshold", type=float, default=JOB_SERVICE["threshold"],
+                        help="Crime classification threshold")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the result cache")
+    args = parser.parse_args(argv)
+
+    service = JobService(
+        workers=args.workers,
+        max_queued=args.max_queued,
+        threads_per_worker=args.threads_per_worker,
+        threshold=args.threshold,
+        use_cache=not args.no_cache
+    )
+    start_metrics_server()
+    url = urlsplit(JOB_SERVICE["url"])
+    if args.unix:
+        web.run_app(create_app(service), path=args.unix)
+    else:
+        web.run_app(create_app(service), host=args.host or url.hostname, port=args.port or url.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""Live streaming ingest for calls still in progress.
+
+Usage:
+    python stream.py                                   # TCP server on STREAMING host:port
+    ffmpeg -i call.wav -f s16le -ac 1 -ar 16000 - | python stream.py --stdin --call-id call-42
+
+Audio is raw 16 kHz mono s16le PCM. Over TCP, each connection is one call:
+a JSON header line ({"call_id": "...", "sample_rate": 16000}) and then the
+PCM; closing the sending side ends the call. Events come back as JSON lines:
+"transcript" per finished phrase, "weapon" per lexicon hit, "entities" with
+the entities not seen earlier in the call, and a final "end" summary.
+tools/replay_wav.py replays recordings in real time for testing.
+"""
+import argparse
+import asyncio
+import sys
+from config import STREAMING
+from utils.streaming import serve, stream_pipe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe and analyse calls while they are streamed in")
+    parser.add_argument("--host", default=STREAMING["host"], help="Address to listen on")
+    parser.add_argument("--port", type=int, default=STREAMING["port"], help="TCP port to listen on")
+    parser.add_argument("--stdin", action="store_true",
+                        help="Read one call's PCM from stdin and write its events to stdout")
+    parser.add_argument("--call-id", default=None, help="Call id for --stdin")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.stdin:
+            asyncio.run(stream_pipe(sys.stdin.buffer, sys.stdout, call_id=args.call_id))
+        else:
+            asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
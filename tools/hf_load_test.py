@@ -0,0 +1,104 @@
+"""Load test for utils/hf_client.py against the local stub server.
+
+Usage:
+    python -m tools.hf_load_test --requests 500 --concurrency 64 --duplicates 0.3
+    python -m tools.hf_load_test --url http://127.0.0.1:8765   # already running stub
+
+Without --url an in-process stub (tools/hf_stub_server.py) is started on a free
+port. Reports client-side latency percentiles, throughput, how many requests
+were coalesced or retried, and how many HTTP calls the server actually saw.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import aiohttp
+from aiohttp import web
+from tools.hf_stub_server import create_app
+from utils.hf_client import AsyncHFClient, HFAPIError
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_load(base_url, n_requests, concurrency, duplicates, seed=0):
+    rng = random.Random(seed)
+    endpoint = f"{base_url}/models/dslim/bert-base-NER"
+    distinct = max(1, int(n_requests * (1 - duplicates)))
+    texts = [f"Caller reports John Smith at {100 + i} Main Street" for i in range(distinct)]
+    payloads = [{"inputs": texts[i % distinct]} for i in range(n_requests)]
+    rng.shuffle(payloads)
+
+    client = AsyncHFClient(max_concurrency=concurrency)
+    latencies, failures = [], 0
+
+    async def one(payload):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            await client.post(endpoint, json_body=payload)
+            latencies.append(time.perf_counter() - started)
+        except HFAPIError:
+            failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in payloads))
+    elapsed = time.perf_counter() - started
+    await client.close()
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/stats") as resp:
+            server_stats = await resp.json()
+
+    return {
+        "requests": n_requests,
+        "failures": failures,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(n_requests / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1)
+        },
+        "client": client.stats,
+        "server_requests": server_stats["requests"]
+    }
+
+
+async def main_async(args):
+    runner = None
+    base_url = args.url
+    if base_url is None:
+        runner = web.AppRunner(create_app(args.latency_ms, args.jitter_ms, args.error_rate))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        return await run_load(base_url.rstrip("/"), args.requests, args.concurrency, args.duplicates)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the pooled HF client")
+    parser.add_argument("--url", default=None, help="Base URL of a running stub (default: start one in-process)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="Fraction of requests repeating another's payload")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Local stand-in for the Hugging Face inference API.
+
+Usage:
+    python -m tools.hf_stub_server --port 8765 --latency-ms 150 --error-rate 0.05
+    HF_API_BASE=http://127.0.0.1:8765 streamlit run app.py
+
+Answers POST /models/<owner>/<model> with canned responses shaped like the real
+endpoints (ASR, translation, NER, zero-shot). Latency, jitter and a rate of
+503 "model loading" errors can be injected. GET /stats returns request counts.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from aiohttp import web
+
+SAMPLE_TRANSCRIPT = "He has a gun, he is at 1425 Maple Street near Pete's coffee right now."
+
+
+def _fake_ner(text):
+    entities = []
+    for match in re.finditer(r"\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b", text):
+        entities.append({
+            "entity_group": "LOC" if match.group().endswith(("Street", "Avenue", "Road")) else "PER",
+            "word": match.group(),
+            "score": 0.9,
+            "start": match.start(),
+            "end": match.end()
+        })
+    return entities
+
+
+def respond(model, payload):
+    """Response body for a model, in the shape the real endpoint returns"""
+    inputs = payload.get("inputs", "") if isinstance(payload, dict) else ""
+    if "whisper" in model:
+        return {"text": SAMPLE_TRANSCRIPT}
+    if "opus-mt" in model or "nllb" in model or "translation" in model:
+        if isinstance(inputs, list):
+            return [{"translation_text": f"[en] {text}"} for text in inputs]
+        return [{"translation_text": f"[en] {inputs}"}]
+    if "NER" in model or "ner" in model:
+        return _fake_ner(inputs)
+    if "mnli" in model:
+        labels = payload.get("parameters", {}).get("candidate_labels", [])
+        return {"sequence": inputs, "labels": labels, "scores": [1.0 / max(len(labels), 1)] * len(labels)}
+    return {"error": f"Unknown stub model {model}"}
+
+
+def create_app(latency_ms=100, jitter_ms=50, error_rate=0.0):
+    stats = {"requests": 0, "errors": 0, "by_model": {}}
+
+    async def handle(request):
+        model = f"{request.match_info['owner']}/{request.match_info['name']}"
+        stats["requests"] += 1
+        stats["by_model"][model] = stats["by_model"].get(model, 0) + 1
+        body = await request.read()
+
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+        if random.random() < error_rate:
+            stats["errors"] += 1
+            return web.json_response(
+                {"error": f"Model {model} is currently loading", "estimated_time": 0.2},
+                status=503
+            )
+
+        payload = {}
+        if request.content_type == "application/json" and body:
+            payload = json.loads(body)
+        return web.json_response(respond(model, payload))
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=32 * 1024 * 1024)
+    app.router.add_post("/models/{owner}/{name}", handle)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline stub of the HF inference API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+
+    web.run_app(
+        create_app(args.latency_ms, args.jitter_ms, args.error_rate),
+        host=args.host,
+        port=args.port
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Query the analytics store of processed calls.
+
+Usage:
+    python -m tools.query_calls --category Robbery --since 2025-01-01 --weapon handgun
+    python -m tools.query_calls --location "main street" --counts weapon
+    python -m tools.query_calls --search "red hoodie"
+    python -m tools.query_calls --import results.jsonl   # backfill from batch.py output
+
+Filters combine with AND. Results are printed as JSON lines, newest first.
+"""
+import argparse
+import json
+import time
+from config import ANALYTICS_STORE
+from utils.analytics_store import AnalyticsStore
+
+IMPORT_BATCH_SIZE = 1000
+
+
+def _add(store, records):
+    # Keyed by audio hash like live calls; output of older runs falls back to the path
+    return store.add_many(records, [r.get("audio_hash") for r in records])
+
+
+def import_jsonl(store, path):
+    """Add the successful records of a batch.py output file; returns how many"""
+    added = 0
+    pending = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") != "ok":
+                continue
+            pending.append(record)
+            if len(pending) >= IMPORT_BATCH_SIZE:
+                added += len(_add(store, pending))
+                pending = []
+    if pending:
+        added += len(_add(store, pending))
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query processed police calls")
+    parser.add_argument("--db", default=ANALYTICS_STORE["path"], help="Analytics store path")
+    parser.add_argument("--import", dest="import_path", default=None, help="Add records from a batch.py JSONL file")
+    parser.add_argument("--category", default=None)
+    parser.add_argument("--since", default=None, help="ISO date/time, inclusive")
+    parser.add_argument("--until", default=None, help="ISO date/time, exclusive")
+    parser.add_argument("--location", default=None)
+    parser.add_argument("--weapon", default=None)
+    parser.add_argument("--text", default=None, help="Full-text filter over transcripts")
+    parser.add_argument("--search", default=None, help="Full-text search with snippets")
+    parser.add_argument("--counts", default=None,
+                        help="Count matches per category or entity kind (location, weapon, suspect, time)")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    store = AnalyticsStore(args.db)
+    if args.import_path:
+        started = time.perf_counter()
+        added = import_jsonl(store, args.import_path)
+        print(json.dumps({"imported": added, "seconds": round(time.perf_counter() - started, 3)}))
+        return
+
+    filters = {
+        "category": args.category,
+        "start": args.since,
+        "end": args.until,
+        "location": args.location,
+        "weapon": args.weapon,
+        "text": args.text
+    }
+    started = time.perf_counter()
+    try:
+        if args.search:
+            rows = store.search(args.search, limit=args.limit)
+        elif args.counts:
+            rows = [{"value": value, "calls": n} for value, n in store.count_by(args.counts, **filters).items()]
+        else:
+            rows = store.query(limit=args.limit, **filters)
+    except ValueError as e:
+        parser.error(str(e))
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+    print(json.dumps({"rows": len(rows), "ms": round((time.perf_counter() - started) * 1000, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Replay WAV recordings into the streaming ingest at real-time speed.
+
+Usage:
+    python stream.py &                                      # the ingest server
+    python -m tools.replay_wav call1.wav call2.wav --speed 1
+    python -m tools.replay_wav call.wav --stdout | python stream.py --stdin
+
+Each file is one call, downmixed to mono, resampled to 16 kHz and sent as
+s16le PCM in chunk_ms chunks paced like a live line; several files are
+replayed concurrently. Events are printed as JSON lines with "lag_s": how long
+after the end of the phrase (in replayed audio time) the event arrived.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import wave
+from pathlib import Path
+import numpy as np
+from config import STREAMING
+from utils.segmenter import SAMPLE_RATE
+
+
+def read_wav(path):
+    """16 kHz s16le mono PCM bytes of a PCM WAV file"""
+    with wave.open(str(path), 'rb') as f:
+        channels, width, rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+        frames = f.readframes(f.getnframes())
+    if width == 1:
+        audio = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128.0
+    elif width == 2:
+        audio = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 4:
+        audio = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"{path}: unsupported {8 * width}-bit samples")
+    audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        # Linear interpolation is plenty for telephone-band speech
+        positions = np.arange(int(len(audio) * SAMPLE_RATE / rate)) * rate / SAMPLE_RATE
+        audio = np.interp(positions, np.arange(len(audio)), audio)
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def chunks(pcm, chunk_ms):
+    size = SAMPLE_RATE * chunk_ms // 1000 * 2
+    return [pcm[i:i + size] for i in range(0, len(pcm), size)]
+
+
+async def replay(path, host, port, chunk_ms=100, speed=1.0):
+    """Stream one file to the server and print its events; returns them"""
+    pcm = read_wav(path)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((json.dumps({"call_id": Path(path).stem, "sample_rate": SAMPLE_RATE}) + "\n").encode("utf-8"))
+    started = time.monotonic()
+
+    async def send():
+        sent = 0
+        for chunk in chunks(pcm, chunk_ms):
+            writer.write(chunk)
+            await writer.drain()
+            sent += len(chunk) // 2
+            # Sleep until the wall clock catches up with the audio sent
+            delay = sent / SAMPLE_RATE / speed - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        writer.write_eof()
+
+    sender = asyncio.create_task(send())
+    events = []
+    while line := await reader.readline():
+        event = json.loads(line)
+        audio_time = (time.monotonic() - started) * speed
+        phrase_end = event.get("segment_end", event.get("end"))
+        if isinstance(phrase_end, (int, float)):
+            event["lag_s"] = round(audio_time - phrase_end, 2)
+        events.append(event)
+        summary = {k: v for k, v in event.items() if k not in ("segments", "transcript")}
+        print(json.dumps(summary, ensure_ascii=False), flush=True)
+    await sender
+    writer.close()
+    return events
+
+
+async def replay_all(paths, host, port, chunk_ms, speed):
+    results = await asyncio.gather(*(replay(p, host, port, chunk_ms, speed) for p in paths), return_exceptions=True)
+    for path, result in zip(paths, results):
+        if isinstance(result, Exception):
+            print(f"{path}: {result}", file=sys.stderr)
+    return results
+
+
+def write_stdout(path, chunk_ms, speed):
+    """Pace one file's PCM onto stdout, for piping into ``stream.py --stdin``"""
+    out = sys.stdout.buffer
+    started = time.monotonic()
+    sent = 0
+    for chunk in chunks(read_wav(path), chunk_ms):
+        out.write(chunk)
+        out.flush()
+        sent += len(chunk) // 2
+        delay = sent / SAMPLE_RATE / speed - (time.monotonic() - started)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay WAV files into the streaming ingest in real time")
+    parser.add_argument("files", nargs="+", help="WAV files, one call each, replayed concurrently")
+    parser.add_argument("--host", default=STREAMING["host"])
+    parser.add_argument("--port", type=int, default=STREAMING["port"])
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio per write")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed (2 = twice real time)")
+    parser.add_argument("--stdout", action="store_true", help="Write the first file's PCM to stdout instead")
+    args = parser.parse_args(argv)
+
+    if args.stdout:
+        write_stdout(args.files[0], args.chunk_ms, args.speed)
+        return
+    results = asyncio.run(replay_all(args.files, args.host, args.port, args.chunk_ms, args.speed))
+    lags = [e["lag_s"] for events in results if isinstance(events, list)
+            for e in events if e["type"] == "transcript" and "lag_s" in e]
+    if lags:
+        print(json.dumps({
+            "calls": len(args.files),
+            "phrases": len(lags),
+            "p50_lag_s": round(float(np.percentile(lags, 50)), 2),
+            "max_lag_s": round(max(lags), 2)
+        }), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
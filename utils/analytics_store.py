@@ -0,0 +1,295 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from config import ANALYTICS_STORE
+
+# results["entities"] key -> entity kind stored in call_entities
+ENTITY_KINDS = {
+    "locations": "location",
+    "times": "time",
+    "suspects": "suspect",
+    "weapons": "weapon",
+    "organizations": "organization"
+}
+
+
+def normalize(value):
+    """Lookup form of an entity value: lower case, single spaces"""
+    return " ".join(str(value).lower().split())
+
+
+def fts_query(text):
+    """
+    FTS5 query for free text: every word must appear
+
+    Words are quoted, so punctuation ("pete's", "5-0") is matched literally
+    instead of being read as query syntax; a trailing * still matches a prefix.
+    """
+    terms = []
+    for word in str(text).split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    if not terms:
+        raise ValueError(f"Nothing to search for in {text!r}")
+    return " ".join(terms)
+
+
+def to_timestamp(value):
+    """Epoch seconds from a datetime, ISO string or number (None passes through)"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+class AnalyticsStore:
+    """
+    Queryable archive of processed calls
+
+    One row per call with its metadata and classification, one row per
+    (call, entity kind, value) for indexed lookups by location, weapon etc., and
+    an FTS5 index over the original and translated transcripts. The full result
+    dict is kept as JSON so a call can be shown again exactly as processed.
+    Re-adding a call with the same ``source`` (audio hash or path) replaces it.
+    """
+
+    def __init__(self, path=ANALYTICS_STORE["path"]):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One connection shared by Streamlit's script threads, serialised by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS calls (
+                id INTEGER PRIMARY KEY,
+                source TEXT NOT NULL UNIQUE,
+                filename TEXT,
+                processed_at REAL NOT NULL,
+                language TEXT,
+                was_translated INTEGER NOT NULL DEFAULT 0,
+                category TEXT,
+                confidence REAL,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_calls_time ON calls(processed_at);
+            CREATE INDEX IF NOT EXISTS idx_calls_category ON calls(category, processed_at);
+
+            CREATE TABLE IF NOT EXISTS call_entities (
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                call_id INTEGER NOT NULL REFERENCES calls(id) ON DELETE CASCADE,
+                display TEXT NOT NULL,
+                PRIMARY KEY (kind, value, call_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_entities_call ON call_entities(call_id, kind);
+        """)
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS transcripts USING fts5(original, translated)"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: plain table, searched with LIKE
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts (rowid INTEGER PRIMARY KEY, original TEXT, translated TEXT)"
+            )
+            self.fts = False
+        self._conn.commit()
+
+    def add(self, results, source=None):
+        """Store one call's results; returns its id"""
+        return self.add_many([results], [source])[0]
+
+    def add_many(self, records, sources=None):
+        """
+        Store many calls in a single transaction
+
+        Args:
+            records (list): Result dicts as built by app.process_audio or batch.py
+            sources (list): Unique key per record; defaults to the record's
+                "file", then its metadata filename
+        """
+        sources = sources or [None] * len(records)
+        ids = []
+        with self._lock, self._conn:
+            for record, source in zip(records, sources):
+                ids.append(self._insert(record, source))
+        return ids
+
+    def _insert(self, record, source):
+        metadata = record.get("metadata", {})
+        transcript = record.get("transcript", {})
+        classification = record.get("classification", {})
+        source = source or record.get("file") or metadata.get("filename")
+        if not source:
+            raise ValueError("A call needs a source (audio hash, path or filename)")
+
+        category = classification.get("category")
+        if not isinstance(category, str):
+            # Placeholder results carry the list of candidate categories
+            category = None
+
+        old = self._conn.execute("SELECT id FROM calls WHERE source=?", (source,)).fetchone()
+        if old is not None:
+            self._conn.execute("DELETE FROM transcripts WHERE rowid=?", old)
+            self._conn.execute("DELETE FROM calls WHERE id=?", old)
+
+        cursor = self._conn.execute(
+            "INSERT INTO calls (source, filename, processed_at, language, was_translated, category, confidence, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                source,
+                metadata.get("filename"),
+                to_timestamp(metadata.get("processed_at")) or datetime.now().timestamp(),
+                metadata.get("language"),
+                int(bool(transcript.get("was_translated"))),
+                category,
+                classification.get("confidence"),
+                json.dumps(record, ensure_ascii=False, default=float)
+            )
+        )
+        call_id = cursor.lastrowid
+
+        rows = {}
+        for key, kind in ENTITY_KINDS.items():
+            for value in record.get("entities", {}).get(key) or []:
+                norm = normalize(value)
+                if norm:
+                    rows.setdefault((kind, norm), str(value))
+        self._conn.executemany(
+            "INSERT INTO call_entities VALUES (?, ?, ?, ?)",
+            [(kind, norm, call_id, display) for (kind, norm), display in rows.items()]
+        )
+        self._conn.execute(
+            "INSERT INTO transcripts (rowid, original, translated) VALUES (?, ?, ?)",
+            (call_id, transcript.get("original", ""), transcript.get("translated", ""))
+        )
+        return call_id
+
+    def _where(self, category=None, start=None, end=None, location=None, weapon=None, text=None):
+        clauses, params = [], []
+        if category is not None:
+            clauses.append("c.category = ?")
+            params.append(category)
+        if start is not None:
+            clauses.append("c.processed_at >= ?")
+            params.append(to_timestamp(start))
+        if end is not None:
+            clauses.append("c.processed_at < ?")
+            params.append(to_timestamp(end))
+        for kind, value in (("location", location), ("weapon", weapon)):
+            if value is not None:
+                clauses.append("c.id IN (SELECT call_id FROM call_entities WHERE kind = ? AND value = ?)")
+                params += [kind, normalize(value)]
+        if text:
+            if self.fts:
+                clauses.append("c.id IN (SELECT rowid FROM transcripts WHERE transcripts MATCH ?)")
+                params.append(fts_query(text))
+            else:
+                clauses.append("c.id IN (SELECT rowid FROM transcripts WHERE original LIKE ? OR translated LIKE ?)")
+                params += [f"%{text}%"] * 2
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def query(self, category=None, start=None, end=None, location=None, weapon=None, text=None,
+              limit=100, offset=0, full=False):
+        """
+        Calls matching every given filter, newest first
+
+        Args:
+            category (str): Exact crime category
+            start, end: Time window on processed_at (datetime, ISO string or epoch); end is exclusive
+            location (str), weapon (str): Entity value, matched case-insensitively
+            text (str): Words that must all appear in the transcript (see fts_query)
+            full (bool): Include the stored result dict as "record"
+        """
+        where, params = self._where(category, start, end, location, weapon, text)
+        columns = "c.id, c.source, c.filename, c.processed_at, c.language, c.category, c.confidence"
+        if full:
+            columns += ", c.record"
+        sql = f"SELECT {columns} FROM calls c{where} ORDER BY c.processed_at DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit, offset]).fetchall()
+
+        calls = []
+        for row in rows:
+            call = dict(zip(("id", "source", "filename", "processed_at", "language", "category", "confidence"), row))
+            call["processed_at"] = datetime.fromtimestamp(call["processed_at"]).isoformat()
+            if full:
+                call["record"] = json.loads(row[-1])
+            calls.append(call)
+        return calls
+
+    def count_by(self, field="category", **filters):
+        """Number of matching calls per category, or per entity value for an entity kind"""
+        where, params = self._where(**filters)
+        if field == "category":
+            sql = f"SELECT c.category, COUNT(*) FROM calls c{where} GROUP BY c.category ORDER BY 2 DESC"
+        elif field in ENTITY_KINDS.values():
+            if where:
+                # Narrow the calls first (CROSS JOIN fixes the join order) and
+                # reach their entities through idx_entities_call
+                sql = (f"SELECT MIN(e.display), COUNT(*) FROM calls c "
+                       f"CROSS JOIN call_entities e INDEXED BY idx_entities_call "
+                       f"ON e.call_id = c.id AND e.kind = ?{where} GROUP BY e.value ORDER BY 2 DESC")
+            else:
+                sql = "SELECT MIN(display), COUNT(*) FROM call_entities WHERE kind = ? GROUP BY value ORDER BY 2 DESC"
+            params = [field] + params
+        else:
+            raise ValueError(f"Cannot count by {field!r}")
+        with self._lock:
+            return dict(self._conn.execute(sql, params).fetchall())
+
+    def search(self, text, limit=20):
+        """Full-text matches, best first, with a highlighted snippet of the matching transcript"""
+        if not self.fts:
+            return [dict(call, snippet=None) for call in self.query(text=text, limit=limit)]
+        sql = (
+            "SELECT c.id, c.filename, c.processed_at, c.category, "
+            "snippet(transcripts, -1, '[', ']', '...', 12) "
+            "FROM transcripts JOIN calls c ON c.id = transcripts.rowid "
+            "WHERE transcripts MATCH ? ORDER BY rank LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, (fts_query(text), limit)).fetchall()
+        return [
+            {"id": i, "filename": name, "processed_at": datetime.fromtimestamp(ts).isoformat(),
+             "category": category, "snippet": snippet}
+            for i, name, ts, category, snippet in rows
+        ]
+
+    def get(self, call_id):
+        """The stored result dict of a call, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM calls WHERE id=?", (call_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def stats(self):
+        with self._lock:
+            calls = self._conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+            entities = self._conn.execute("SELECT COUNT(*) FROM call_entities").fetchone()[0]
+        return {"calls": calls, "entities": entities, "fts": self.fts}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Singleton-like global instance
+_store_instance = None
+
+
+def get_analytics_store():
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = AnalyticsStore()
+    return _store_instance
@@ -0,0 +1,110 @@
+import os
+import subprocess
+import threading
+import numpy as np
+from config import MAX_FILE_SIZE
+from utils.segmenter import SAMPLE_RATE
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _iter_chunks(source):
+    """Yield the encoded bytes of a bytes object or file-like object"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for i in range(0, len(view), CHUNK_SIZE):
+            yield view[i:i + CHUNK_SIZE]
+        return
+
+    # File-like (e.g. Streamlit's UploadedFile); rewind in case it was read before
+    if hasattr(source, "seek"):
+        source.seek(0)
+    yield from iter(lambda: source.read(CHUNK_SIZE), b"")
+
+
+def decode_audio(source, sample_rate=SAMPLE_RATE, max_bytes=MAX_FILE_SIZE):
+    """
+    Decode any ffmpeg-readable audio to mono float32 samples without temp files
+
+    In-memory input is streamed into ffmpeg's stdin and raw PCM is read back
+    from its stdout, so nothing touches the disk and the input size limit is
+    enforced before the whole upload has been read.
+
+    Args:
+        source: File path, bytes or a binary file-like object
+        sample_rate (int): Output sample rate
+        max_bytes (int): Maximum encoded input size, None for no limit
+
+    Returns:
+        np.ndarray: float32 samples in [-1, 1]
+    """
+    is_path = isinstance(source, (str, os.PathLike))
+    if is_path:
+        # ffmpeg reads files directly so seek-dependent containers still work
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"Audio file not found: {source}")
+        if max_bytes is not None and os.path.getsize(source) > max_bytes:
+            raise ValueError(f"Audio file exceeds {max_bytes // (1024 * 1024)}MB limit")
+
+    cmd = [
+        "ffmpeg", "-hide_banner",
+        "-loglevel", "error",
+        "-threads", "0",
+        "-i", os.fspath(source) if is_path else "pipe:0",
+        "-f", "s16le",
+        "-ac", "1",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "pipe:1"
+    ]
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL if is_path else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+    except FileNotFoundError as e:
+        raise RuntimeError("FFmpeg not found. Install it to decode audio.") from e
+
+    state = {"too_large": False}
+
+    def feed():
+        written = 0
+        try:
+            for chunk in _iter_chunks(source):
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    state["too_large"] = True
+                    proc.kill()
+                    return
+                proc.stdin.write(chunk)
+        except (BrokenPipeError, OSError):
+            # ffmpeg stopped reading (bad input); its stderr explains why
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    writer = None
+    if not is_path:
+        writer = threading.Thread(target=feed, daemon=True)
+        writer.start()
+    pcm = bytearray()
+    for chunk in iter(lambda: proc.stdout.read(CHUNK_SIZE), b""):
+        pcm += chunk
+    if writer is not None:
+        writer.join()
+    stderr = proc.stderr.read().decode(errors="replace").strip()
+    proc.wait()
+
+    if state["too_large"]:
+        raise ValueError(f"Audio file exceeds {max_bytes // (1024 * 1024)}MB limit")
+    if proc.returncode != 0:
+        raise RuntimeError(f"Audio decoding failed: {stderr or 'ffmpeg exited with code ' + str(proc.returncode)}")
+
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    samples /= 32768.0
+    return samples
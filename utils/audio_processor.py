@@ -1,43 +1,93 @@
-import os
 import subprocess
 import warnings
 import torch
-from pydub import AudioSegment
 from transformers import pipeline
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import json
+from config import SEGMENT_CONFIG, SEGMENT_BATCH_SIZE
+from utils import batching
+from utils.audio_decode import decode_audio
+from utils.model_registry import default_device
+from utils.quantization import get_backend_model, inference_threads, model_tag
+from utils.tracing import span
+from utils.translation import translate_segments, translate_text
+from utils.segmenter import SAMPLE_RATE, detect_speech, dominant_language, iter_batches, stitch_segments
 try:
     import whisper
 except ImportError:
     raise ImportError("Whisper not installed. Please run: pip install openai-whisper")
 
-# Global models to avoid reloading on every AudioProcessor call
-WHISPER_MODEL = None
-TRANSLATOR_PIPELINE = None
-
-def get_whisper_model():
-    global WHISPER_MODEL
-    if WHISPER_MODEL is None:
-        model_size = "base" if not torch.cuda.is_available() else "small"
-        WHISPER_MODEL = whisper.load_model(model_size, device="cuda" if torch.cuda.is_available() else "cpu")
-    return WHISPER_MODEL
-
-def get_translation_pipeline():
-    global TRANSLATOR_PIPELINE
-    if TRANSLATOR_PIPELINE is None:
-        TRANSLATOR_PIPELINE = pipeline(
-            task="translation",
-            model="facebook/nllb-200-distilled-600M",
-            device=0 if torch.cuda.is_available() else -1
-        )
-    return TRANSLATOR_PIPELINE
+TRANSLATION_MODEL = "facebook/nllb-200-distilled-600M"
+
+def whisper_model_name():
+    return "whisper-small" if torch.cuda.is_available() else "whisper-base"
+
+def whisper_registry_id():
+    """
+    Model registry id of the openai-whisper model
+
+    The app registers a transformers pipeline of the same checkpoint under the
+    bare id; the suffix keeps a process that loads both from getting the
+    other runtime's object back.
+    """
+    return f"openai/{whisper_model_name()}#whisper"
+
+def get_whisper_model(device=None, backend=None):
+    model_size = whisper_model_name().split("-", 1)[1]
+    return get_backend_model(
+        whisper_registry_id(),
+        lambda device: whisper.load_model(model_size, device=device),
+        device,
+        backend
+    )
+
+def get_translation_pipeline(device=None, backend=None):
+    return get_backend_model(
+        TRANSLATION_MODEL,
+        lambda device: pipeline(task="translation", model=TRANSLATION_MODEL, device=device),
+        device,
+        backend
+    )
+
+def decode_spans(model, audio, spans, fp16=False, batch_size=SEGMENT_BATCH_SIZE):
+    """
+    Whisper-decode (start, end) sample spans of audio, batch_size at a time
+
+    Returns:
+        tuple: (texts, detected languages), one per span
+    """
+    options = whisper.DecodingOptions(task="transcribe", without_timestamps=True, fp16=fp16)
+    texts, languages = [], []
+    for batch in iter_batches(spans, batch_size):
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[start:end]), model.dims.n_mels)
+            for start, end in batch
+        ]).to(model.device)
+        for decoded in model.decode(mels, options):
+            texts.append(decoded.text)
+            languages.append(decoded.language)
+    return texts, languages
 
 class AudioProcessor:
-    def __init__(self):
+    def __init__(self, backend=None, device=None):
         self._verify_system_dependencies()
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.transcriber = get_whisper_model()
-        self.translator = get_translation_pipeline()
+        self.device = device or default_device()
+        self.backend = backend
+        # Warm both models; they are looked up in the registry on every use so
+        # an evicted model is actually released
+        get_whisper_model(self.device, backend)
+        get_translation_pipeline(self.device, backend)
+
+    @property
+    def transcriber(self):
+        return get_whisper_model(self.device, self.backend)
+
+    @property
+    def translator(self):
+        return get_translation_pipeline(self.device, self.backend)
+
+    def _model_tag(self, model_id):
+        return model_tag(model_id, self.device, self.backend)
 
     def _verify_system_dependencies(self):
         try:
@@ -50,52 +100,81 @@ class AudioProcessor:
                 "Windows: Download from ffmpeg.org"
             ) from e
 
-    def _convert_to_wav(self, audio_path: str) -> str:
-        if audio_path.endswith(".wav"):
-            return audio_path
+    def transcribe_segments(self, audio, batch_size: int = SEGMENT_BATCH_SIZE) -> Tuple[str, List[Dict]]:
+        """Drop silence, split on pauses and decode the segments in batches"""
+        with span("segment", size=round(len(audio) / SAMPLE_RATE, 2), unit="audio_s"):
+            spans = detect_speech(audio, SAMPLE_RATE, **SEGMENT_CONFIG)
+        if not spans:
+            return "", []
+
+        speech_s = round(sum(end - start for start, end in spans) / SAMPLE_RATE, 2)
+        with span("transcribe", model=self._model_tag(f"openai/{whisper_model_name()}"),
+                  size=speech_s, unit="audio_s"), inference_threads("whisper"):
+            texts, languages = decode_spans(self.transcriber, audio, spans, self.device == "cuda", batch_size)
+
+        return stitch_segments(spans, texts, languages)
+
+    def transcribe(self, audio) -> Dict:
+        """Transcribe a file path, raw bytes or a binary file-like object"""
+        with span("decode") as decode:
+            samples = decode_audio(audio)
+            decode.set(size=round(len(samples) / SAMPLE_RATE, 2), unit="audio_s")
+        try:
+            transcript, segments = self.transcribe_segments(samples)
+        except Exception as e:
+            raise RuntimeError(f"Audio processing failed: {str(e)}") from e
+        return {
+            "text": transcript,
+            "language": dominant_language(segments),
+            "segments": segments
+        }
+
+    def _translate_batch(self, sentences):
+        model_id = self._model_tag(TRANSLATION_MODEL)
+        return batching.translate(sentences, lambda: self.translator, model_id, self.device, self.backend)
+
+    def translate(self, text: str, language: Optional[str] = None) -> str:
+        """Sentence-by-sentence translation; English sentences are kept as they are"""
         try:
-            audio = AudioSegment.from_file(audio_path)
-            wav_path = os.path.splitext(audio_path)[0] + ".converted.wav"
-            audio.export(wav_path, format="wav")
-            return wav_path
+            model_id = self._model_tag(TRANSLATION_MODEL)
+            with span("translate", model=model_id, size=len(text), unit="chars"):
+                return translate_text(text, self._translate_batch, model_id, language)[0]
         except Exception as e:
-            raise RuntimeError(f"Audio conversion failed: {str(e)}") from e
+            raise RuntimeError(f"Audio processing failed: {str(e)}") from e
 
-    def transcribe_and_translate(self, audio_path: str) -> Dict[str, Optional[str]]:
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    def transcribe_and_translate(self, audio, transcript: Optional[Dict] = None) -> Dict[str, Optional[str]]:
+        """
+        Transcribe (unless a transcript is given) and translate to English
 
-        wav_path = self._convert_to_wav(audio_path)
+        Segments Whisper detected as English are passed through; the others are
+        translated sentence by sentence in batches, repeated sentences from cache.
+        """
+        if transcript is None:
+            transcript = self.transcribe(audio)
+        text = transcript["text"]
+        lang = transcript["language"]
+        segments = transcript["segments"]
 
         try:
-            result = self.transcriber.transcribe(wav_path)
-            transcript = result["text"]
-            lang = result["language"]
-
-            if lang != 'en':
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    translated = self.translator(transcript)
-                return {
-                    "original_text": transcript,
-                    "original_lang": lang,
-                    "translated_text": translated[0]['translation_text'],
-                    "translation": True
-                }
-            else:
-                return {
-                    "translated_text": transcript,
-                    "original_lang": lang,
-                    "translation": False
-                }
+            model_id = self._model_tag(TRANSLATION_MODEL)
+            with span("translate", model=model_id, size=len(text), unit="chars"):
+                if segments:
+                    translated, segments, was_translated = translate_segments(
+                        segments, self._translate_batch, model_id)
+                else:
+                    translated, was_translated = translate_text(text, self._translate_batch, model_id, lang)
         except Exception as e:
             raise RuntimeError(f"Audio processing failed: {str(e)}") from e
-        finally:
-            if wav_path.endswith("converted.wav"):
-                try:
-                    os.remove(wav_path)
-                except:
-                    pass
+
+        result = {
+            "translated_text": translated,
+            "original_lang": lang,
+            "translation": was_translated,
+            "segments": segments
+        }
+        if was_translated:
+            result["original_text"] = text
+        return result
 
 # For testing standalone
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+import warnings
+from concurrent.futures import Future
+from config import MICRO_BATCHING
+from utils.model_registry import default_device
+from utils.quantization import backend_mode, inference_threads
+from utils.tracing import span
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Queues single requests for one model and runs them as batches
+
+    A background thread takes the first waiting request, then keeps collecting
+    until ``max_batch_size`` requests are queued or ``max_wait_ms`` have passed
+    since the first one, and runs ``run_batch(items)`` once for all of them.
+    Each caller gets a Future resolved with its own result (or the batch's
+    exception). Requests from every session and thread share the same batches.
+    """
+
+    def __init__(self, name, run_batch, max_batch_size=16, max_wait_ms=10.0):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, item):
+        future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def map(self, items):
+        """Submit every item and wait for all results, in order"""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name=f"batch-{self.name}", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stop = True
+                    break
+                batch.append(request)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        # Requests cancelled while queued are dropped
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self.run_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: {len(results)} results for a batch of {len(batch)}")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0
+        }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(kind, model_id, run_batch, variant=None, device=None, backend=None):
+    """
+    Process-wide batcher for a model as loaded on a device with a backend (and
+    call variant, e.g. normalisation)
+
+    The first caller's ``run_batch`` serves every request for the key, so the
+    key has to tell apart everything that picks a different model instance.
+    """
+    device = device or default_device()
+    key = (kind, model_id, device, backend_mode(backend), variant)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = MicroBatcher(
+                f"{kind}:{model_id}:{device}",
+                run_batch,
+                max_batch_size=MICRO_BATCHING["max_batch_size"][kind],
+                max_wait_ms=MICRO_BATCHING["max_wait_ms"]
+            )
+        return batcher
+
+
+def batcher_stats():
+    with _batchers_lock:
+        return {batcher.name: batcher.stats() for batcher in _batchers.values()}
+
+
+def _batched(kind, model_id, run_batch, items, variant=None, device=None, backend=None):
+    items = list(items)
+    if not items:
+        return []
+    if not MICRO_BATCHING["enabled"]:
+        return run_batch(items)
+    return get_batcher(kind, model_id, run_batch, variant, device, backend).map(items)
+
+
+# The model is looked up on every flush rather than captured, so the batcher
+# never pins a model the registry has evicted. device and backend are those
+# get_pipeline/get_model load with (None: the defaults).
+
+def ner(texts, get_pipeline, model_id, device=None, backend=None):
+    """Entity lists for each text, via the shared NER batch for ``model_id``"""
+    def run_batch(batch):
+        with span("batch_ner", model=model_id, size=len(batch), unit="texts"), \
+                warnings.catch_warnings(), inference_threads("ner"):
+            warnings.simplefilter("ignore")
+            outputs = get_pipeline()(batch, batch_size=len(batch))
+        # A one-element list comes back as the bare entity list
+        return [outputs] if len(batch) == 1 and outputs and isinstance(outputs[0], dict) else outputs
+
+    return _batched("ner", model_id, run_batch, texts, device=device, backend=backend)
+
+
+def translate(texts, get_pipeline, model_id, device=None, backend=None):
+    """Translation of each text, via the shared translation batch for ``model_id``"""
+    def run_batch(batch):
+        with span("batch_translate", model=model_id, size=len(batch), unit="texts"), \
+                warnings.catch_warnings(), inference_threads("translation"):
+            warnings.simplefilter("ignore")
+            outputs = get_pipeline()(batch, batch_size=len(batch))
+        return [(out[0] if isinstance(out, list) else out)["translation_text"] for out in outputs]
+
+    return _batched("translation", model_id, run_batch, texts, device=device, backend=backend)
+
+
+def encode(texts, get_model, model_id, normalize=True, batch_size=64, device=None, backend=None):
+    """Embedding row per text, via the shared encoder batch for ``model_id``"""
+    def run_batch(batch):
+        with span("batch_encode", model=model_id, size=len(batch), unit="texts"), inference_threads("embedding"):
+            return list(get_model().encode(
+                batch,
+                batch_size=batch_size,
+                normalize_embeddings=normalize,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ))
+
+    return _batched("embedding", model_id, run_batch, texts, variant=normalize, device=device, backend=backend)
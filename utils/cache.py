@@ -1,9 +1,16 @@
-import torch
-from functools import lru_cache
+from transformers import pipeline
+from utils.model_registry import get_model
 
-@lru_cache(maxsize=4)
-def load_model(key, loader_func):
-    """Cache models in memory"""
-    print(f"Loading model: {key}")
-    torch.cuda.empty_cache()
-    return loader_func()
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+
+def load_model(key, loader_func, device=None):
+    """Cache models in the process-wide registry; key should be the model ID"""
+    return get_model(key, lambda _device: loader_func(), device)
+
+def get_zero_shot_pipeline(device=None):
+    """BART-MNLI shared by weapon detection and crime classification"""
+    return get_model(
+        ZERO_SHOT_MODEL,
+        lambda device: pipeline("zero-shot-classification", model=ZERO_SHOT_MODEL, device=device),
+        device
+    )
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import numpy as np
+from config import EMBEDDING_CACHE_DIR
+
+
+def description_hash(description):
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()[:16]
+
+
+def _atomic_write(path, write):
+    """Write via a temp file and rename so readers never see a partial file"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+class EmbeddingStore:
+    """
+    On-disk category embeddings for one model
+
+    Rows are keyed by a hash of the category description, so a restart loads a
+    memory-mapped .npy instead of re-encoding, and an edit only encodes the
+    categories whose description actually changed.
+    """
+
+    def __init__(self, model_name, root=EMBEDDING_CACHE_DIR):
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.directory = os.path.join(root, slug)
+        self.index_path = os.path.join(self.directory, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def load(self):
+        """Return the stored description hashes and their memory-mapped matrix"""
+        if not os.path.exists(self.index_path):
+            return [], None
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            matrix = np.load(os.path.join(self.directory, index["matrix"]), mmap_mode='r')
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable embedding store: {e}")
+            return [], None
+        if len(index["hashes"]) != len(matrix):
+            return [], None
+        return index["hashes"], matrix
+
+    def embeddings_for(self, descriptions, encode):
+        """
+        Embedding matrix for the descriptions, encoding only what is not stored
+
+        Args:
+            descriptions (list): Category descriptions, in row order
+            encode (callable): list of descriptions -> 2D array
+
+        Returns:
+            np.ndarray: One row per description (memory-mapped when nothing changed)
+        """
+        hashes = [description_hash(d) for d in descriptions]
+        stored_hashes, matrix = self.load()
+        if matrix is not None and stored_hashes == hashes:
+            return matrix
+
+        rows = {}
+        if matrix is not None:
+            rows = {h: matrix[i] for i, h in enumerate(stored_hashes)}
+        missing = [d for d, h in zip(descriptions, hashes) if h not in rows]
+        if missing:
+            print(f"Encoding {len(missing)} category descriptions...")
+            for description, row in zip(missing, encode(missing)):
+                rows[description_hash(description)] = np.asarray(row, dtype=np.float32)
+        if not hashes:
+            return np.empty((0, 0), dtype=np.float32)
+        result = np.vstack([rows[h] for h in hashes]).astype(np.float32)
+        self.save(hashes, result)
+        return result
+
+    def save(self, hashes, matrix):
+        """Persist a matrix whose rows belong to the given description hashes"""
+        if not hashes:
+            return
+        matrix = np.asarray(matrix, dtype=np.float32)
+        # Each matrix gets a content-named file and the index rename is the
+        # single commit point, so a reader never pairs an index with the wrong matrix
+        matrix_name = f"embeddings-{hashlib.sha256(matrix.tobytes()).hexdigest()[:16]}.npy"
+
+        def write_matrix(tmp):
+            with open(tmp, 'wb') as f:
+                np.save(f, matrix)
+
+        def write_index(tmp):
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"matrix": matrix_name, "hashes": hashes}, f)
+
+        with self._lock:
+            _atomic_write(os.path.join(self.directory, matrix_name), write_matrix)
+            _atomic_write(self.index_path, write_index)
+            for name in os.listdir(self.directory):
+                if name.startswith("embeddings-") and name.endswith(".npy") and name != matrix_name:
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        # Still mapped by another process (Windows) or already gone
+                        pass
@@ -0,0 +1,28 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): concurrent saves fall back to last writer wins
+    fcntl = None
+
+
+@contextmanager
+def locked(path):
+    """
+    Exclusive lock on ``path`` across processes, held for a read-merge-write
+
+    The lock is taken on a ``<path>.lock`` file next to it, since the file
+    itself is swapped out with os.replace on every save.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
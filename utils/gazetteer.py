@@ -0,0 +1,273 @@
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from config import GAZETTEER
+
+GAZETTEER_FILE = Path(__file__).parent / "../gazetteer.json"
+
+# Street-type abbreviations spelled out, so "Main St" and "main street" meet
+ABBREVIATIONS = {
+    "st": "street", "str": "street", "ave": "avenue", "av": "avenue", "rd": "road",
+    "blvd": "boulevard", "dr": "drive", "ln": "lane", "ct": "court", "pl": "place",
+    "hwy": "highway", "pkwy": "parkway", "sq": "square"
+}
+# Street types are compared on their own: "Oak Street" is not Oak Avenue
+STREET_TYPES = frozenset(ABBREVIATIONS.values()) | {"way"}
+STOP_WORDS = frozenset({"the", "a", "an", "on", "at", "in", "near", "by", "of", "and"})
+# Not part of the distinctive name, which is what trie and fuzzy matches are scored on
+GENERIC_TOKENS = STREET_TYPES | STOP_WORDS
+TOKEN = re.compile(r"[a-z0-9]+")
+HOUSE_NUMBER = re.compile(r"^\s*(\d{1,6}[a-z]?)\s+(.+)$", re.IGNORECASE)
+
+
+def load_gazetteer(path=GAZETTEER_FILE):
+    """Places as dicts: id, name, type, aliases, lat, lon"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=1)
+def gazetteer_fingerprint(path=GAZETTEER_FILE):
+    """Content hash of the gazetteer, for cache keys of resolved entities"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except OSError:
+        return "none"
+
+
+def tokens(text):
+    """Lookup tokens: lower case, apostrophes dropped, abbreviations expanded"""
+    text = text.lower().replace("'", "").replace("’", "")
+    return [ABBREVIATIONS.get(t, t) for t in TOKEN.findall(text)]
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _core(key_tokens):
+    """The distinctive tokens of a name ("oak" for "the oak avenue")"""
+    return [t for t in key_tokens if t not in GENERIC_TOKENS]
+
+
+def _similarity(a, b):
+    """1 - optimal string alignment distance / longer length ("mian" ~ "main": 0.75)"""
+    if a == b:
+        return 1.0
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return 1 - current[-1] / max(len(a), len(b))
+
+
+class GazetteerResolver:
+    """
+    Maps free-text location mentions to canonical gazetteer places
+
+    Lookup order for each mention:
+    1. exact: the normalized mention is a name or alias
+    2. trie: the longest name or alias found inside the mention ("the Pete's
+       coffee on Main" -> Pete's Coffee), via a token trie built at load time;
+       scored by the share of the mention's distinctive tokens it covers and
+       kept from min_trie_score
+    3. fuzzy: character-trigram index over the distinctive part of each name
+       for misspellings and ASR errors; candidates are ranked by edit
+       similarity of the distinctive parts and kept from min_similarity
+
+    Street types and stop words are not distinctive: "the station" is too
+    vague for Central Station and "Maple Street" is not Main Street. A mention
+    naming a street type the place does not have ("Oak Street" for Oak Avenue)
+    never matches it. A leading house number ("1330 Alvarado Rd") is split off
+    first and returned alongside the street. Results are memoised per mention.
+    """
+
+    def __init__(self, places=None, min_similarity=GAZETTEER["min_similarity"],
+                 min_trie_score=GAZETTEER["min_trie_score"], memo_size=GAZETTEER["memo_size"]):
+        places = load_gazetteer() if places is None else places
+        self.places = {}
+        self.keys = {}
+        self.trie = {}
+        self.grams = {}
+        self.key_cores = {}
+        self.street_types = {}
+        self.min_similarity = min_similarity
+        self.min_trie_score = min_trie_score
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+        for place in places:
+            self.places[place["id"]] = {k: place.get(k) for k in ("id", "name", "type", "lat", "lon")}
+            street_types = self.street_types.setdefault(place["id"], set())
+            for name in [place["name"]] + list(place.get("aliases", [])):
+                key_tokens = tokens(name)
+                if not key_tokens:
+                    continue
+                street_types.update(STREET_TYPES.intersection(key_tokens))
+                key = " ".join(key_tokens)
+                # First place listing a name keeps it
+                if key in self.keys:
+                    continue
+                self.keys[key] = place["id"]
+                node = self.trie
+                for token in key_tokens:
+                    node = node.setdefault(token, {})
+                node[""] = key
+                core = " ".join(_core(key_tokens))
+                self.key_cores[key] = core
+                if core:
+                    for gram in _trigrams(core):
+                        self.grams.setdefault(gram, []).append(key)
+
+    def __len__(self):
+        return len(self.places)
+
+    def _longest_in(self, mention_tokens):
+        """Longest known name inside the tokens, as (key, token count)"""
+        best, best_len = None, 0
+        for start in range(len(mention_tokens)):
+            node = self.trie
+            for i in range(start, len(mention_tokens)):
+                node = node.get(mention_tokens[i])
+                if node is None:
+                    break
+                if "" in node and i + 1 - start > best_len:
+                    best, best_len = node[""], i + 1 - start
+        return best, best_len
+
+    def _conflicts(self, key, street_types):
+        """The mention names a street type the place does not have"""
+        return not street_types <= self.street_types[self.keys[key]]
+
+    def _fuzzy(self, core, street_types):
+        """
+        Most similar name by edit similarity of the distinctive parts, if at
+        least min_similarity
+
+        Similarity s allows k = (1 - s) / s * |core| edits, and each edit
+        removes at most three of the core's trigrams, so a match shares at
+        least |q| - 3k of them: it must contain one of the query's rarest
+        3k + 1 trigrams and only those posting lists are read.
+        """
+        s = self.min_similarity
+        grams = _trigrams(core)
+        edits = math.floor((1 - s) / s * len(core))
+        needed = max(1, len(grams) - 3 * edits)
+        rarest = sorted(grams, key=lambda g: len(self.grams.get(g, ())))[:len(grams) - needed + 1]
+        candidates = {c for gram in rarest for c in self.grams.get(gram, ())}
+
+        best, best_rank = None, (0.0, 0)
+        for candidate in candidates:
+            if self._conflicts(candidate, street_types):
+                continue
+            candidate_core = self.key_cores[candidate]
+            score = _similarity(core, candidate_core)
+            # Ties go to the name closest in length
+            rank = (score, -abs(len(candidate_core) - len(core)))
+            if rank > best_rank:
+                best, best_rank = candidate, rank
+        return (best, best_rank[0]) if best_rank[0] >= s else (None, best_rank[0])
+
+    def _lookup(self, mention):
+        house_number = None
+        match = HOUSE_NUMBER.match(mention)
+        if match:
+            house_number, mention = match.group(1), match.group(2)
+        mention_tokens = tokens(mention)
+        if not mention_tokens:
+            return None
+        key = " ".join(mention_tokens)
+        core = _core(mention_tokens)
+        street_types = STREET_TYPES.intersection(mention_tokens)
+
+        if key in self.keys:
+            found, method, score = key, "exact", 1.0
+        elif not core:
+            return None
+        else:
+            found, _ = self._longest_in(mention_tokens)
+            method, score = "trie", 0.0
+            if found is not None and not self._conflicts(found, street_types):
+                score = len(self.key_cores[found].split()) / len(core)
+            if score < self.min_trie_score:
+                found, score = self._fuzzy(" ".join(core), street_types)
+                method = "fuzzy"
+            if found is None:
+                return None
+
+        result = dict(self.places[self.keys[found]], match=method, score=round(score, 3))
+        if house_number:
+            result["house_number"] = house_number
+        return result
+
+    def resolve(self, mention):
+        """
+        Canonical place for one mention, or None
+
+        Returns:
+            dict: {"id", "name", "type", "lat", "lon", "match": exact|trie|fuzzy,
+                   "score", and "house_number" when the mention had one}
+        """
+        mention = " ".join(str(mention).split())
+        with self._memo_lock:
+            if mention in self._memo:
+                self._memo.move_to_end(mention)
+                result = self._memo[mention]
+                return dict(result) if result else None
+        result = self._lookup(mention)
+        with self._memo_lock:
+            self._memo[mention] = result
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return dict(result) if result else None
+
+    def resolve_many(self, mentions):
+        """Resolve mentions in bulk, one lookup per distinct string; results align with mentions"""
+        mentions = list(mentions)
+        resolved = {m: self.resolve(m) for m in dict.fromkeys(mentions)}
+        return [dict(resolved[m]) if resolved[m] else None for m in mentions]
+
+    def places_for(self, mentions):
+        """
+        Distinct places mentioned, in order of first mention, each with the
+        raw strings that resolved to it
+        """
+        places = {}
+        for mention, result in zip(mentions, self.resolve_many(mentions)):
+            if result is None:
+                continue
+            place = places.setdefault(result["id"], {k: result[k] for k in ("id", "name", "type", "lat", "lon")})
+            place.setdefault("mentions", []).append(mention)
+            if "house_number" in result:
+                place.setdefault("house_numbers", [])
+                if result["house_number"] not in place["house_numbers"]:
+                    place["house_numbers"].append(result["house_number"])
+        return list(places.values())
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer_resolver():
+    return GazetteerResolver()
+
+
+def resolve_locations(mentions):
+    """Distinct gazetteer places for a list of location strings ([] when no gazetteer is present)"""
+    if not GAZETTEER["enabled"] or not mentions:
+        return []
+    try:
+        resolver = get_gazetteer_resolver()
+    except (OSError, ValueError) as e:
+        print(f"Gazetteer unavailable: {e}")
+        return []
+    return resolver.places_for(mentions)
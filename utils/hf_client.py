@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import aiohttp
+from config import HF_CLIENT
+
+# Rate limiting, model still loading (503) and transient gateway errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def endpoint_model(url):
+    """Model ID of an inference API URL (".../models/<owner>/<name>")"""
+    return url.split("/models/", 1)[-1]
+
+
+class HFAPIError(RuntimeError):
+    def __init__(self, status, message):
+        super().__init__(f"HF API error {status}: {message}")
+        self.status = status
+
+
+class AsyncHFClient:
+    """
+    Pooled async client for the HF_CONFIG inference endpoints
+
+    - one keep-alive connection pool per client instead of a handshake per call
+    - at most ``max_concurrency`` requests in flight
+    - connect/total timeouts, retried with exponential backoff and jitter
+    - identical in-flight requests (same URL and body) share one HTTP call
+    """
+
+    def __init__(self, token=None, **overrides):
+        self.config = {**HF_CLIENT, **overrides}
+        self.token = token
+        self._session = None
+        self._semaphore = None
+        self._inflight = {}
+        self.stats = {"requests": 0, "http_calls": 0, "coalesced": 0, "retries": 0, "failures": 0}
+
+    def _ensure_session(self):
+        # Created lazily so the session binds to the loop that actually uses it
+        if self._session is None or self._session.closed:
+            cfg = self.config
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=cfg["max_connections"], ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=cfg["timeout_s"], connect=cfg["connect_timeout_s"]),
+                headers=headers
+            )
+            self._semaphore = asyncio.Semaphore(cfg["max_concurrency"])
+        return self._session
+
+    async def post(self, url, json_body=None, data=None, coalesce=True):
+        """
+        POST to an inference endpoint and return the decoded JSON response
+
+        Args:
+            url (str): Endpoint, usually HF_CONFIG[...]["api"]
+            json_body: JSON payload (e.g. {"inputs": text})
+            data (bytes): Raw request body (e.g. encoded audio)
+            coalesce (bool): Share the response with identical in-flight requests
+        """
+        self.stats["requests"] += 1
+        if data is not None:
+            body, content_type = bytes(data), "application/octet-stream"
+        else:
+            body = json.dumps(json_body, sort_keys=True, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+
+        if not coalesce:
+            return await self._post_with_retries(url, body, content_type)
+
+        key = (url, content_type, hashlib.sha256(body).hexdigest())
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._post_with_retries(url, body, content_type))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one cancelled caller does not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def post_many(self, url, payloads):
+        """POST several JSON payloads concurrently, preserving order"""
+        return await asyncio.gather(*(self.post(url, json_body=p) for p in payloads))
+
+    async def _post_with_retries(self, url, body, content_type):
+        session = self._ensure_session()
+        cfg = self.config
+        attempt = 0
+        while True:
+            delay = None
+            try:
+                async with self._semaphore:
+                    self.stats["http_calls"] += 1
+                    async with session.post(url, data=body, headers={"Content-Type": content_type}) as resp:
+                        if resp.status < 400:
+                            return await resp.json(content_type=None)
+                        message = await resp.text()
+                        if resp.status not in RETRY_STATUSES or attempt >= cfg["retries"]:
+                            raise HFAPIError(resp.status, message[:500])
+                        delay = self._server_delay(resp, message)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= cfg["retries"]:
+                    self.stats["failures"] += 1
+                    raise HFAPIError(None, f"{type(e).__name__}: {e}") from e
+            except HFAPIError:
+                self.stats["failures"] += 1
+                raise
+
+            # Back off outside the semaphore so waiting retries do not hold slots
+            backoff = min(cfg["max_backoff_s"], cfg["backoff_s"] * (2 ** attempt))
+            await asyncio.sleep(delay if delay is not None else backoff * random.uniform(0.5, 1.5))
+            attempt += 1
+            self.stats["retries"] += 1
+
+    def _server_delay(self, resp, message):
+        """Honour Retry-After, or the estimated_time HF sends while a model loads"""
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), self.config["max_backoff_s"])
+            except ValueError:
+                pass
+        try:
+            estimated = json.loads(message).get("estimated_time")
+            if estimated:
+                return min(float(estimated), self.config["max_backoff_s"])
+        except (ValueError, AttributeError):
+            pass
+        return None
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class HFClient:
+    """Blocking facade for sync code: runs an AsyncHFClient on a background event loop"""
+
+    def __init__(self, token=None, **overrides):
+        self.async_client = AsyncHFClient(token, **overrides)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="hf-client", daemon=True)
+        self._thread.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def post(self, url, json_body=None, data=None, coalesce=True):
+        return self._run(self.async_client.post(url, json_body=json_body, data=data, coalesce=coalesce))
+
+    def post_many(self, url, payloads):
+        return self._run(self.async_client.post_many(url, payloads))
+
+    @property
+    def stats(self):
+        return dict(self.async_client.stats)
+
+    def close(self):
+        self._run(self.async_client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+# One pooled client per token, shared by every processor in the process
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_hf_client(token=None):
+    with _clients_lock:
+        if token not in _clients:
+            _clients[token] = HFClient(token)
+        return _clients[token]
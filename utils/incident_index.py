@@ -0,0 +1,320 @@
+import os
+import threading
+import time
+import numpy as np
+from config import INCIDENT_INDEX
+from utils.file_lock import locked
+
+
+class IncidentIndex:
+    """
+    Nearest-neighbour index over unit embeddings of recent call transcripts
+
+    Rows live in one growable float32 matrix with their call id and timestamp,
+    so inserts are amortized O(1) and a brute-force lookup is a single
+    matrix-vector product. Once ``ivf_min_size`` calls are indexed, a k-means
+    coarse quantizer partitions them into about sqrt(n) lists and lookups only
+    score the ``nprobe`` lists nearest to the query (retrained when the index
+    has grown fourfold). Calls more than ``retention_s`` older than the wall
+    clock are evicted when the index is saved, and the matrix is compacted
+    once half of it is dead.
+
+    The app, the job service and batch.py share one saved index. A save takes
+    a file lock, re-reads the file and adds the calls this process indexed
+    since its last save, so no process drops the others' calls.
+    """
+
+    def __init__(self, dim=384, path=INCIDENT_INDEX["path"], ivf_min_size=INCIDENT_INDEX["ivf_min_size"],
+                 nprobe=INCIDENT_INDEX["nprobe"], retention_s=INCIDENT_INDEX["retention_s"]):
+        self.dim = dim
+        self.path = path
+        self.retention_s = retention_s
+        self.ivf_min_size = ivf_min_size
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        # Call ids added since the last save
+        self._unsaved = set()
+        self._reset(capacity=1024)
+        self._saved_at = time.monotonic()
+        if path and os.path.exists(path):
+            self.load()
+
+    def _reset(self, capacity):
+        self.vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.call_ids = []
+        self.rows = {}
+        self.size = 0
+        self.centroids = None
+        self.lists = None
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _grow(self):
+        capacity = len(self.vectors) * 2
+        for name in ("vectors", "timestamps", "alive"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add(self, call_id, embedding, timestamp=None):
+        """Insert (or replace) one call's unit embedding"""
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if call_id in self.rows:
+                self.alive[self.rows.pop(call_id)] = False
+            if self.size == len(self.vectors):
+                self._grow()
+            row = self.size
+            self.vectors[row] = embedding
+            self.timestamps[row] = timestamp
+            self.alive[row] = True
+            self.call_ids.append(call_id)
+            self.rows[call_id] = row
+            self.size += 1
+            self._unsaved.add(call_id)
+
+            if self.centroids is not None:
+                self._assign(np.array([row]))
+            if len(self.rows) >= max(self.ivf_min_size, 4 * self._trained_size):
+                self._train()
+        return row
+
+    def _train(self, iterations=10, sample_size=20000):
+        """k-means over (a sample of) the live rows, then assign every row to a list"""
+        live = np.flatnonzero(self.alive[:self.size])
+        n_lists = max(1, int(np.sqrt(len(live))))
+        rng = np.random.default_rng(0)
+        sample = self.vectors[rng.choice(live, min(len(live), sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for j in range(n_lists):
+                members = sample[labels == j]
+                if len(members):
+                    mean = members.sum(axis=0)
+                    centroids[j] = mean / (np.linalg.norm(mean) or 1.0)
+        self.centroids = centroids
+        self.lists = [[] for _ in range(n_lists)]
+        self._trained_size = len(live)
+        self._assign(live)
+
+    def _assign(self, rows):
+        labels = np.argmax(self.vectors[rows] @ self.centroids.T, axis=1)
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            self.lists[label].append(row)
+
+    def _candidates(self, query):
+        """Candidate rows and their scores: every row, or the rows of the nearest lists"""
+        if self.centroids is None:
+            # A contiguous slice avoids gathering the matrix for brute force
+            return np.arange(self.size), self.vectors[:self.size] @ query
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.fromiter((row for j in probes for row in self.lists[j]), dtype=np.int64)
+        return rows, self.vectors[rows] @ query
+
+    def search(self, embedding, k=INCIDENT_INDEX["max_results"], start=None, end=None, min_score=None, exclude=None):
+        """
+        Most similar calls, best first, as (call_id, score, timestamp)
+
+        Args:
+            start, end (float): Only calls with start <= timestamp <= end
+            min_score (float): Drop calls less similar than this (cosine)
+            exclude: A call id to leave out (usually the query's own)
+        """
+        query = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            rows, scores = self._candidates(query)
+            if not len(rows):
+                return []
+            mask = self.alive[rows]
+            if start is not None:
+                mask &= self.timestamps[rows] >= start
+            if end is not None:
+                mask &= self.timestamps[rows] <= end
+            if exclude is not None and exclude in self.rows:
+                mask &= rows != self.rows[exclude]
+            rows, scores = rows[mask], scores[mask]
+            if min_score is not None:
+                keep = scores >= min_score
+                rows, scores = rows[keep], scores[keep]
+            if len(rows) > k:
+                # argpartition picks the top k without sorting every score
+                top = np.argpartition(-scores, k - 1)[:k]
+                rows, scores = rows[top], scores[top]
+            order = np.argsort(-scores)
+            return [(self.call_ids[r], float(scores[i]), float(self.timestamps[r]))
+                    for i, r in zip(order, rows[order])]
+
+    def evict(self, older_than):
+        """Drop calls with a timestamp before ``older_than``; returns how many"""
+        with self._lock:
+            expired = np.flatnonzero(self.alive[:self.size] & (self.timestamps[:self.size] < older_than))
+            for row in expired.tolist():
+                del self.rows[self.call_ids[row]]
+            self.alive[expired] = False
+            if self.size and len(self.rows) < self.size // 2:
+                self._compact()
+            return len(expired)
+
+    def _compact(self):
+        live = np.flatnonzero(self.alive[:self.size])
+        vectors, timestamps = self.vectors[live], self.timestamps[live]
+        call_ids = [self.call_ids[row] for row in live.tolist()]
+        centroids, trained_size = self.centroids, self._trained_size
+        self._reset(capacity=max(1024, 2 * len(live)))
+        self._bulk_load(call_ids, vectors, timestamps)
+        if centroids is not None and len(live) >= self.ivf_min_size:
+            # Keep the trained partitions; only the row numbers changed
+            self.centroids, self._trained_size = centroids, trained_size
+            self.lists = [[] for _ in range(len(centroids))]
+            self._assign(np.arange(self.size))
+
+    def _bulk_load(self, call_ids, vectors, timestamps):
+        n = len(call_ids)
+        while len(self.vectors) < n:
+            self._grow()
+        self.vectors[:n] = vectors
+        self.timestamps[:n] = timestamps
+        self.alive[:n] = True
+        self.call_ids = list(call_ids)
+        self.rows = {call_id: row for row, call_id in enumerate(self.call_ids)}
+        self.size = n
+
+    def _take_unsaved(self):
+        """(call_ids, vectors, timestamps) of the live calls added since the last save"""
+        call_ids = [call_id for call_id in self._unsaved if call_id in self.rows]
+        rows = np.array([self.rows[call_id] for call_id in call_ids], dtype=np.int64)
+        self._unsaved = set()
+        return call_ids, self.vectors[rows], self.timestamps[rows]
+
+    def save(self, path=None):
+        """
+        Merge the calls added since the last save into the .npz (with the
+        trained centroids), dropping calls past the retention period
+        """
+        path = path or self.path
+        self.evict(time.time() - self.retention_s)
+        with locked(path):
+            with self._lock:
+                call_ids, vectors, timestamps = self._take_unsaved()
+                centroids, trained_size = self.centroids, self._trained_size
+                self._saved_at = time.monotonic()
+            saved = self._read(path)
+            if saved is not None:
+                # This process's copy of a call wins over the saved one
+                mine = set(call_ids)
+                keep = [i for i, call_id in enumerate(saved["call_ids"]) if call_id not in mine]
+                call_ids = [saved["call_ids"][i] for i in keep] + call_ids
+                vectors = np.concatenate([saved["vectors"][keep], vectors])
+                timestamps = np.concatenate([saved["timestamps"][keep], timestamps])
+                if centroids is None:
+                    centroids, trained_size = saved["centroids"], saved["trained_size"]
+                fresh = timestamps >= time.time() - self.retention_s
+                call_ids = [call_id for call_id, keep in zip(call_ids, fresh.tolist()) if keep]
+                vectors, timestamps = vectors[fresh], timestamps[fresh]
+            arrays = {
+                "vectors": vectors,
+                "timestamps": timestamps,
+                "call_ids": np.array(call_ids, dtype=str)
+            }
+            if centroids is not None:
+                arrays["centroids"] = centroids
+                arrays["trained_size"] = np.array(trained_size)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, path)
+            self._adopt(call_ids, vectors, timestamps, centroids, trained_size)
+
+    def maybe_save(self):
+        """Save if the configured interval has passed since the last save"""
+        if self.path and time.monotonic() - self._saved_at >= INCIDENT_INDEX["save_interval_s"]:
+            self.save()
+
+    def _read(self, path):
+        """The saved arrays as a dict, or None when there is no usable file"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                saved = {
+                    "vectors": data["vectors"],
+                    "timestamps": data["timestamps"],
+                    "call_ids": data["call_ids"].tolist(),
+                    "centroids": data["centroids"] if "centroids" in data else None,
+                    "trained_size": int(data["trained_size"]) if "trained_size" in data else 0
+                }
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable incident index: {e}")
+            return None
+        if saved["vectors"].ndim != 2 or saved["vectors"].shape[1] != self.dim:
+            print(f"Ignoring incident index with {saved['vectors'].shape[-1]}-d vectors, expected {self.dim}")
+            return None
+        return saved
+
+    def _adopt(self, call_ids, vectors, timestamps, centroids, trained_size):
+        """Replace the rows with merged ones, keeping the calls added meanwhile"""
+        with self._lock:
+            late_ids, late_vectors, late_timestamps = self._take_unsaved()
+            self._reset(capacity=max(1024, 2 * (len(call_ids) + len(late_ids))))
+            self._bulk_load(call_ids, vectors, timestamps)
+            if centroids is not None:
+                self.centroids, self._trained_size = centroids, trained_size
+                self.lists = [[] for _ in range(len(centroids))]
+                self._assign(np.arange(self.size))
+        for call_id, vector, timestamp in zip(late_ids, late_vectors, late_timestamps):
+            self.add(call_id, vector, timestamp)
+
+    def load(self, path=None):
+        saved = self._read(path or self.path)
+        if saved is not None:
+            self._adopt(saved["call_ids"], saved["vectors"], saved["timestamps"],
+                        saved["centroids"], saved["trained_size"])
+
+
+# Singleton-like global instance
+_index_instance = None
+_index_lock = threading.Lock()
+
+
+def get_incident_index():
+    global _index_instance
+    with _index_lock:
+        if _index_instance is None:
+            _index_instance = IncidentIndex()
+        return _index_instance
+
+
+def link_duplicates(call_id, embedding, timestamp=None, autosave=True):
+    """
+    Add a call to the index and return its likely duplicates
+
+    Duplicates are earlier or later calls within ``window_s`` of this one whose
+    transcript embedding is at least ``threshold`` similar. With ``autosave``
+    the index is saved (and calls past the retention period evicted) every
+    ``save_interval_s``; without it the caller saves, e.g. at the end of a run.
+
+    Returns:
+        list: [{"call_id", "score", "timestamp"}, ...] most similar first
+    """
+    index = get_incident_index()
+    timestamp = time.time() if timestamp is None else timestamp
+    window = INCIDENT_INDEX["window_s"]
+    duplicates = index.search(
+        embedding,
+        start=timestamp - window,
+        end=timestamp + window,
+        min_score=INCIDENT_INDEX["threshold"],
+        exclude=call_id
+    )
+    index.add(call_id, embedding, timestamp)
+    if autosave:
+        index.maybe_save()
+    return [{"call_id": c, "score": round(s, 4), "timestamp": t} for c, s, t in duplicates]
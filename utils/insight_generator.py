@@ -1,21 +1,83 @@
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from functools import lru_cache
+from utils import batching
+from utils.embedding_store import EmbeddingStore, description_hash
+from utils.quantization import get_backend_model, inference_threads, model_tag
+from utils.tracing import span
 
 CONFIG_FILE = Path(__file__).parent / "../crime_categories.json"
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+MEMO_SIZE = 1000
+ENCODE_BATCH_SIZE = 64
+
+def get_embedding_model(device=None, backend=None):
+    return get_backend_model(
+        EMBEDDING_MODEL,
+        lambda device: SentenceTransformer(EMBEDDING_MODEL, device=device),
+        device,
+        backend
+    )
+
+# Immutable snapshot of the taxonomy; swapped as a whole so a classification
+# running during an edit sees either the old or the new categories, never a mix
+_CategoryIndex = namedtuple("_CategoryIndex", "categories names embeddings matrix")
 
 class CrimeClassifier:
     def __init__(self):
-        self.model = self._load_model()
-        self.categories = self._load_categories()
-        self.category_embeddings = self._load_cached_embeddings()
+        self._load_model()
+        # int8 embeddings differ slightly from fp32 ones, so each backend keeps its own
+        self.store = EmbeddingStore(model_tag(EMBEDDING_MODEL))
+        # Per-text unit embeddings, bounded LRU; lives on the instance so it
+        # never pins the classifier the way lru_cache on a method does, and
+        # stays valid across category edits
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        # Taxonomy edits are written to disk off the calling request
+        self._persist_executor = ThreadPoolExecutor(max_workers=1)
+
+        categories = self._load_categories()
+        self._index = self._make_index(categories, self._load_cached_embeddings(categories))
+
+    @property
+    def categories(self):
+        return self._index.categories
+
+    @property
+    def category_names(self):
+        return self._index.names
+
+    @property
+    def category_embeddings(self):
+        return self._index.embeddings
+
+    @property
+    def category_matrix(self):
+        return self._index.matrix
+
+    def _make_index(self, categories, embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        # Unit rows so a single matrix product gives cosine similarities
+        return _CategoryIndex(
+            categories=categories,
+            names=list(categories.keys()),
+            embeddings=embeddings,
+            matrix=embeddings / np.maximum(norms, 1e-12)
+        )
 
     def _load_model(self):
-        print("Loading embedding model...")
-        return SentenceTransformer('all-MiniLM-L6-v2')
+        return get_embedding_model()
+
+    @property
+    def model(self):
+        return get_embedding_model()
 
     def _load_categories(self):
         if CONFIG_FILE.exists():
@@ -35,40 +97,137 @@ class CrimeClassifier:
             "Other": "General complaint not matching specific categories"
         }
 
-    def _save_categories(self):
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.categories, f, indent=2, ensure_ascii=False)
+    def _save_categories(self, categories):
+        tmp = f"{CONFIG_FILE}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(categories, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, CONFIG_FILE)
 
-    def _load_cached_embeddings(self):
-        descriptions = list(self.categories.values())
-        print("Encoding category descriptions...")
-        return self.model.encode(descriptions, show_progress_bar=False)
+    def _encode_descriptions(self, descriptions):
+        with inference_threads("embedding"):
+            return self.model.encode(descriptions, show_progress_bar=False)
 
-    @lru_cache(maxsize=1000)
-    def classify(self, text, threshold=0.4):
-        text_embedding = self.model.encode([text], show_progress_bar=False)
-        similarities = cosine_similarity(text_embedding, self.category_embeddings)
-        scores = similarities[0]
-        max_idx = np.argmax(scores)
+    def _load_cached_embeddings(self, categories):
+        return self.store.embeddings_for(list(categories.values()), self._encode_descriptions)
+
+    def _swap_categories(self, categories):
+        """Build the new index (encoding only new descriptions) and swap it in"""
+        previous = self._index
+        known = dict(zip(previous.categories.values(), previous.embeddings))
+        missing = [d for d in categories.values() if d not in known]
+        if missing:
+            known.update(zip(missing, self._encode_descriptions(missing)))
+        embeddings = np.vstack([known[d] for d in categories.values()])
+        self._index = self._make_index(categories, embeddings)
+        self._persist_executor.submit(self._persist, self._index)
 
-        best_category = list(self.categories.keys())[max_idx]
-        confidence = scores[max_idx]
+    def _persist(self, index):
+        try:
+            self._save_categories(index.categories)
+            self.store.save([description_hash(d) for d in index.categories.values()], index.embeddings)
+        except Exception as e:
+            print(f"Saving crime categories failed: {e}")
 
-        return (best_category, confidence) if confidence >= threshold else ("Other", confidence)
+    def flush(self):
+        """Block until pending taxonomy edits are on disk"""
+        self._persist_executor.submit(lambda: None).result()
+
+    def _embed(self, texts):
+        """Unit embeddings for the texts, memoised per text"""
+        rows = [None] * len(texts)
+        missing = {}
+        with self._memo_lock:
+            for i, text in enumerate(texts):
+                cached = self._memo.get(text)
+                if cached is not None:
+                    self._memo.move_to_end(text)
+                    rows[i] = cached
+                else:
+                    missing.setdefault(text, []).append(i)
+
+        if missing:
+            unique = list(missing)
+            # Shares encode batches with concurrent classifications and weapon checks
+            embeddings = batching.encode(
+                unique,
+                get_embedding_model,
+                model_tag(EMBEDDING_MODEL),
+                normalize=True,
+                batch_size=ENCODE_BATCH_SIZE
+            )
+            with self._memo_lock:
+                for text, row in zip(unique, np.asarray(embeddings, dtype=np.float32)):
+                    for i in missing[text]:
+                        rows[i] = row
+                    self._memo[text] = row
+                    if len(self._memo) > MEMO_SIZE:
+                        self._memo.popitem(last=False)
+
+        return np.vstack(rows)
+
+    def embed(self, texts):
+        """Unit MiniLM embeddings of the texts (shared with classification's memo)"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._embed(texts)
+
+    def classify_batch(self, texts, threshold=0.4, top_k=3):
+        """
+        Classify many texts with one encode call and one matrix product
+
+        Returns:
+            list: One dict per text: {
+                'category': best category, or "Other" below threshold,
+                'confidence': float,
+                'top_k': [(category, score), ...] highest first
+            }
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        with span("classify", model=model_tag(EMBEDDING_MODEL), size=len(texts), unit="texts"):
+            return self._classify_batch(texts, threshold, top_k)
+
+    def _classify_batch(self, texts, threshold, top_k):
+        index = self._index
+        names = index.names
+        scores = self._embed(texts) @ index.matrix.T
+        k = min(top_k, len(names))
+        # argpartition picks the top k without sorting every row
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results = []
+        for idx, row_scores in zip(top, top_scores):
+            confidence = float(row_scores[0])
+            results.append({
+                'category': names[idx[0]] if confidence >= threshold else "Other",
+                'confidence': confidence,
+                'top_k': [(names[j], float(score)) for j, score in zip(idx, row_scores)]
+            })
+        return results
+
+    def classify(self, text, threshold=0.4):
+        result = self.classify_batch([text], threshold, top_k=1)[0]
+        return result['category'], result['confidence']
 
     def update_category(self, name, description):
-        self.categories[name] = description
-        self._save_categories()
-        self.category_embeddings = self._load_cached_embeddings()
-        self.classify.cache_clear()
+        with self._update_lock:
+            categories = dict(self.categories)
+            categories[name] = description
+            self._swap_categories(categories)
 
     def remove_category(self, name):
-        if name in self.categories and name != "Other":
-            del self.categories[name]
-            self._save_categories()
-            self.category_embeddings = self._load_cached_embeddings()
-            self.classify.cache_clear()
-            return True
+        with self._update_lock:
+            if name in self.categories and name != "Other":
+                categories = dict(self.categories)
+                del categories[name]
+                self._swap_categories(categories)
+                return True
         return False
 
 # Singleton-like global instance
@@ -83,6 +242,9 @@ def get_classifier():
 def classify_crime(text, threshold=0.4):
     return get_classifier().classify(text, threshold)
 
+def classify_crimes(texts, threshold=0.4, top_k=3):
+    return get_classifier().classify_batch(texts, threshold, top_k)
+
 def update_crime_categories(updates):
     classifier = get_classifier()
     for name, desc in updates.items():
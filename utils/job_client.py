@@ -0,0 +1,110 @@
+import http.client
+import json
+import socket
+import time
+from urllib.parse import quote, urlsplit
+from config import JOB_SERVICE
+from utils.job_queue import FINISHED
+
+
+class JobServiceError(RuntimeError):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"Job service error {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class JobClient:
+    """
+    Blocking client for the job service (service.py), over TCP or a Unix socket
+
+    Usage:
+        client = JobClient()
+        job = client.submit(audio_bytes, "call.mp3")
+        job = client.wait(job["id"])          # the finished job, with "result"
+    """
+
+    def __init__(self, url=JOB_SERVICE["url"], unix_socket=JOB_SERVICE["unix_socket"], timeout=30):
+        self.url = urlsplit(url)
+        self.unix_socket = unix_socket
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.unix_socket:
+            return _UnixHTTPConnection(self.unix_socket, self.timeout)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+
+    def _request(self, method, path, body=None, expect=(200,)):
+        conn = self._connection()
+        try:
+            conn.request(method, path, body=body,
+                         headers={"Content-Type": "application/octet-stream"} if body is not None else {})
+            response = conn.getresponse()
+            payload = response.read()
+        except OSError as e:
+            raise JobServiceError(None, f"cannot reach {self.unix_socket or self.url.geturl()}: {e}") from e
+        finally:
+            conn.close()
+        data = json.loads(payload) if payload and response.getheader("Content-Type", "").startswith(
+            "application/json") else {}
+        if response.status not in expect:
+            retry_after = response.getheader("Retry-After")
+            raise JobServiceError(
+                response.status,
+                data.get("error") or data.get("status") or response.reason,
+                float(retry_after) if retry_after else None
+            )
+        return data
+
+    def submit(self, data, filename):
+        """Queue a recording; raises JobServiceError (status 429 when the queue is full)"""
+        return self._request("POST", f"/jobs?filename={quote(filename)}", body=data, expect=(202,))
+
+    def status(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def result(self, job_id):
+        """The job with its "result"; still queued or running jobs come back without one"""
+        return self._request("GET", f"/jobs/{job_id}/result", expect=(200, 202, 409))
+
+    def cancel(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}", expect=(200, 409))
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def hot_spots(self):
+        return self._request("GET", "/hot-spots")
+
+    def wait(self, job_id, poll_interval=JOB_SERVICE["poll_interval_s"], timeout=None, on_status=None):
+        """
+        Poll until the job finishes and return it with its result
+
+        ``on_status(job)`` is called with each status seen while waiting.
+        Raises TimeoutError after ``timeout`` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.status(job_id)
+            if job["status"] in FINISHED:
+                return self.result(job_id)
+            if on_status:
+                on_status(job)
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} still {job['status']} after {timeout}s")
+            time.sleep(poll_interval)
+
+
+def get_job_client():
+    return JobClient()
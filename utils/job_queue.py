@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from config import JOB_SERVICE
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class QueueFull(RuntimeError):
+    def __init__(self, queued):
+        super().__init__(f"Job queue is full ({queued} jobs waiting)")
+        self.queued = queued
+
+
+class JobQueue:
+    """
+    Persistent FIFO of analysis jobs
+
+    Jobs survive a restart of the service: anything still marked running when
+    the queue is opened again was lost with its worker and is requeued.
+    Admission is bounded by ``max_queued`` waiting jobs, checked in the same
+    statement as the insert so concurrent submissions cannot overshoot it.
+    """
+
+    def __init__(self, path=JOB_SERVICE["db_path"]):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                filename TEXT,
+                audio_path TEXT,
+                submitted_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, submitted_at);
+        """)
+        self._conn.commit()
+
+    def submit(self, filename, audio_path, max_queued=JOB_SERVICE["max_queued"], job_id=None):
+        """Enqueue a job; raises QueueFull when ``max_queued`` jobs are already waiting"""
+        job_id = job_id or uuid.uuid4().hex
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                "INSERT INTO jobs (id, status, filename, audio_path, submitted_at) "
+                "SELECT ?, ?, ?, ?, ? WHERE (SELECT COUNT(*) FROM jobs WHERE status = ?) < ?",
+                (job_id, QUEUED, filename, audio_path, time.time(), QUEUED, max_queued)
+            ).rowcount
+            if not inserted:
+                raise QueueFull(self._count(QUEUED))
+        return self.get(job_id)
+
+    def claim(self):
+        """Mark the oldest queued job running and return it, or None"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 "
+                "WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY submitted_at LIMIT 1) "
+                "RETURNING id, filename, audio_path, attempts",
+                (RUNNING, time.time(), QUEUED)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def finish(self, job_id, status, result=None, error=None):
+        """Record the outcome of a running job; False if it was cancelled meanwhile"""
+        with self._lock, self._conn:
+            return bool(self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ? AND status = ?",
+                (status, time.time(), None if result is None else json.dumps(result, ensure_ascii=False),
+                 error, job_id, RUNNING)
+            ).rowcount)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the status it had (None if unknown)"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row and row["status"] in (QUEUED, RUNNING):
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?",
+                    (CANCELLED, time.time(), job_id)
+                )
+        return row["status"] if row else None
+
+    def requeue_running(self, max_attempts=3):
+        """
+        Put jobs left running by a previous process back in the queue; returns
+        how many. A job that was already started ``max_attempts`` times fails
+        instead, so one recording that kills the service cannot do so forever.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE status = ? AND attempts >= ?",
+                (FAILED, time.time(), "Interrupted too many times", RUNNING, max_attempts)
+            )
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING)
+            ).rowcount
+
+    def get(self, job_id, with_result=False):
+        """
+        Job status, or None if unknown
+
+        Returns:
+            dict: {"id", "status", "filename", "submitted_at", "started_at",
+                   "finished_at", "attempts", "error", "position" (0-based, while
+                   queued), and "result" when asked for and done}
+        """
+        columns = "id, status, filename, submitted_at, started_at, finished_at, attempts, error"
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {columns}{', result' if with_result else ''} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job["status"] == QUEUED:
+                job["position"] = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND submitted_at < ?",
+                    (QUEUED, job["submitted_at"])
+                ).fetchone()[0]
+        if with_result:
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _count(self, status):
+        return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def counts(self):
+        """Number of jobs per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict.fromkeys((QUEUED, RUNNING) + FINISHED, 0) | {status: n for status, n in rows}
+
+    def purge(self, older_than):
+        """Delete jobs that finished before ``older_than``; returns how many"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished_at < ?",
+                (*FINISHED, older_than)
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,325 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from aiohttp import web
+from config import ANALYTICS_STORE, INCIDENT_INDEX, JOB_SERVICE, MAX_FILE_SIZE, ROLLING_AGGREGATES
+from utils.job_queue import CANCELLED, DONE, FAILED, FINISHED, QUEUED, RUNNING, JobQueue, QueueFull
+
+PURGE_INTERVAL_S = 3600
+
+
+def _worker_main(conn, threads_per_worker, threshold, use_cache):
+    """Worker process: load the batch pipeline once, then run one job per message"""
+    # batch.py's worker is the pipeline the service runs; imported here so only
+    # the spawned workers load torch and the models
+    from batch import _init_worker, process_file
+    _init_worker(threads_per_worker, threshold, use_cache)
+    while True:
+        try:
+            path = conn.recv()
+        except EOFError:
+            return
+        if path is None:
+            return
+        conn.send(process_file(path))
+
+
+class WorkerSlot:
+    """
+    One worker process and the pipe to it
+
+    A job is cancelled by terminating the process it runs in; the slot then
+    starts a fresh worker (which loads its models again).
+    """
+
+    def __init__(self, index, ctx, initargs):
+        self.index = index
+        self.ctx = ctx
+        self.initargs = initargs
+        self.job_id = None
+        self.killed = False
+        self.started = 0
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        parent, child = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main, args=(child,) + self.initargs, name=f"job-worker-{self.index}", daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.conn = parent
+        self.started += 1
+
+    def run(self, path):
+        """Blocking: run one job and return its record; EOFError if the worker died"""
+        self.conn.send(path)
+        return self.conn.recv()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def cancel(self, job_id):
+        """Stop the worker if it is running ``job_id``"""
+        if self.job_id == job_id:
+            self.killed = True
+            self.kill()
+            return True
+        return False
+
+    def restart(self):
+        self.kill()
+        self.process.join(timeout=10)
+        self.conn.close()
+        self.killed = False
+        self.start()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+
+class JobService:
+    """
+    Local analysis service: a persistent job queue in front of a worker pool
+
+    Uploads are spooled to disk and queued in SQLite; each worker slot claims
+    the oldest queued job as soon as its process is free, so the number of
+    workers, not the number of UI sessions, bounds how many calls are analysed
+    at once. When ``max_queued`` jobs are already waiting, new submissions are
+    rejected with 429 and a Retry-After header. Finished results go through
+    the same post-processing as batch.py (duplicate linking, analytics store,
+    rolling aggregates) in this process, not in the workers. The app and
+    batch.py may update the same files: the store is SQLite, and the index and
+    aggregates merge their snapshots under a file lock when saved.
+    """
+
+    def __init__(self, workers=JOB_SERVICE["workers"], max_queued=JOB_SERVICE["max_queued"],
+                 threads_per_worker=None, threshold=JOB_SERVICE["threshold"], use_cache=True,
+                 queue=None, spool_dir=JOB_SERVICE["spool_dir"]):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.threshold = threshold
+        self.use_cache = use_cache
+        self.queue = queue or JobQueue()
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.slots = []
+        self._tasks = []
+        self._executor = ThreadPoolExecutor(max_workers=workers + 1, thread_name_prefix="jobs")
+        self._jobs_available = None
+
+    async def start(self):
+        requeued = self.queue.requeue_running()
+        if requeued:
+            print(f"Requeued {requeued} jobs interrupted by the last shutdown")
+        self._jobs_available = asyncio.Condition()
+        # spawn keeps torch/CUDA state out of the children
+        ctx = multiprocessing.get_context("spawn")
+        initargs = (self.threads_per_worker, self.threshold, self.use_cache)
+        self.slots = [WorkerSlot(i, ctx, initargs) for i in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._slot_loop(slot)) for slot in self.slots]
+        self._tasks.append(asyncio.create_task(self._purge_loop()))
+
+    async def stop(self):
+        from utils.incident_index import get_incident_index
+        from utils.rolling_aggregates import get_rolling_aggregates
+        for task in self._tasks:
+            task.cancel()
+        for slot in self.slots:
+            slot.stop()
+        self._executor.shutdown(wait=False)
+        if ROLLING_AGGREGATES["enabled"]:
+            get_rolling_aggregates().save()
+        if INCIDENT_INDEX["enabled"]:
+            get_incident_index().save()
+        self.queue.close()
+
+    async def _claim(self):
+        # Claiming under the condition's lock means a submission cannot slip in
+        # between an empty claim and the wait
+        async with self._jobs_available:
+            while (job := self.queue.claim()) is None:
+                await self._jobs_available.wait()
+            return job
+
+    async def _slot_loop(self, slot):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._claim()
+            slot.job_id = job["id"]
+            try:
+                record = await loop.run_in_executor(self._executor, slot.run, job["audio_path"])
+            except (EOFError, OSError):
+                # Terminated for a cancellation, or crashed
+                record = None
+            finally:
+                slot.job_id = None
+            if record is None or slot.killed:
+                # Also after a kill that raced the job's completion, so the
+                # next job never lands on a dying process
+                await loop.run_in_executor(self._executor, slot.restart)
+
+            try:
+                if record is None:
+                    self.queue.finish(job["id"], FAILED, error="Worker process exited")
+                elif record["status"] != "ok":
+                    self.queue.finish(job["id"], FAILED, error=record["error"])
+                else:
+                    record = await loop.run_in_executor(self._executor, self._postprocess, job, record)
+                    self.queue.finish(job["id"], DONE, result=record)
+            except Exception as e:
+                print(f"Job {job['id']} could not be completed: {type(e).__name__}: {e}")
+                self.queue.finish(job["id"], FAILED, error=f"{type(e).__name__}: {e}")
+            self._remove_audio(job["audio_path"])
+
+    def _postprocess(self, job, record):
+        """Link duplicates and update the store and aggregates, as batch.py's parent process does"""
+        from utils.analytics_store import get_analytics_store, to_timestamp
+        from utils.incident_index import link_duplicates
+        from utils.rolling_aggregates import get_rolling_aggregates
+        from utils.tracing import METRICS
+
+        audio_hash = record["audio_hash"]
+        record["file"] = job["filename"]
+        record["job_id"] = job["id"]
+        record["metadata"]["filename"] = job["filename"]
+        timestamp = to_timestamp(record["metadata"]["processed_at"])
+        embedding = record.pop("embedding", None)
+        if embedding is not None:
+            record["duplicates"] = link_duplicates(audio_hash, embedding, timestamp)
+        if "trace" in record["metadata"]:
+            METRICS.observe_trace(record["metadata"]["trace"])
+        if ANALYTICS_STORE["enabled"]:
+            get_analytics_store().add(record, source=audio_hash)
+        if ROLLING_AGGREGATES["enabled"]:
+            aggregates = get_rolling_aggregates()
+            aggregates.update(record["classification"], record["entities"], timestamp)
+            aggregates.maybe_save()
+        return record
+
+    def _spool_path(self, job_id, filename):
+        # The extension is kept so the decoder can tell the container apart
+        return self.spool_dir / f"{job_id}{Path(filename or '').suffix.lower()}"
+
+    def _remove_audio(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    async def _purge_loop(self):
+        while True:
+            self.queue.purge(time.time() - JOB_SERVICE["retention_s"])
+            await asyncio.sleep(PURGE_INTERVAL_S)
+
+    async def submit(self, data, filename):
+        """Spool and enqueue an upload; raises QueueFull"""
+        # Cheap early rejection, before the upload is written to disk
+        queued = self.queue.counts()[QUEUED]
+        if queued >= self.max_queued:
+            raise QueueFull(queued)
+        job_id = os.urandom(16).hex()
+        path = self._spool_path(job_id, filename)
+        path.write_bytes(data)
+        try:
+            job = self.queue.submit(filename, str(path), self.max_queued, job_id=job_id)
+        except QueueFull:
+            self._remove_audio(path)
+            raise
+        async with self._jobs_available:
+            self._jobs_available.notify()
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job; a running one is stopped by terminating its worker"""
+        previous = self.queue.cancel(job_id)
+        if previous == QUEUED:
+            self._remove_audio(self._spool_path(job_id, self.queue.get(job_id)["filename"]))
+        elif previous == RUNNING:
+            any(slot.cancel(job_id) for slot in self.slots)
+        return previous
+
+    def health(self):
+        return {
+            "workers": len(self.slots),
+            "busy": sum(slot.job_id is not None for slot in self.slots),
+            "alive": sum(slot.process.is_alive() for slot in self.slots),
+            "max_queued": self.max_queued,
+            "jobs": self.queue.counts()
+        }
+
+
+def create_app(service):
+    """aiohttp application exposing the job API"""
+    async def submit(request):
+        filename = request.query.get("filename") or request.headers.get("X-Filename") or "upload.wav"
+        try:
+            job = await service.submit(await request.read(), os.path.basename(filename))
+        except QueueFull as e:
+            return web.json_response(
+                {"error": str(e), "queued": e.queued},
+                status=429,
+                headers={"Retry-After": str(JOB_SERVICE["retry_after_s"])}
+            )
+        return web.json_response(job, status=202, headers={"Location": f"/jobs/{job['id']}"})
+
+    async def status(request):
+        job = service.queue.get(request.match_info["job_id"])
+        if job is None:
+            raise web.HTTPNotFound()
+        return web.json_response(job)
+
+    async def result(request):
+        job = service.queue.get(request.match_info["job_id"], with_result=True)
+        if job is None:
+            raise web.HTTPNotFound()
+        if job["status"] not in FINISHED:
+            return web.json_response(job, status=202)
+        return web.json_response(job, status=200 if job["status"] == DONE else 409)
+
+    async def cancel(request):
+        job_id = request.match_info["job_id"]
+        previous = service.cancel(job_id)
+        if previous is None:
+            raise web.HTTPNotFound()
+        job = service.queue.get(job_id)
+        return web.json_response(job, status=200 if job["status"] == CANCELLED and previous != CANCELLED else 409)
+
+    async def health(request):
+        return web.json_response(service.health())
+
+    async def hot_spots(request):
+        from utils.rolling_aggregates import get_rolling_aggregates
+        if not ROLLING_AGGREGATES["enabled"]:
+            return web.json_response({})
+        return web.json_response(get_rolling_aggregates().dashboard())
+
+    async def on_startup(app):
+        await service.start()
+
+    async def on_cleanup(app):
+        await service.stop()
+
+    # Uploads the decoder would reject get a 413 here, before taking a worker
+    app = web.Application(client_max_size=MAX_FILE_SIZE)
+    app.router.add_post("/jobs", submit)
+    app.router.add_get("/jobs/{job_id}", status)
+    app.router.add_get("/jobs/{job_id}/result", result)
+    app.router.add_delete("/jobs/{job_id}", cancel)
+    app.router.add_get("/health", health)
+    app.router.add_get("/hot-spots", hot_spots)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
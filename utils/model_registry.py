@@ -0,0 +1,199 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from config import MODEL_REGISTRY
+
+# torch is imported on first use so importing the registry (e.g. from app.py)
+# stays cheap until a model is actually needed
+
+
+def default_device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _rss_bytes():
+    """Current resident set size (Linux); 0 where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _torch_modules(model):
+    """The torch modules behind a model object (pipelines wrap theirs in .model)"""
+    import torch
+    if isinstance(model, torch.nn.Module):
+        return [model]
+    inner = getattr(model, "model", None)
+    if isinstance(inner, torch.nn.Module):
+        return [inner]
+    return []
+
+
+def estimate_model_bytes(model):
+    """Bytes held by a model's parameters and buffers, or None if it has no torch modules"""
+    modules = _torch_modules(model)
+    if not modules:
+        return None
+    total = 0
+    for module in modules:
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class _Entry:
+    __slots__ = ("model", "bytes", "loaded_at", "last_used", "hits")
+
+    def __init__(self, model, size):
+        self.model = model
+        self.bytes = size
+        self.loaded_at = self.last_used = time.time()
+        self.hits = 0
+
+
+class ModelRegistry:
+    """
+    Process-wide model cache keyed by (model ID, device)
+
+    Tracks each model's resident size and evicts the least recently used models
+    once the memory budget is exceeded. Concurrent first requests for the same
+    model wait on a single load. Callers should fetch models through the
+    registry on use rather than holding on to them, or eviction frees nothing.
+    """
+
+    def __init__(self, budget_bytes=MODEL_REGISTRY["memory_budget_mb"] * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, model_id, loader, device=None):
+        """
+        Return the model, loading it with ``loader(device)`` on first use
+
+        Args:
+            model_id (str): Hub ID or other stable name of the model
+            loader (callable): device -> model, only called on a miss
+            device (str): "cpu"/"cuda"; defaults to CUDA when available
+        """
+        device = device or default_device()
+        key = (model_id, device)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.last_used = time.time()
+                entry.hits += 1
+                return entry.model
+            pending = self._loading.get(key)
+            if pending is None:
+                pending = Future()
+                self._loading[key] = pending
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            print(f"Loading model: {model_id} ({device})")
+            rss_before = _rss_bytes()
+            model = loader(device)
+            size = estimate_model_bytes(model)
+            if size is None:
+                size = max(0, _rss_bytes() - rss_before)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            self._entries[key] = _Entry(model, size)
+            del self._loading[key]
+            self.loads += 1
+            evicted = self._evict_over_budget(keep=key)
+        pending.set_result(model)
+        if evicted:
+            self._release_memory()
+        return model
+
+    def _evict_over_budget(self, keep):
+        evicted = []
+        while self.resident_bytes() > self.budget_bytes and len(self._entries) > 1:
+            key = next(k for k in self._entries if k != keep)
+            entry = self._entries.pop(key)
+            evicted.append(key)
+            self.evictions += 1
+            print(f"Evicting model: {key[0]} ({key[1]}), {entry.bytes / 1024 / 1024:.0f} MB")
+        return evicted
+
+    def _release_memory(self):
+        import torch
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def resident_bytes(self):
+        return sum(entry.bytes for entry in self._entries.values())
+
+    def evict(self, model_id, device=None):
+        with self._lock:
+            removed = self._entries.pop((model_id, device or default_device()), None)
+        if removed is not None:
+            self.evictions += 1
+            self._release_memory()
+        return removed is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._release_memory()
+
+    def is_loaded(self, model_id, device=None):
+        return (model_id, device or default_device()) in self._entries
+
+    def stats(self):
+        with self._lock:
+            models = [
+                {
+                    "model_id": model_id,
+                    "device": device,
+                    "mb": round(entry.bytes / 1024 / 1024, 1),
+                    "hits": entry.hits,
+                    "idle_s": round(time.time() - entry.last_used, 1)
+                }
+                for (model_id, device), entry in self._entries.items()
+            ]
+            return {
+                "resident_mb": round(self.resident_bytes() / 1024 / 1024, 1),
+                "budget_mb": round(self.budget_bytes / 1024 / 1024, 1),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "models": models
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
+
+
+def get_model(model_id, loader, device=None):
+    return get_registry().get(model_id, loader, device)
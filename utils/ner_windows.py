@@ -0,0 +1,102 @@
+import re
+from config import NER_WINDOWS
+from utils import batching
+
+WORD = re.compile(r'\S+')
+
+
+def _units(text, tokenizer):
+    """Character spans of the model's tokens, or of words without a fast tokenizer"""
+    if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        return [tuple(span) for span in encoding["offset_mapping"] if span[1] > span[0]], True
+    return [m.span() for m in WORD.finditer(text)], False
+
+
+def make_windows(text, tokenizer=None, max_tokens=NER_WINDOWS["max_tokens"], stride=NER_WINDOWS["stride"]):
+    """
+    Character spans of overlapping windows of at most ``max_tokens`` tokens
+
+    Consecutive windows share ``stride`` tokens. Window edges are moved back to
+    a word start so no word is split between windows. One pass over the tokens,
+    so the cost is linear in the length of the text.
+    """
+    units, subword = _units(text, tokenizer)
+    if not subword:
+        # Roughly 1.3 word pieces per English word
+        max_tokens = max(1, int(max_tokens / 1.3))
+        stride = int(stride / 1.3)
+    if len(units) <= max_tokens:
+        return [(0, len(text))] if units else []
+    stride = min(stride, max_tokens // 2)
+
+    def word_start(i):
+        # Step back over word pieces glued to the previous token
+        while subword and i > 0 and units[i][0] == units[i - 1][1]:
+            i -= 1
+        return i
+
+    windows = []
+    start = 0
+    while True:
+        end = min(start + max_tokens, len(units))
+        if end < len(units):
+            snapped = word_start(end)
+            end = snapped if snapped > start else end
+        windows.append((units[start][0], units[end - 1][1]))
+        if end >= len(units):
+            return windows
+        next_start = word_start(max(end - stride, start + 1))
+        start = next_start if next_start > start else end
+
+
+def merge_window_entities(text, windows, outputs):
+    """
+    Shift window-relative entities to text offsets and drop duplicates
+
+    Where windows overlap, the same entity (or a truncated piece of it) can come
+    from both; the copy seen with the most context on both sides wins and any
+    overlapping candidate is dropped. Candidates are sorted by offset once and
+    swept into groups of mutually overlapping spans (only as large as the number
+    of windows sharing a stretch of text); the choice is made within each group.
+    """
+    candidates = []
+    last = len(windows) - 1
+    for index, ((w_start, w_end), entities) in enumerate(zip(windows, outputs)):
+        for entity in entities:
+            start, end = w_start + entity["start"], w_start + entity["end"]
+            left = start - w_start if index > 0 else float("inf")
+            right = w_end - end if index < last else float("inf")
+            candidates.append((start, end, -min(left, right), -entity.get("score", 0.0), len(candidates), entity))
+    candidates.sort(key=lambda c: (c[0], c[1]))
+
+    kept = []
+    group, group_end = [], -1
+    for candidate in candidates + [None]:
+        if candidate is not None and candidate[0] < group_end:
+            group.append(candidate)
+            group_end = max(group_end, candidate[1])
+            continue
+        # The group is closed: nothing later overlaps it, so its best spans can be kept
+        chosen = []
+        for start, end, _, _, _, entity in sorted(group, key=lambda c: c[2:5]):
+            if all(end <= s or e <= start for s, e, _ in chosen):
+                chosen.append((start, end, entity))
+        chosen.sort(key=lambda c: c[0])
+        kept += [dict(entity, start=start, end=end, word=text[start:end]) for start, end, entity in chosen]
+        if candidate is not None:
+            group, group_end = [candidate], candidate[1]
+    return kept
+
+
+def windowed_ner(text, get_pipeline, model_id, max_tokens=NER_WINDOWS["max_tokens"], stride=NER_WINDOWS["stride"]):
+    """
+    NER over text of any length: overlapping windows run as one batch, then merged
+
+    Returns entities like the HF pipeline's, with start/end offsets into ``text``.
+    """
+    windows = make_windows(text, getattr(get_pipeline(), "tokenizer", None), max_tokens, stride)
+    if not windows:
+        return []
+    outputs = batching.ner([text[start:end] for start, end in windows], get_pipeline, model_id)
+    return merge_window_entities(text, windows, outputs)
@@ -1,39 +1,57 @@
-from functools import lru_cache
-import re
 import warnings
+from config import NER_WINDOWS
+from utils import batching
+from utils.gazetteer import resolve_locations
+from utils.ner_windows import windowed_ner
+from utils.quantization import get_backend_model, model_tag
+from utils.tracing import span
+from utils.weapon_lexicon import get_weapon_matcher
 
 try:
     from transformers import pipeline
 except ImportError:
     raise ImportError("Install required packages: pip install transformers")
 
-@lru_cache(maxsize=2)
-def get_ner_pipeline(language='en'):
-    model_map = {
-        'en': "dslim/bert-base-NER",
-        'other': "Davlan/bert-base-multilingual-cased-ner-hrl"
-    }
-    model_name = model_map.get(language, model_map['other'])
-    try:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            return pipeline(
-                "ner",
-                model=model_name,
-                aggregation_strategy="simple"
-            )
-    except Exception as e:
-        raise RuntimeError(f"NER model load failed: {str(e)}")
+NER_MODELS = {
+    'en': "dslim/bert-base-NER",
+    'other': "Davlan/bert-base-multilingual-cased-ner-hrl"
+}
+
+def ner_model_name(language='en'):
+    return NER_MODELS.get(language, NER_MODELS['other'])
+
+def get_ner_pipeline(language='en', device=None, backend=None):
+    model_name = ner_model_name(language)
+
+    def load(device):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                return pipeline(
+                    "ner",
+                    model=model_name,
+                    aggregation_strategy="simple",
+                    device=device
+                )
+        except Exception as e:
+            raise RuntimeError(f"NER model load failed: {str(e)}")
+
+    return get_backend_model(model_name, load, device, backend)
 
 def extract_entities(text, language='en'):
     if not text.strip():
         return empty_entity_response()
 
     try:
-        ner = get_ner_pipeline(language)
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            entities = ner(text)
+        model_id = model_tag(ner_model_name(language))
+        get_pipeline = lambda: get_ner_pipeline(language)
+        # Batched with concurrent requests for the same model; long text is
+        # split into overlapping windows so nothing past the model's limit is lost
+        with span("ner", model=model_id, size=len(text), unit="chars"):
+            if NER_WINDOWS["enabled"]:
+                entities = windowed_ner(text, get_pipeline, model_id)
+            else:
+                entities = batching.ner([text], get_pipeline, model_id)[0]
         return process_entities(entities, text, language)
     except Exception as e:
         print(f"Entity extraction failed: {str(e)}")
@@ -45,7 +63,9 @@ def empty_entity_response():
         "times": [],
         "weapons": [],
         "suspects": [],
-        "organizations": []
+        "organizations": [],
+        "weapon_mentions": [],
+        "places": []
     }
 
 def process_entities(entities, text, language):
@@ -65,26 +85,20 @@ def process_entities(entities, text, language):
             results[entity_map[group]].add(entity['word'])
 
     results = {k: list(v) for k, v in results.items()}
-    results["weapons"] = detect_weapons(text, language)
+    with span("weapons", size=len(text), unit="chars"):
+        mentions = detect_weapon_mentions(text, language)
+    results["weapons"] = list(dict.fromkeys(m["weapon"] for m in mentions))
+    results["weapon_mentions"] = mentions
+    with span("gazetteer", size=len(results["locations"]), unit="mentions"):
+        results["places"] = resolve_locations(results["locations"])
     return results
 
 def detect_weapons(text, language='en'):
-    patterns = {
-        'en': [
-            r'\b(knife|knives|blade|razor)\b',
-            r'\b(gun|firearm|pistol|revolver|rifle|shotgun)\b',
-            r'\b(bat|club|hammer|crowbar)\b',
-            r'\b(explosive|bomb|grenade)\b'
-        ],
-        'es': [r'\b(cuchillo|navaja|pistola|rev\u00f3lver)\b'],
-        'fr': [r'\b(couteau|pistolet|revolver)\b']
-    }
-
-    lang_patterns = patterns.get(language, patterns['en'])
-    weapons = set()
-
-    for pattern in lang_patterns:
-        weapons.update(re.findall(pattern, text, re.IGNORECASE))
+    return get_weapon_matcher(language).weapons(text)
 
-    return list(weapons)
+def detect_weapon_mentions(text, language='en'):
+    """Canonical weapon type, matched term and character span of every mention"""
+    return get_weapon_matcher(language).find(text)
 
+def detect_weapons_batch(texts, language='en'):
+    return get_weapon_matcher(language).find_batch(texts)
@@ -0,0 +1,114 @@
+import os
+import re
+import threading
+from contextlib import contextmanager
+from config import INFERENCE_BACKEND
+from utils.model_registry import default_device, get_model
+
+BACKENDS = ("fp32", "int8")
+
+# torch's thread pool is process-wide, so per-stage settings are applied around
+# each stage's forward passes; concurrent stages see the most recent setting
+_threads_lock = threading.Lock()
+
+
+def backend_mode(backend=None):
+    mode = backend or INFERENCE_BACKEND["mode"]
+    if mode not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {mode!r}, expected one of {BACKENDS}")
+    return mode
+
+
+def _quantized_path(model_id):
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_id)
+    return os.path.join(INFERENCE_BACKEND["quantized_dir"], f"{slug}.int8.pt")
+
+
+def _torch_module(model):
+    """(owner, attribute) holding the torch module, so it can be replaced in place"""
+    import torch
+    if isinstance(model, torch.nn.Module):
+        return None, None
+    if isinstance(getattr(model, "model", None), torch.nn.Module):
+        return model, "model"
+    raise TypeError(f"Don't know how to quantize {type(model).__name__}")
+
+
+def quantize_module(module):
+    """int8 dynamic quantization of every Linear layer"""
+    import torch
+    # Subclasses such as whisper.model.Linear (which only casts dtypes) are
+    # rejected by the quantized Linear, so treat them as plain Linear on CPU
+    for child in module.modules():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            child.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_model(model, model_id, save=None):
+    """
+    Quantize a model (torch module or pipeline wrapping one) for CPU inference
+
+    Previously saved int8 weights are loaded when present so every machine runs
+    the exact same quantized model; otherwise they are saved if ``save`` is set.
+    """
+    import torch
+    save = INFERENCE_BACKEND["save_quantized"] if save is None else save
+    owner, attr = _torch_module(model)
+    module = model if owner is None else getattr(owner, attr)
+    module.eval()
+    quantized = quantize_module(module)
+
+    path = _quantized_path(model_id)
+    if os.path.exists(path):
+        quantized.load_state_dict(torch.load(path, map_location="cpu"))
+    elif save:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.save(quantized.state_dict(), path)
+
+    if owner is None:
+        return quantized
+    setattr(owner, attr, quantized)
+    return owner
+
+
+def model_tag(model_id, device=None, backend=None):
+    """
+    Name of the model as actually run: ``model_id`` or ``model_id@int8``
+
+    int8 only applies on CPU; on CUDA the fp32 model is used unchanged. Also
+    used in cache fingerprints so fp32 and int8 results never mix.
+    """
+    mode = backend_mode(backend)
+    if mode == "fp32" or (device or default_device()) != "cpu":
+        return model_id
+    return f"{model_id}@{mode}"
+
+
+def get_backend_model(model_id, loader, device=None, backend=None):
+    """Registry lookup that applies the selected inference backend"""
+    device = device or default_device()
+    tag = model_tag(model_id, device, backend)
+    if tag == model_id:
+        return get_model(model_id, loader, device)
+    # Quantized models get their own registry key so fp32 and int8 can be
+    # loaded side by side (see benchmarks/quantization.py)
+    return get_model(tag, lambda device: quantize_model(loader(device), model_id), device)
+
+
+@contextmanager
+def inference_threads(stage):
+    """Run a stage with its configured torch thread count (no-op if unset)"""
+    threads = INFERENCE_BACKEND["threads"].get(stage)
+    if not threads:
+        yield
+        return
+    import torch
+    with _threads_lock:
+        previous = torch.get_num_threads()
+        torch.set_num_threads(threads)
+    try:
+        yield
+    finally:
+        with _threads_lock:
+            torch.set_num_threads(previous)
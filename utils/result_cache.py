@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from config import RESULT_CACHE, SEGMENT_CONFIG
+from utils.tracing import record_cache
+
+# Bump when the shape of a cached stage result changes
+CACHE_VERSION = 3
+
+STAGES = ("transcript", "translation", "entities", "classification")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_audio(source):
+    """SHA-256 of the encoded audio bytes of a path, bytes or file-like object"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    else:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        if hasattr(source, "seek"):
+            source.seek(0)
+    return digest.hexdigest()
+
+
+def fingerprint(*parts):
+    """Short stable hash of model names, versions and other key material"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def transcript_key(model, runtime):
+    """
+    Fingerprint of a cached transcript, shared by the app and batch.py
+
+    Args:
+        model (str): Whisper as actually run, the registry id through
+            utils.quantization.model_tag (e.g. "openai/whisper-base@int8")
+        runtime (str): What ran it, "transformers" or "whisper"; they cache
+            differently shaped transcripts
+    """
+    # Segmentation decides which audio is transcribed at all
+    return fingerprint(model, runtime, SEGMENT_CONFIG)
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of per-stage pipeline results
+
+    Entries are keyed by (audio hash, stage, model fingerprint). Callers include
+    the fingerprints of upstream stages in a downstream fingerprint, so changing
+    e.g. the crime categories only misses the classification entry.
+    The total stored size is bounded; least recently used entries are evicted.
+    """
+
+    def __init__(self, path=RESULT_CACHE["path"], max_bytes=RESULT_CACHE["max_bytes"]):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One connection shared by Streamlit's script threads, serialised by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                audio_hash TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                model TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (audio_hash, stage, model)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_access ON results(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_stage ON results(stage)")
+        self._conn.commit()
+        self._total = self._stored_bytes()
+        self._writes = 0
+
+    def _stored_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _key_model(self, model):
+        return f"v{CACHE_VERSION}:{model}"
+
+    def get(self, audio_hash, stage, model):
+        """Return the cached value or None"""
+        model = self._key_model(model)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE audio_hash=? AND stage=? AND model=?",
+                (audio_hash, stage, model)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE results SET last_access=? WHERE audio_hash=? AND stage=? AND model=?",
+                (time.time(), audio_hash, stage, model)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, audio_hash, stage, model, value):
+        model = self._key_model(model)
+        # numpy scalars (e.g. classifier confidences) are stored as plain floats
+        payload = json.dumps(value, ensure_ascii=False, default=float)
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM results WHERE audio_hash=? AND stage=? AND model=?",
+                (audio_hash, stage, model)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (audio_hash, stage, model, payload, size, time.time())
+            )
+            self._total += size - (old[0] if old else 0)
+            self._writes += 1
+            # Other processes (batch workers) share the file, so resync the
+            # running total periodically and before deciding to evict
+            if self._total > self.max_bytes or self._writes % 64 == 0:
+                self._total = self._stored_bytes()
+            if self._total > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def get_or_compute(self, audio_hash, stage, model, compute):
+        """Return the cached stage result, computing and storing it on a miss"""
+        value = self.get(audio_hash, stage, model)
+        record_cache(stage, value is not None)
+        if value is None:
+            value = compute()
+            self.set(audio_hash, stage, model, value)
+            value = json.loads(json.dumps(value, default=float))
+        return value
+
+    def _evict(self):
+        # Drop least recently used entries until 90% of the budget, to avoid
+        # evicting on every insert once the cache is full
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT audio_hash, stage, model, size FROM results ORDER BY last_access"
+        )
+        victims = []
+        for audio_hash, stage, model, size in rows:
+            if self._total <= target:
+                break
+            victims.append((audio_hash, stage, model))
+            self._total -= size
+        self._conn.executemany(
+            "DELETE FROM results WHERE audio_hash=? AND stage=? AND model=?", victims
+        )
+
+    def invalidate(self, stage=None, audio_hash=None):
+        """Remove entries for a stage and/or a recording (everything if both are None)"""
+        clauses, params = [], []
+        if stage is not None:
+            clauses.append("stage=?")
+            params.append(stage)
+        if audio_hash is not None:
+            clauses.append("audio_hash=?")
+            params.append(audio_hash)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM results{where}", params)
+            self._conn.commit()
+            self._total = self._stored_bytes()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Singleton-like global instance
+_cache_instance = None
+
+
+def get_result_cache():
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = ResultCache()
+    return _cache_instance
@@ -0,0 +1,336 @@
+import gzip
+import json
+import os
+import threading
+import time
+from config import ROLLING_AGGREGATES
+from utils.analytics_store import normalize
+from utils.file_lock import locked
+
+DIMENSIONS = ("category", "location", "weapon")
+
+# results["entities"] key -> dimension
+ENTITY_DIMENSIONS = {"locations": "location", "weapons": "weapon"}
+
+
+class _CountNode:
+    __slots__ = ("count", "keys", "prev", "next")
+
+    def __init__(self, count, prev, next):
+        self.count = count
+        self.keys = {}
+        self.prev = prev
+        self.next = next
+
+
+class TopCounter:
+    """
+    Counts kept ordered for top-k reads in O(k)
+
+    Keys live in a doubly linked list of nodes, one per distinct count, in
+    ascending order. Adding one moves a key to the next node (created if
+    needed), so ``increment`` is O(1) and ``decrement`` by ``n`` is O(n) at
+    worst. ``top(k)`` walks down from the highest node.
+    """
+
+    def __init__(self):
+        self._head = _CountNode(0, None, None)  # sentinel below every count
+        self._tail = self._head
+        self._nodes = {}
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def get(self, key):
+        node = self._nodes.get(key)
+        return node.count if node else 0
+
+    def _insert_after(self, node, count):
+        new = _CountNode(count, node, node.next)
+        if node.next is None:
+            self._tail = new
+        else:
+            node.next.prev = new
+        node.next = new
+        return new
+
+    def _unlink(self, node):
+        node.prev.next = node.next
+        if node.next is None:
+            self._tail = node.prev
+        else:
+            node.next.prev = node.prev
+
+    def increment(self, key):
+        node = self._nodes.get(key, self._head)
+        target = node.next
+        if target is None or target.count != node.count + 1:
+            target = self._insert_after(node, node.count + 1)
+        target.keys[key] = None
+        self._nodes[key] = target
+        if node is not self._head:
+            del node.keys[key]
+            if not node.keys:
+                self._unlink(node)
+
+    def decrement(self, key, amount=1):
+        node = self._nodes[key]
+        count = node.count - amount
+        del node.keys[key]
+        below = node.prev
+        while below is not self._head and below.count > count:
+            below = below.prev
+        if not node.keys:
+            self._unlink(node)
+        if count <= 0:
+            del self._nodes[key]
+            return
+        target = below if below.count == count else self._insert_after(below, count)
+        target.keys[key] = None
+        self._nodes[key] = target
+
+    def top(self, k):
+        """The ``k`` highest (key, count) pairs, highest first"""
+        result = []
+        node = self._tail
+        while node is not self._head and len(result) < k:
+            for key in node.keys:
+                result.append((key, node.count))
+                if len(result) == k:
+                    break
+            node = node.prev
+        return result
+
+
+class RollingWindow:
+    """
+    Counts over the last ``buckets * width`` seconds
+
+    A ring of time buckets holds what each bucket added; when the ring wraps
+    the oldest bucket's counts are subtracted from the running totals. Every
+    count is added and expired exactly once, so updates are O(1) amortized and
+    the window slides in steps of one bucket width.
+    """
+
+    def __init__(self, width, buckets):
+        self.width = width
+        self.size = buckets
+        self.ids = [None] * buckets
+        self.slots = [None] * buckets
+        self.head = None
+        self.totals = {dimension: TopCounter() for dimension in DIMENSIONS}
+
+    def advance(self, now):
+        current = int(now // self.width)
+        if self.head is not None and current <= self.head:
+            return
+        start = current - self.size + 1 if self.head is None else max(self.head + 1, current - self.size + 1)
+        for bucket_id in range(start, current + 1):
+            self._expire(bucket_id % self.size)
+        self.head = current
+
+    def _expire(self, slot):
+        counts = self.slots[slot]
+        if counts:
+            for (dimension, value), n in counts.items():
+                self.totals[dimension].decrement(value, n)
+        self.ids[slot] = None
+        self.slots[slot] = None
+
+    def add(self, timestamp, items):
+        """Count (dimension, value) pairs at ``timestamp``; too old to be in the window is ignored"""
+        counts = {}
+        for item in items:
+            counts[item] = counts.get(item, 0) + 1
+        self.add_counts(int(timestamp // self.width), counts)
+
+    def add_counts(self, bucket_id, counts):
+        """Add {(dimension, value): n} to one bucket, e.g. from a snapshot"""
+        self.advance(bucket_id * self.width)
+        if bucket_id <= self.head - self.size:
+            return
+        slot = bucket_id % self.size
+        if self.ids[slot] != bucket_id:
+            self.ids[slot] = bucket_id
+            self.slots[slot] = {}
+        bucket = self.slots[slot]
+        for (dimension, value), n in counts.items():
+            bucket[(dimension, value)] = bucket.get((dimension, value), 0) + n
+            for _ in range(n):
+                self.totals[dimension].increment(value)
+
+    def series(self, dimension, value):
+        """Per-bucket counts of one value, oldest first, as (bucket start, count)"""
+        points = []
+        for bucket_id in range(self.head - self.size + 1, self.head + 1):
+            slot = bucket_id % self.size
+            counts = self.slots[slot] if self.ids[slot] == bucket_id else None
+            points.append((bucket_id * self.width, (counts or {}).get((dimension, value), 0)))
+        return points
+
+
+class RollingAggregates:
+    """
+    Live counts per crime category, location and weapon over sliding windows
+
+    Usage:
+        aggregates = get_rolling_aggregates()
+        aggregates.update(results["classification"], results["entities"])
+        aggregates.top("location", window="day", k=10)
+
+    The app, the job service and batch.py all count into the same snapshot.
+    Each keeps what it counted since its last save apart; a save takes a file
+    lock, re-reads the snapshot, adds only those counts and adopts the result,
+    so no process overwrites the others' counts.
+    """
+
+    def __init__(self, windows=ROLLING_AGGREGATES["windows"], path=ROLLING_AGGREGATES["snapshot_path"]):
+        self.path = path
+        self._lock = threading.Lock()
+        self.geometry = dict(windows)
+        self.windows = {name: RollingWindow(width, buckets) for name, (width, buckets) in windows.items()}
+        # {window: {bucket id: {(dimension, value): n}}} counted since the last save
+        self._unsaved = {}
+        self._saved_at = time.monotonic()
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def items(classification, entities):
+        """(dimension, value) pairs of one call; each value counted once per call"""
+        items = []
+        if isinstance(classification, dict):
+            category = classification.get("category")
+        else:
+            # classify_crime returns (category, confidence)
+            category = classification[0] if classification else None
+        if isinstance(category, str):
+            items.append(("category", category))
+        for key, dimension in ENTITY_DIMENSIONS.items():
+            # Same lookup form as the analytics store, so counts line up with its queries
+            values = dict.fromkeys(normalize(value) for value in (entities or {}).get(key) or [])
+            items += [(dimension, value) for value in values if value]
+        return items
+
+    def update(self, classification, entities, timestamp=None):
+        """Count one processed call"""
+        items = self.items(classification, entities)
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            for name, window in self.windows.items():
+                window.add(timestamp, items)
+                bucket = self._unsaved.setdefault(name, {}).setdefault(int(timestamp // window.width), {})
+                for item in items:
+                    bucket[item] = bucket.get(item, 0) + 1
+
+    def top(self, dimension, window="hour", k=ROLLING_AGGREGATES["top_k"], now=None):
+        """The ``k`` most frequent values of a dimension in a window, as (value, count)"""
+        with self._lock:
+            rolling = self.windows[window]
+            rolling.advance(time.time() if now is None else now)
+            return rolling.totals[dimension].top(k)
+
+    def count(self, dimension, value, window="hour", now=None):
+        with self._lock:
+            rolling = self.windows[window]
+            rolling.advance(time.time() if now is None else now)
+            return rolling.totals[dimension].get(value)
+
+    def series(self, dimension, value, window="day", now=None):
+        """Trend of one value across the window's buckets"""
+        with self._lock:
+            rolling = self.windows[window]
+            rolling.advance(time.time() if now is None else now)
+            return rolling.series(dimension, value)
+
+    def dashboard(self, k=ROLLING_AGGREGATES["top_k"], now=None):
+        """Top-k of every dimension in every window"""
+        return {
+            window: {dimension: self.top(dimension, window, k, now) for dimension in DIMENSIONS}
+            for window in self.windows
+        }
+
+    def save(self, path=None):
+        """
+        Merge the counts since the last save into the gzipped JSON snapshot
+
+        Only non-empty buckets are written. Totals are not stored; they are
+        rebuilt from the buckets on load.
+        """
+        path = path or self.path
+        with locked(path):
+            with self._lock:
+                unsaved, self._unsaved = self._unsaved, {}
+                self._saved_at = time.monotonic()
+            windows = self._read(path)
+            for name, buckets in unsaved.items():
+                for bucket_id, counts in buckets.items():
+                    windows[name].add_counts(bucket_id, counts)
+            state = {}
+            for name, rolling in windows.items():
+                buckets = []
+                for bucket_id, counts in zip(rolling.ids, rolling.slots):
+                    if counts:
+                        buckets.append([bucket_id, [[d, v, n] for (d, v), n in counts.items()]])
+                state[name] = {"width": rolling.width, "size": rolling.size, "head": rolling.head, "buckets": buckets}
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+                json.dump(state, f, separators=(",", ":"))
+            os.replace(tmp, path)
+            self._adopt(windows)
+
+    def maybe_save(self):
+        """Snapshot if the configured interval has passed since the last one"""
+        if self.path and time.monotonic() - self._saved_at >= ROLLING_AGGREGATES["snapshot_interval_s"]:
+            self.save()
+
+    def _read(self, path):
+        """
+        Windows restored from a snapshot, advanced to now; windows missing from
+        it or whose geometry changed start empty
+        """
+        windows = {name: RollingWindow(width, buckets) for name, (width, buckets) in self.geometry.items()}
+        if not os.path.exists(path):
+            return windows
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable aggregates snapshot: {e}")
+            return windows
+        for name, saved in state.items():
+            rolling = windows.get(name)
+            if rolling is None or (saved["width"], saved["size"]) != (rolling.width, rolling.size):
+                continue
+            rolling.head = saved["head"]
+            for bucket_id, counts in saved["buckets"]:
+                rolling.add_counts(bucket_id, {(dimension, value): n for dimension, value, n in counts})
+        for rolling in windows.values():
+            # Drop whatever expired while no process was saving
+            rolling.advance(time.time())
+        return windows
+
+    def _adopt(self, windows):
+        """Take over merged windows, keeping what was counted meanwhile"""
+        with self._lock:
+            for name, buckets in self._unsaved.items():
+                for bucket_id, counts in buckets.items():
+                    windows[name].add_counts(bucket_id, counts)
+            self.windows = windows
+
+    def load(self, path=None):
+        """Restore a snapshot, plus whatever this process counted since its last save"""
+        self._adopt(self._read(path or self.path))
+
+
+# Singleton-like global instance
+_aggregates_instance = None
+_aggregates_lock = threading.Lock()
+
+
+def get_rolling_aggregates():
+    global _aggregates_instance
+    with _aggregates_lock:
+        if _aggregates_instance is None:
+            _aggregates_instance = RollingAggregates()
+        return _aggregates_instance
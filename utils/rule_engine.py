@@ -0,0 +1,141 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+RULES_FILE = Path(__file__).parent / "../extraction_rules.json"
+
+# Rules are tried only where a transcript has one of their trigger words
+TOKEN = re.compile(r"\w+")
+NUMBER_TRIGGER = "#number"  # any token starting with a digit
+
+
+def load_rules(path=RULES_FILE):
+    """
+    Extraction rules as dicts:
+        name, type (entity key), triggers (words a match starts with, or
+        "#number"), pattern, and optionally ignore_case, value (format string
+        over group 0 and the named groups), optional ({group: suffix added when
+        the group matched}), exclude ({group: words that reject the match,
+        compared in lower case}) and lower
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=1)
+def rules_fingerprint(path=RULES_FILE):
+    """Content hash of the rules, for cache keys of extracted entities"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def _trigger(token):
+    return NUMBER_TRIGGER if token[0].isdigit() else token.lower()
+
+
+class _Rule:
+    __slots__ = ("index", "name", "type", "pattern", "value", "optional", "exclude", "lower")
+
+    def __init__(self, index, rule):
+        self.index = index
+        self.name = rule["name"]
+        self.type = rule["type"]
+        self.pattern = re.compile(rule["pattern"], re.IGNORECASE if rule.get("ignore_case") else 0)
+        self.value = rule.get("value", "{0}")
+        self.optional = rule.get("optional", {})
+        self.exclude = {group: frozenset(w.lower() for w in words) for group, words in rule.get("exclude", {}).items()}
+        self.lower = rule.get("lower", False)
+
+    def excluded(self, match):
+        return any((match.group(group) or "").lower() in words for group, words in self.exclude.items())
+
+    def format(self, match):
+        groups = {k: v or "" for k, v in match.groupdict().items()}
+        value = self.value.format(match.group(0), **groups)
+        for group, suffix in self.optional.items():
+            if groups.get(group):
+                value += suffix.format(**groups)
+        value = value.strip()
+        return value.lower() if self.lower else value
+
+
+class RuleEngine:
+    """
+    Single-pass location, time and suspect extraction from declarative rules
+
+    Every rule names the words its matches start with. The rules are compiled
+    once and indexed by trigger word; a transcript is tokenized in one regex
+    pass and each rule is only tried (anchored) at its own trigger tokens, so
+    the cost per transcript depends on how many tokens trigger something, not
+    on how many rules there are. Like ``re.finditer`` per rule, a rule's
+    matches never overlap each other but may overlap other rules' matches.
+    """
+
+    def __init__(self, rules=None):
+        rules = load_rules() if rules is None else rules
+        self.rules = [_Rule(i, rule) for i, rule in enumerate(rules)]
+        self.types = list(dict.fromkeys(rule.type for rule in self.rules))
+        self.by_trigger = {}
+        for rule, spec in zip(self.rules, rules):
+            for trigger in spec["triggers"]:
+                key = trigger if trigger == NUMBER_TRIGGER else trigger.lower()
+                self.by_trigger.setdefault(key, []).append(rule)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def find(self, text):
+        """Every rule match with its entity type, rule name, value and character span, in text order"""
+        if not text:
+            return []
+        by_trigger = self.by_trigger
+        resume = [0] * len(self.rules)
+        mentions = []
+        for token in TOKEN.finditer(text):
+            rules = by_trigger.get(_trigger(token.group()))
+            if rules is None:
+                continue
+            start = token.start()
+            for rule in rules:
+                if start < resume[rule.index]:
+                    continue
+                match = rule.pattern.match(text, start)
+                if match is None or rule.excluded(match):
+                    continue
+                # Empty matches still move on, as re.finditer would
+                resume[rule.index] = max(match.end(), start + 1)
+                value = rule.format(match)
+                if value:
+                    mentions.append({
+                        "type": rule.type,
+                        "rule": rule.name,
+                        "value": value,
+                        "start": match.start(),
+                        "end": match.end()
+                    })
+        return mentions
+
+    def extract(self, text):
+        """
+        Distinct values per entity type, in order of first mention
+
+        Returns:
+            dict: {entity type: [values], ..., "mentions": find(text)}
+        """
+        mentions = self.find(text)
+        results = {entity_type: {} for entity_type in self.types}
+        for mention in mentions:
+            results[mention["type"]].setdefault(mention["value"], None)
+        results = {k: list(v) for k, v in results.items()}
+        results["mentions"] = mentions
+        return results
+
+    def extract_batch(self, texts):
+        return [self.extract(text) for text in texts]
+
+
+@lru_cache(maxsize=1)
+def get_rule_engine():
+    return RuleEngine()
@@ -0,0 +1,118 @@
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def frame_energy_db(audio, frame_len):
+    """RMS energy of consecutive non-overlapping frames, in dBFS"""
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1) + 1e-12)
+    return 20 * np.log10(rms)
+
+
+def _runs(mask):
+    """(start, end) frame indices of every run of True values"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def _split_long(start, end, energy, max_frames):
+    """Cut runs longer than max_frames at the quietest frame near the limit"""
+    spans = []
+    while end - start > max_frames:
+        window = energy[start + max_frames // 2:start + max_frames]
+        cut = start + max_frames // 2 + int(np.argmin(window))
+        spans.append((start, cut))
+        start = cut
+    spans.append((start, end))
+    return spans
+
+
+def detect_speech(audio, sample_rate=SAMPLE_RATE, frame_ms=30, margin_db=12.0,
+                  floor_db=-55.0, min_silence_ms=600, min_speech_ms=250,
+                  pad_ms=200, max_segment_s=30.0):
+    """
+    Energy-based voice activity detection
+
+    Args:
+        audio (np.ndarray): Mono float32 samples in [-1, 1]
+        sample_rate (int): Samples per second
+        frame_ms (int): Analysis frame length
+        margin_db (float): How far above the noise floor a frame must be to count as speech
+        floor_db (float): Absolute level below which a frame is always silence
+        min_silence_ms (int): Pauses shorter than this do not split a segment
+        min_speech_ms (int): Bursts shorter than this are dropped as clicks/noise
+        pad_ms (int): Context kept on both sides of every segment
+        max_segment_s (float): Segments are split so none exceeds this length
+
+    Returns:
+        list: (start_sample, end_sample) tuples in order
+    """
+    frame_len = int(sample_rate * frame_ms / 1000)
+    energy = frame_energy_db(audio, frame_len)
+    if energy.size == 0:
+        return []
+
+    # Noise floor from the quietest frames; keep the threshold below the loudest
+    # speech so a call with no pauses at all is not discarded
+    noise_floor = np.percentile(energy, 10)
+    threshold = max(floor_db, min(noise_floor + margin_db, energy.max() - margin_db))
+    voiced = energy > threshold
+
+    min_gap = max(1, min_silence_ms // frame_ms)
+    min_run = max(1, min_speech_ms // frame_ms)
+    pad = pad_ms // frame_ms
+    max_frames = max(1, int(max_segment_s * 1000 / frame_ms))
+
+    # Merge runs separated by short pauses
+    merged = []
+    for start, end in _runs(voiced):
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    spans = []
+    for start, end in merged:
+        if end - start < min_run:
+            continue
+        start = max(0, start - pad)
+        end = min(len(energy), end + pad)
+        for s, e in _split_long(start, end, energy, max_frames):
+            spans.append((int(s) * frame_len, min(len(audio), int(e) * frame_len)))
+    return spans
+
+
+def iter_batches(items, batch_size):
+    for i in range(0, len(items), batch_size):
+        yield items[i:i + batch_size]
+
+
+def stitch_segments(spans, texts, languages=None, sample_rate=SAMPLE_RATE):
+    """Join per-segment transcripts into one transcript that keeps timestamps"""
+    segments = []
+    for i, ((start, end), text) in enumerate(zip(spans, texts)):
+        segment = {
+            "start": round(start / sample_rate, 2),
+            "end": round(end / sample_rate, 2),
+            "text": text.strip()
+        }
+        if languages is not None:
+            segment["language"] = languages[i]
+        segments.append(segment)
+
+    transcript = " ".join(s["text"] for s in segments if s["text"])
+    return transcript, segments
+
+
+def dominant_language(segments, default="en"):
+    """Language spoken for the longest total duration"""
+    totals = {}
+    for s in segments:
+        if s.get("language"):
+            totals[s["language"]] = totals.get(s["language"], 0.0) + s["end"] - s["start"]
+    return max(totals, key=totals.get) if totals else default
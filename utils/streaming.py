@@ -0,0 +1,324 @@
+import asyncio
+import json
+import threading
+import time
+import numpy as np
+from functools import partial
+from config import SEGMENT_CONFIG, STREAMING
+from utils import batching
+from utils.audio_processor import (
+    TRANSLATION_MODEL, decode_spans, get_translation_pipeline, get_whisper_model, whisper_model_name
+)
+from utils.model_registry import default_device
+from utils.nlp_processor import detect_weapon_mentions, extract_entities
+from utils.quantization import inference_threads, model_tag
+from utils.segmenter import SAMPLE_RATE, detect_speech
+from utils.tracing import span
+from utils.translation import translate_segments
+
+ENTITY_KEYS = ("locations", "times", "suspects", "organizations")
+
+
+class RingBuffer:
+    """
+    Fixed-size float32 audio buffer addressed by absolute sample index
+
+    ``head`` counts every sample ever written; only the last ``capacity`` are
+    kept, from ``tail`` on. Written from the event loop, read from executor
+    threads, hence the lock.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.head = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tail(self):
+        return max(0, self.head - self.capacity)
+
+    def write(self, samples):
+        samples = samples[-self.capacity:]
+        with self._lock:
+            start = self.head % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self.head += len(samples)
+
+    def read(self, start, end):
+        """Samples [start, end) as a new array; start must not be before ``tail``"""
+        with self._lock:
+            if start < self.tail or end > self.head:
+                raise IndexError(f"[{start}, {end}) is outside the buffered [{self.tail}, {self.head})")
+            indices = np.arange(start, end) % self.capacity
+            return self._data[indices]
+
+
+class StreamSession:
+    """
+    One live call: PCM in, transcript and entity deltas out
+
+    Audio is appended with ``feed()`` as it arrives. Every ``step_s`` of new
+    audio, the not yet transcribed part of the ring buffer is run through the
+    VAD; phrases followed by enough silence are decoded with Whisper and
+    committed, so each stretch of audio is transcribed once. Only the new text
+    goes through the weapon lexicon (reported immediately, per mention) and
+    NER (with a little preceding text for context); entities are reported the
+    first time they are seen. Consume the events with ``async for``.
+    """
+
+    def __init__(self, call_id=None, config=STREAMING, device=None):
+        self.call_id = call_id or f"stream-{int(time.time() * 1000)}"
+        self.config = config
+        self.device = device or default_device()
+        self.buffer = RingBuffer(int(config["buffer_s"] * SAMPLE_RATE))
+        self.committed = 0
+        self.segments = []
+        self.text = ""
+        self.seen = {key: [] for key in ENTITY_KEYS + ("weapons", "places")}
+        self._pending = b""
+        self._closed = False
+        self._data = asyncio.Event()
+        self._events = asyncio.Queue()
+
+    def feed(self, pcm):
+        """Append s16le mono PCM; a trailing odd byte is kept for the next chunk"""
+        pcm = self._pending + pcm
+        usable = len(pcm) - len(pcm) % 2
+        self._pending = pcm[usable:]
+        if usable:
+            samples = np.frombuffer(pcm[:usable], dtype="<i2").astype(np.float32) / 32768.0
+            self.buffer.write(samples)
+            self._data.set()
+
+    def close(self):
+        """End of audio: whatever is pending is transcribed and an "end" event follows"""
+        self._closed = True
+        self._data.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        step = int(self.config["step_s"] * SAMPLE_RATE)
+        processed = 0
+        try:
+            while True:
+                await self._data.wait()
+                self._data.clear()
+                closing = self._closed
+                if not closing and self.buffer.head - processed < step:
+                    continue
+                processed = self.buffer.head
+                # Whisper and NER run off the event loop so ingest never stalls
+                for event in await loop.run_in_executor(None, self._step, closing):
+                    await self._events.put(event)
+                if closing:
+                    await self._events.put(self._summary())
+                    return
+        except Exception as e:
+            await self._events.put(self._event("error", error=f"{type(e).__name__}: {e}"))
+        finally:
+            await self._events.put(None)
+
+    async def events(self):
+        while True:
+            event = await self._events.get()
+            if event is None:
+                return
+            yield event
+
+    def _event(self, kind, **fields):
+        return dict(
+            type=kind,
+            call_id=self.call_id,
+            audio_s=round(self.buffer.head / SAMPLE_RATE, 2),
+            emitted_at=time.time(),
+            **fields
+        )
+
+    def _step(self, final):
+        """Transcribe and analyse the phrases finished since the last step"""
+        events = []
+        head = self.buffer.head
+        if self.committed < self.buffer.tail:
+            events.append(self._event("gap", lost_s=round((self.buffer.tail - self.committed) / SAMPLE_RATE, 2)))
+            self.committed = self.buffer.tail
+        window = self.buffer.read(self.committed, head)
+        params = dict(SEGMENT_CONFIG, max_segment_s=self.config["max_window_s"])
+        spans = detect_speech(window, SAMPLE_RATE, **params)
+
+        silence = int(self.config["finalize_silence_ms"] * SAMPLE_RATE / 1000)
+        if final or len(window) >= self.config["max_window_s"] * SAMPLE_RATE:
+            done = spans
+        else:
+            done = [(start, end) for start, end in spans if len(window) - end >= silence]
+
+        if not spans:
+            # Nothing but silence, or a burst too short to count yet: keep only
+            # enough to pad (or complete) the next phrase
+            keep = int((SEGMENT_CONFIG["pad_ms"] + SEGMENT_CONFIG["min_speech_ms"]) * SAMPLE_RATE / 1000)
+            self.committed = max(self.committed, head - keep)
+            return events
+        if not done:
+            return events
+
+        audio_s = round(sum(end - start for start, end in done) / SAMPLE_RATE, 2)
+        with span("stream_transcribe", model=model_tag(f"openai/{whisper_model_name()}", self.device),
+                  size=audio_s, unit="audio_s"), inference_threads("whisper"):
+            texts, languages = decode_spans(get_whisper_model(self.device), window, done, self.device == "cuda")
+        offset = self.committed
+        self.committed = head if final else offset + done[-1][1]
+
+        segments = []
+        for (start, end), text, language in zip(done, texts, languages):
+            if text.strip():
+                segments.append({
+                    "start": round((offset + start) / SAMPLE_RATE, 2),
+                    "end": round((offset + end) / SAMPLE_RATE, 2),
+                    "text": text.strip(),
+                    "language": language
+                })
+        if segments:
+            events += self._analyse(segments)
+        return events
+
+    def _translate(self, segments):
+        if not self.config["translate"] or all(s["language"] == "en" for s in segments):
+            return [dict(s, translation=s["text"]) for s in segments]
+        model_id = model_tag(TRANSLATION_MODEL, self.device)
+        translate_batch = partial(
+            batching.translate,
+            get_pipeline=partial(get_translation_pipeline, self.device),
+            model_id=model_id,
+            device=self.device
+        )
+        return translate_segments(segments, translate_batch, model_id)[1]
+
+    def _analyse(self, segments):
+        events = []
+        context = self.text[-self.config["context_chars"]:]
+        segments = self._translate(segments)
+        for segment in segments:
+            self.segments.append(segment)
+            events.append(self._event("transcript", **segment))
+            english = segment["translation"]
+            offset = len(self.text) + (1 if self.text else 0)
+            self.text = f"{self.text} {english}" if self.text else english
+
+            # Lexicon hits go out before NER so dispatch hears about them first
+            for mention in detect_weapon_mentions(english):
+                events.append(self._event(
+                    "weapon",
+                    weapon=mention["weapon"],
+                    term=mention["term"],
+                    segment_start=segment["start"],
+                    segment_end=segment["end"],
+                    char=offset + mention["start"]
+                ))
+                if mention["weapon"] not in self.seen["weapons"]:
+                    self.seen["weapons"].append(mention["weapon"])
+
+        new_text = " ".join(s["translation"] for s in segments)
+        entities = extract_entities(f"{context} {new_text}".strip(), language='en')
+        added = {}
+        for key in ENTITY_KEYS:
+            fresh = [v for v in entities.get(key, []) if v not in self.seen[key]]
+            if fresh:
+                self.seen[key] += fresh
+                added[key] = fresh
+        seen_places = {p["id"] for p in self.seen["places"]}
+        places = [p for p in entities.get("places", []) if p["id"] not in seen_places]
+        if places:
+            self.seen["places"] += places
+            added["places"] = places
+        if added:
+            events.append(self._event("entities", added=added, segment_end=segments[-1]["end"]))
+        return events
+
+    def _summary(self):
+        return self._event(
+            "end",
+            duration_s=round(self.buffer.head / SAMPLE_RATE, 2),
+            transcript=self.text,
+            segments=self.segments,
+            entities=self.seen
+        )
+
+
+async def _write_events(session, write):
+    async for event in session.events():
+        await write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+async def handle_connection(reader, writer):
+    """
+    One call per TCP connection
+
+    The client sends a JSON header line ({"call_id": ..., "sample_rate": 16000})
+    followed by raw s16le mono PCM, and reads JSON-lines events back until
+    the "end" event; closing its side of the connection ends the call.
+    """
+    async def write(line):
+        writer.write(line.encode("utf-8"))
+        await writer.drain()
+
+    async def error(message):
+        await write(json.dumps({"type": "error", "error": message}) + "\n")
+
+    tasks = []
+    try:
+        header = json.loads((await reader.readline()) or b"{}")
+        if not isinstance(header, dict):
+            await error("header must be a JSON object")
+            return
+        if header.get("sample_rate", SAMPLE_RATE) != SAMPLE_RATE:
+            await error(f"sample_rate must be {SAMPLE_RATE}")
+            return
+        session = StreamSession(header.get("call_id"))
+        runner = asyncio.create_task(session.run())
+
+        async def pump():
+            while chunk := await reader.read(64 * 1024):
+                session.feed(chunk)
+            session.close()
+
+        pump_task = asyncio.create_task(pump())
+        tasks = [pump_task, runner]
+        await _write_events(session, write)
+        await asyncio.gather(pump_task, runner)
+    except (ConnectionError, json.JSONDecodeError) as e:
+        print(f"Stream connection closed: {e}")
+    finally:
+        # A client that went away leaves the pump and the session running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        writer.close()
+
+
+async def serve(host=STREAMING["host"], port=STREAMING["port"]):
+    server = await asyncio.start_server(handle_connection, host, port)
+    print(f"Streaming ingest listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def stream_pipe(source, out, call_id=None, chunk_size=3200):
+    """Read raw PCM from a binary file object (stdin, a FIFO) and write events to a text one"""
+    loop = asyncio.get_running_loop()
+    session = StreamSession(call_id)
+    runner = asyncio.create_task(session.run())
+
+    async def pump():
+        while chunk := await loop.run_in_executor(None, source.read, chunk_size):
+            session.feed(chunk)
+        session.close()
+
+    async def write(line):
+        out.write(line)
+        out.flush()
+
+    pump_task = asyncio.create_task(pump())
+    await _write_events(session, write)
+    await asyncio.gather(pump_task, runner)
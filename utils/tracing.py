@@ -0,0 +1,260 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import TRACING
+
+METRIC_PREFIX = "police_call"
+
+_enabled = TRACING["enabled"]
+_current = ContextVar("trace", default=None)
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+class _Noop:
+    """Shared stand-in for spans and traces while tracing is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+    def to_dict(self):
+        return None
+
+
+_NOOP = _Noop()
+
+
+class Span:
+    __slots__ = ("stage", "model", "size", "unit", "started", "seconds")
+
+    def __init__(self, stage, model=None, size=None, unit=None):
+        self.stage = stage
+        self.model = model
+        self.size = size
+        self.unit = unit
+        self.seconds = None
+
+    def set(self, **fields):
+        """Fill in fields only known inside the stage (e.g. the input size)"""
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        trace = _current.get()
+        if trace is not None:
+            trace.spans.append(self)
+        METRICS.observe(self)
+        return False
+
+    def to_dict(self):
+        record = {"stage": self.stage, "seconds": round(self.seconds, 4)}
+        if self.model is not None:
+            record["model"] = self.model
+        if self.size is not None:
+            record["size"] = self.size
+            record["unit"] = self.unit
+        return record
+
+
+class Trace:
+    """Spans and cache outcomes of one request, in completion order"""
+
+    def __init__(self):
+        self.spans = []
+        self.cache = {}
+        self.started = None
+        self.seconds = None
+        self._token = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.started
+        _current.reset(self._token)
+        return False
+
+    def to_dict(self):
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self.started
+        return {
+            "total_s": round(seconds, 4),
+            "stages": [span.to_dict() for span in self.spans],
+            "cache": dict(self.cache)
+        }
+
+
+def span(stage, model=None, size=None, unit=None):
+    """
+    Time a pipeline stage
+
+    Usage:
+        with span("ner", model=model_name, size=len(text), unit="chars"):
+            ...
+    Recorded on the current trace (if any) and in the process-wide histograms.
+    Returns a shared no-op object while tracing is disabled.
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(stage, model, size, unit)
+
+
+def trace():
+    """Collect the spans of everything run inside the block; ``to_dict()`` is None when disabled"""
+    if not _enabled:
+        return _NOOP
+    return Trace()
+
+
+def record_cache(stage, hit):
+    """Note a result-cache hit or miss for a stage"""
+    if not _enabled:
+        return
+    trace = _current.get()
+    if trace is not None:
+        trace.cache[stage] = "hit" if hit else "miss"
+    METRICS.count_cache(stage, hit)
+
+
+class Metrics:
+    """Process-wide stage histograms and counters, rendered in Prometheus text format"""
+
+    def __init__(self, buckets=TRACING["buckets"]):
+        self.buckets = tuple(sorted(buckets))
+        self._durations = {}
+        self._sizes = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def observe(self, span):
+        key = (span.stage, span.model or "")
+        with self._lock:
+            hist = self._durations.get(key)
+            if hist is None:
+                hist = self._durations[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts = hist[0]
+            counts[bisect.bisect_left(self.buckets, span.seconds)] += 1
+            hist[1] += span.seconds
+            hist[2] += 1
+            if span.size is not None:
+                size_key = (span.stage, span.unit or "")
+                self._sizes[size_key] = self._sizes.get(size_key, 0) + span.size
+
+    def observe_trace(self, trace):
+        """Add a serialized trace (``Trace.to_dict()``, e.g. from a worker process)"""
+        for record in trace["stages"]:
+            done = Span(record["stage"], record.get("model"), record.get("size"), record.get("unit"))
+            done.seconds = record["seconds"]
+            self.observe(done)
+        for stage, result in trace["cache"].items():
+            self.count_cache(stage, result == "hit")
+
+    def count_cache(self, stage, hit):
+        key = (stage, "hit" if hit else "miss")
+        with self._lock:
+            self._cache[key] = self._cache.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._sizes.clear()
+            self._cache.clear()
+
+    def render(self):
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each pipeline stage.",
+            f"# TYPE {name} histogram"
+        ]
+        with self._lock:
+            for (stage, model), (counts, total, count) in sorted(self._durations.items()):
+                labels = f'stage="{_escape(stage)}",model="{_escape(model)}"'
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {total}")
+                lines.append(f"{name}_count{{{labels}}} {count}")
+
+            name = f"{METRIC_PREFIX}_stage_input_total"
+            lines += [f"# HELP {name} Input processed by each stage, in the unit given.",
+                      f"# TYPE {name} counter"]
+            for (stage, unit), total in sorted(self._sizes.items()):
+                lines.append(f'{name}{{stage="{_escape(stage)}",unit="{_escape(unit)}"}} {total}')
+
+            name = f"{METRIC_PREFIX}_cache_requests_total"
+            lines += [f"# HELP {name} Result cache lookups per stage.",
+                      f"# TYPE {name} counter"]
+            for (stage, result), n in sorted(self._cache.items()):
+                lines.append(f'{name}{{stage="{_escape(stage)}",result="{result}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
+
+
+def render_prometheus():
+    return METRICS.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=TRACING["metrics_port"], host=TRACING["metrics_host"]):
+    """Serve /metrics from a daemon thread, once per process; no-op without a port"""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"Metrics server not started on port {port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
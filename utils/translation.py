@@ -0,0 +1,152 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from config import TRANSLATION
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+WORD = re.compile(r"[a-z']+")
+
+# Very common English words; a sentence made up mostly of other words is sent
+# for translation when no detected language is available for it
+ENGLISH_WORDS = frozenset("""
+a about after all am an and are as at be because been but by call can come did do don't for from
+get go going got had has have he he's help her here him his how i i'm if in is it it's just know
+like me my no not now of on one or our out please right said say see she so some someone that the
+their them there they this to up us was we what when where who why will with would you your
+""".split())
+
+
+def split_sentences(text, max_chars=TRANSLATION["max_sentence_chars"]):
+    """Sentences of text, with overlong ones cut at word boundaries"""
+    sentences = []
+    for sentence in SENTENCE_SPLIT.split(text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def looks_english(sentence):
+    """Share of common English words; used instead of a detected language"""
+    words = WORD.findall(sentence.lower())
+    if not words:
+        # Numbers, plates, punctuation: nothing to translate
+        return True
+    return sum(w in ENGLISH_WORDS for w in words) / len(words) >= 0.25
+
+
+class SentenceCache:
+    """LRU of sentence translations keyed by a hash of (model, sentence)"""
+
+    def __init__(self, max_size=TRANSLATION["sentence_cache_size"]):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_id, sentence):
+        return hashlib.blake2b(f"{model_id}\0{sentence}".encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_cache = SentenceCache()
+
+
+def get_sentence_cache():
+    return _cache
+
+
+def translate_sentences(sentences, translate_batch, model_id):
+    """
+    Translate sentences with one batched call for the ones not seen before
+
+    Args:
+        sentences (list): Sentences to translate; duplicates are sent once
+        translate_batch (callable): list of sentences -> list of translations
+        model_id (str): Part of the cache key, so models never share entries
+    """
+    keys = [_cache.key(model_id, s) for s in sentences]
+    results = [_cache.get(k) for k in keys]
+    missing = {}
+    for i, (sentence, result) in enumerate(zip(sentences, results)):
+        if result is None:
+            missing.setdefault(sentence, []).append(i)
+
+    if missing:
+        unique = list(missing)
+        translations = list(translate_batch(unique))
+        # zip would silently drop or misalign sentences
+        if len(translations) != len(unique):
+            raise RuntimeError(f"{model_id}: {len(translations)} translations for a batch of {len(unique)} sentences")
+        for sentence, translation in zip(unique, translations):
+            for i in missing[sentence]:
+                results[i] = translation
+            _cache.set(keys[missing[sentence][0]], translation)
+    return results
+
+
+def translate_segments(segments, translate_batch, model_id):
+    """
+    Translate the non-English sentences of transcript segments
+
+    Segments carrying a detected ``language`` are skipped entirely when it is
+    English; segments without one are judged sentence by sentence.
+
+    Returns:
+        tuple: (translated transcript, segments with a "translation" field,
+                whether anything was translated)
+    """
+    plan = []
+    pending = []
+    for segment in segments:
+        language = segment.get("language")
+        parts = []
+        for sentence in split_sentences(segment.get("text", "")):
+            needs = language != "en" if language else not looks_english(sentence)
+            if needs:
+                pending.append(sentence)
+            parts.append((sentence, needs))
+        plan.append(parts)
+
+    translations = iter(translate_sentences(pending, translate_batch, model_id) if pending else [])
+    translated_segments = []
+    for segment, parts in zip(segments, plan):
+        text = " ".join(next(translations) if needs else sentence for sentence, needs in parts)
+        translated_segments.append(dict(segment, translation=text))
+
+    transcript = " ".join(s["translation"] for s in translated_segments if s["translation"])
+    return transcript, translated_segments, bool(pending)
+
+
+def translate_text(text, translate_batch, model_id, language=None):
+    """Sentence-level translation of a plain transcript; returns (translation, translated?)"""
+    transcript, _, translated = translate_segments([{"text": text, "language": language}], translate_batch, model_id)
+    return transcript, translated
@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class Warmup:
+    """
+    Loads a set of models in parallel background threads
+
+    Loads go through the model registry, so a request that needs a model before
+    warm-up has finished simply waits on the same in-progress load.
+    """
+
+    def __init__(self, loaders):
+        self._loaders = dict(loaders)
+        self._state = {name: {"status": PENDING, "seconds": None, "error": None} for name in self._loaders}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.started_at = None
+
+    def start(self):
+        if self._executor is not None:
+            return self
+        self.started_at = time.perf_counter()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self._loaders)), thread_name_prefix="warmup")
+        for name, loader in self._loaders.items():
+            self._executor.submit(self._load, name, loader)
+        self._executor.shutdown(wait=False)
+        return self
+
+    def _load(self, name, loader):
+        self._update(name, status=LOADING)
+        started = time.perf_counter()
+        try:
+            loader()
+            self._update(name, status=READY, seconds=round(time.perf_counter() - started, 2))
+        except Exception as e:
+            self._update(name, status=FAILED, seconds=round(time.perf_counter() - started, 2), error=str(e))
+
+    def _update(self, name, **changes):
+        with self._lock:
+            self._state[name].update(changes)
+
+    def status(self):
+        with self._lock:
+            return {name: dict(state) for name, state in self._state.items()}
+
+    def ready(self):
+        return all(s["status"] == READY for s in self.status().values())
+
+    def done(self):
+        return all(s["status"] in (READY, FAILED) for s in self.status().values())
+
+    def wait(self, timeout=None, poll=0.05):
+        """Block until every load finished or failed; False on timeout"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self.done():
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+
+# One warm-up per name and process: Streamlit re-runs the script on every
+# interaction but the server process, and so the models, live on
+_warmups = {}
+_warmups_lock = threading.Lock()
+
+
+def start_warmup(name, loaders):
+    with _warmups_lock:
+        if name not in _warmups:
+            _warmups[name] = Warmup(loaders).start()
+        return _warmups[name]
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+LEXICON_FILE = Path(__file__).parent / "../weapon_lexicon.json"
+
+
+def load_lexicon(path=LEXICON_FILE):
+    """Canonical weapon type -> {language: [terms]}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=1)
+def lexicon_fingerprint(path=LEXICON_FILE):
+    """Content hash of the lexicon, for cache keys of weapon results"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def _normalize(term):
+    return " ".join(term.lower().split())
+
+
+def _trie_pattern(terms):
+    """
+    Regex alternation shaped like a trie over the terms
+
+    Shared prefixes are matched once, so the regex engine walks the lexicon as
+    a trie in C and the cost per character stays flat as terms are added.
+    Longer terms win over their prefixes ("pipe bomb" before "pipe").
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        alternatives = []
+        terminal = False
+        for ch in sorted(node):
+            if ch == "":
+                terminal = True
+                continue
+            piece = r"\s+" if ch == " " else re.escape(ch)
+            alternatives.append(piece + build(node[ch]))
+        if not alternatives:
+            return ""
+        pattern = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return f"(?:{pattern})?" if terminal else pattern
+
+    return build(trie)
+
+
+class WeaponMatcher:
+    """
+    Single-pass multilingual weapon matcher
+
+    The whole lexicon is compiled once into one trie-shaped regex; a transcript
+    is scanned once and every hit is mapped to its canonical weapon type.
+    """
+
+    def __init__(self, lexicon=None, languages=None):
+        lexicon = load_lexicon() if lexicon is None else lexicon
+        self.term_types = {}
+        for weapon_type, by_language in lexicon.items():
+            for language, terms in by_language.items():
+                if languages is not None and language not in languages:
+                    continue
+                for term in terms:
+                    # First (more specific) type wins when a term is listed twice
+                    self.term_types.setdefault(_normalize(term), weapon_type)
+
+        self.languages = languages
+        self.pattern = re.compile(
+            r"(?<!\w)(" + _trie_pattern(self.term_types) + r")(?!\w)",
+            re.IGNORECASE
+        ) if self.term_types else None
+
+    def find(self, text):
+        """Every weapon mention with its canonical type and character span"""
+        if self.pattern is None or not text:
+            return []
+        return [
+            {
+                "weapon": self.term_types[_normalize(m.group(1))],
+                "term": m.group(1),
+                "start": m.start(1),
+                "end": m.end(1)
+            }
+            for m in self.pattern.finditer(text)
+        ]
+
+    def find_batch(self, texts):
+        return [self.find(text) for text in texts]
+
+    def weapons(self, text):
+        """Distinct canonical weapon types mentioned in the text, in order of first mention"""
+        return list(dict.fromkeys(m["weapon"] for m in self.find(text)))
+
+
+@lru_cache(maxsize=16)
+def _cached_matcher(languages):
+    return WeaponMatcher(languages=None if languages is None else set(languages))
+
+
+def get_weapon_matcher(language='en'):
+    """
+    Shared matcher for one language plus English, or every language if None
+
+    Transcripts are usually translated to English, so English terms are always
+    included; unknown languages fall back to English only.
+    """
+    if language is None:
+        return _cached_matcher(None)
+    return _cached_matcher(tuple(sorted({'en', language})))